@@ -1,3 +1,23 @@
 from django.contrib import admin
+from .models import ImageJob, StagedUpload, VerificationJob
 
-# Register your models here.
+
+@admin.register(VerificationJob)
+class VerificationJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'post', 'status', 'attempts', 'available_at', 'updated_at')
+    list_filter = ('status',)
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'updated_at')
+
+
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'object_id', 'image_key', 'status', 'attempts', 'updated_at')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'updated_at')
+
+
+@admin.register(StagedUpload)
+class StagedUploadAdmin(admin.ModelAdmin):
+    list_display = ('key', 'user', 'purpose', 'status', 'created_at', 'promoted_at')
+    list_filter = ('status', 'purpose')
+    search_fields = ('key',)
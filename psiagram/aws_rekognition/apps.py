@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AwsRekognitionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'aws_rekognition'
+
+    def ready(self):
+        import aws_rekognition.signals
@@ -0,0 +1,85 @@
+import os
+import threading
+import boto3
+from botocore.config import Config
+from django.conf import settings
+
+# One boto3 client per AWS service and process. Clients are thread-safe and keep
+# a connection pool, so sharing them skips credential resolution, endpoint
+# loading and the TLS handshake that a fresh client pays on every request.
+# They are created lazily, i.e. after gunicorn forked its workers, and dropped
+# in forked children so a worker never reuses its parent's sockets.
+_clients = {}
+_lock = threading.Lock()
+
+
+def client_config(service_name=None):
+    read_timeout = settings.AWS_CLIENT_READ_TIMEOUT
+    retries = {
+        'mode': settings.AWS_CLIENT_RETRY_MODE,
+        'max_attempts': settings.AWS_CLIENT_MAX_ATTEMPTS,
+    }
+    if service_name == 'rekognition':
+        # Labeling calls sit behind the circuit breaker, which retries within
+        # its budget, and failed verifications go back to the queue with
+        # backoff: one attempt each here, and no waiting much longer than a
+        # slow call (LABELER_SLOW_CALL_SECONDS)
+        read_timeout = settings.LABELER_READ_TIMEOUT
+        retries = {'mode': 'standard', 'total_max_attempts': 1}
+    return Config(
+        max_pool_connections=settings.AWS_CLIENT_MAX_POOL_CONNECTIONS,
+        connect_timeout=settings.AWS_CLIENT_CONNECT_TIMEOUT,
+        read_timeout=read_timeout,
+        retries=retries,
+    )
+
+
+def create_client(service_name, endpoint_url=None):
+    """
+    A new, unshared client for `service_name` configured from settings.
+    """
+    if endpoint_url is None and service_name == 's3':
+        endpoint_url = settings.AWS_S3_ENDPOINT_URL
+    # Sessions are not thread-safe, so each client gets its own
+    session = boto3.session.Session(
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        region_name=settings.AWS_REGION_NAME,
+    )
+    return session.client(service_name, endpoint_url=endpoint_url, config=client_config(service_name))
+
+
+def get_client(service_name):
+    """
+    The process-wide shared client for `service_name`.
+    """
+    client = _clients.get(service_name)
+    if client is None:
+        with _lock:
+            client = _clients.get(service_name)
+            if client is None:
+                client = _clients[service_name] = create_client(service_name)
+    return client
+
+
+def get_s3_client():
+    return get_client('s3')
+
+
+def get_rekognition_client():
+    return get_client('rekognition')
+
+
+def reset_clients():
+    """
+    Forget the shared clients; the next get_client() builds new ones.
+    """
+    global _lock
+    _clients.clear()
+    # A lock held by another thread at fork time would stay locked in the child
+    _lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_clients)
+
@@ -0,0 +1,106 @@
+import hashlib
+import io
+import logging
+from collections import namedtuple
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from PIL import Image
+from psiagram import renditions
+from .models import UploadedImage
+
+logger = logging.getLogger(__name__)
+
+# Uploads are fingerprinted by their bytes: a repost of the same photo points at
+# the already stored object (ref_count + 1) and reuses its Rekognition labels.
+# The perceptual hash (UPLOAD_PERCEPTUAL_HASH) is only recorded, to find
+# re-encoded copies when moderating: images can be crafted to collide with it,
+# so it never hands one image's verdict to another.
+Fingerprint = namedtuple('Fingerprint', ['content_hash', 'perceptual_hash'])
+
+
+def difference_hash(data, size=8):
+    """
+    64-bit dHash of an image as 16 hex chars: one bit per horizontally adjacent
+    pixel pair of a (size+1) x size grayscale thumbnail. '' if `data` is no image.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            pixels = list(image.convert('L').resize((size + 1, size)).getdata())
+    except Exception:
+        return ''
+
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f'{bits:0{size * size // 4}x}'
+
+
+def fingerprint(data):
+    perceptual_hash = difference_hash(data) if settings.UPLOAD_PERCEPTUAL_HASH else ''
+    return Fingerprint(hashlib.sha256(data).hexdigest(), perceptual_hash)
+
+
+def acquire(fp):
+    """
+    Take a reference on the stored image with this content, or None if there is none.
+    """
+    updated = UploadedImage.objects.filter(content_hash=fp.content_hash).update(ref_count=F('ref_count') + 1)
+    if not updated:
+        return None
+    return UploadedImage.objects.get(content_hash=fp.content_hash)
+
+
+def register(fp, key):
+    """
+    Record `key` as the stored object for this content, with one reference.
+    If a concurrent upload registered the same content first, a reference on
+    that one is returned instead and the caller should drop its own object.
+    """
+    try:
+        with transaction.atomic():
+            return UploadedImage.objects.create(
+                image_file=key,
+                s3_key=key,
+                content_hash=fp.content_hash,
+                perceptual_hash=fp.perceptual_hash,
+                ref_count=1,
+            )
+    except IntegrityError:
+        return acquire(fp)
+
+
+def release(key):
+    """
+    Drop one reference on the stored object `key`; the last one deletes it
+    and its renditions.
+    """
+    UploadedImage.objects.filter(s3_key=key, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+    deleted, _ = UploadedImage.objects.filter(s3_key=key, ref_count=0).delete()
+    if deleted:
+        try:
+            default_storage.delete(key)
+            renditions.delete(key)
+        except Exception as e:
+            logger.warning("Could not delete unreferenced image %s: %s", key, e)
+
+
+def cached_analysis(key):
+    """
+    (upload, labels) for the stored object `key`: its own cached labels, which
+    every upload of exactly the same bytes shares, else None labels (upload is
+    None for objects stored before fingerprinting).
+    """
+    upload = UploadedImage.objects.filter(s3_key=key).first()
+    if upload is None:
+        return None, None
+    return upload, upload.analysis_result
+
+
+def store_analysis(upload, labels):
+    UploadedImage.objects.filter(pk=upload.pk).update(analysis_result=labels)
+    upload.analysis_result = labels
@@ -0,0 +1,307 @@
+import logging
+import random
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from itertools import islice
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from groups.models import Group
+from posts.models import Post
+from profiles.models import UserProfile
+from psiagram import renditions
+from . import dedup, prevalidation
+from .labelers import get_labeler
+from .objectstores import get_object_store
+from .models import ImageJob, StagedUpload, UploadedImage, VerificationJob
+from .resilience import LabelerUnavailable
+from .utils import is_dog_detected
+
+logger = logging.getLogger(__name__)
+
+RUNNABLE = (VerificationJob.Status.QUEUED, VerificationJob.Status.RUNNING)
+
+
+def enqueue_verification(post):
+    """
+    Queue the verification of `post`; it stays PENDING until a worker is done.
+    """
+    return VerificationJob.objects.create(post=post)
+
+
+def enqueue_image(kind, object_id, image_key):
+    """
+    Queue the processing of a new avatar or group picture (see ImageJob).
+    """
+    return ImageJob.objects.create(kind=kind, object_id=object_id, image_key=image_key)
+
+
+def _fail_abandoned(queryset, now):
+    # Running jobs whose worker died during their last attempt are not retried
+    model = queryset.model
+    abandoned = list(
+        queryset
+        .filter(status=model.Status.RUNNING, available_at__lte=now, attempts__gte=settings.VERIFICATION_MAX_ATTEMPTS)
+        .values_list('pk', flat=True)
+    )
+    if abandoned:
+        model.objects.filter(pk__in=abandoned, status=model.Status.RUNNING).update(
+            status=model.Status.FAILED,
+            last_error="Worker lost during the last attempt.",
+            updated_at=now,
+        )
+    return abandoned
+
+
+def _claim(queryset, limit):
+    now = timezone.now()
+    model = queryset.model
+    abandoned = _fail_abandoned(queryset, now)
+    candidates = (
+        queryset
+        .filter(status__in=RUNNABLE, available_at__lte=now, attempts__lt=settings.VERIFICATION_MAX_ATTEMPTS)
+        .order_by('available_at', 'id')
+        .values_list('pk', 'attempts')[:limit]
+    )
+
+    hidden_until = now + timedelta(seconds=settings.VERIFICATION_VISIBILITY_TIMEOUT)
+    claimed = []
+    for pk, attempts in candidates:
+        updated = model.objects.filter(pk=pk, attempts=attempts, status__in=RUNNABLE).update(
+            status=model.Status.RUNNING,
+            attempts=attempts + 1,
+            available_at=hidden_until,
+        )
+        if updated:
+            claimed.append(pk)
+    return queryset.filter(pk__in=claimed), abandoned
+
+
+def claim_jobs(limit):
+    """
+    Claim up to `limit` runnable jobs: queued ones whose backoff has passed and
+    running ones whose visibility timeout expired (their worker died).
+    Each claim is a compare-and-swap on `attempts`, so two workers never get the same job.
+    A job whose worker died during its last attempt is FAILED instead, and its
+    post REJECTED, so no post stays PENDING forever.
+    """
+    claimed, abandoned = _claim(VerificationJob.objects.select_related('post'), limit)
+    if abandoned:
+        Post.objects.filter(
+            verification_jobs__pk__in=abandoned, verification_status=Post.VerificationStatus.PENDING
+        ).update(verification_status=Post.VerificationStatus.REJECTED, updated_at=timezone.now())
+    return list(claimed)
+
+
+def claim_image_jobs(limit):
+    """
+    Like claim_jobs, for ImageJobs.
+    """
+    claimed, _ = _claim(ImageJob.objects.all(), limit)
+    return list(claimed)
+
+
+def retry_delay(attempts):
+    """
+    Exponential backoff with jitter after the given number of attempts.
+    """
+    delay = settings.VERIFICATION_RETRY_BACKOFF * 2 ** (attempts - 1)
+    return delay * random.uniform(0.5, 1.5)
+
+
+def finish(job, status, **fields):
+    """
+    Record the outcome of an attempt, unless the job was reclaimed meanwhile
+    (its visibility timeout ran out and another worker took it over).
+    """
+    fields.update(status=status, updated_at=timezone.now())
+    type(job).objects.filter(pk=job.pk, attempts=job.attempts).update(**fields)
+    for name, value in fields.items():
+        setattr(job, name, value)
+
+
+def fingerprint_upload(post):
+    """
+    Validate and fingerprint an image the client uploaded straight to its key
+    (direct file uploads already were when the post was created). A known image
+    makes the post point at the stored copy and drops the new object.
+    Raises prevalidation.UploadRejected.
+    """
+    key = post.image.name
+    promoted = StagedUpload.objects.filter(key=key, purpose=StagedUpload.Purpose.POST).exists()
+    if not promoted or UploadedImage.objects.filter(s3_key=key).exists():
+        return
+
+    with default_storage.open(key, 'rb') as image_file:
+        data = image_file.read()
+    prevalidation.check_bytes(data)
+    fingerprint = dedup.fingerprint(data)
+    with transaction.atomic():
+        upload = dedup.acquire(fingerprint) or dedup.register(fingerprint, key)
+        if upload.s3_key != key:
+            Post.objects.filter(pk=post.pk).update(image=upload.s3_key)
+            post.image = upload.s3_key
+    if upload.s3_key != key:
+        default_storage.delete(key)
+
+
+def reject(post):
+    post.verification_status = Post.VerificationStatus.REJECTED
+    post.save(update_fields=['verification_status', 'updated_at'])
+
+
+def process_job(job, labeler=None):
+    """
+    Label the post's image and flip it to APPROVED/REJECTED. Failures are retried
+    with backoff until VERIFICATION_MAX_ATTEMPTS, then the job is marked FAILED
+    and the post REJECTED.
+    """
+    labeler = labeler or get_labeler()
+    post = job.post
+
+    try:
+        # Uploads claimed by key skipped all checks in the request
+        fingerprint_upload(post)
+
+        # Reposts of a known image reuse its labels instead of calling Rekognition again
+        upload, labels = dedup.cached_analysis(post.image.name)
+        if labels is None:
+            labels = labeler.detect_labels(settings.AWS_S3_BUCKET_NAME, post.image.name)
+            if upload is not None:
+                dedup.store_analysis(upload, labels)
+    except prevalidation.UploadRejected as e:
+        # Not worth retrying, and not worth a Rekognition call
+        with transaction.atomic():
+            reject(post)
+            finish(job, VerificationJob.Status.DONE, last_error=str(e))
+        return job
+    except LabelerUnavailable as e:
+        # Labeling is shedding load: come back once the breaker may let calls
+        # through again, without using up one of the job's attempts
+        available_at = timezone.now() + timedelta(seconds=e.retry_after)
+        finish(job, VerificationJob.Status.QUEUED, attempts=job.attempts - 1, last_error=str(e), available_at=available_at)
+        return job
+    except Exception as e:
+        logger.warning("Verification of post %s failed (attempt %s): %s", post.pk, job.attempts, e)
+        if job.attempts >= settings.VERIFICATION_MAX_ATTEMPTS:
+            # An image that could never be checked is not shown
+            with transaction.atomic():
+                reject(post)
+                finish(job, VerificationJob.Status.FAILED, last_error=str(e))
+        else:
+            available_at = timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+            finish(job, VerificationJob.Status.QUEUED, last_error=str(e), available_at=available_at)
+        return job
+
+    approved = is_dog_detected(labels)
+    update_fields = ['rekognition_labels', 'verification_status', 'updated_at']
+    if approved:
+        # Renditions are ready before the post shows up in any feed; if they
+        # fail, the post is still approved and the backfill command retries
+        try:
+            post.image_renditions = renditions.build(Post, 'image', post.image.name, 'post')
+            update_fields.append('image_renditions')
+        except Exception as e:
+            logger.warning("Renditions of post %s failed: %s", post.pk, e)
+
+    with transaction.atomic():
+        post.rekognition_labels = labels
+        post.verification_status = (
+            Post.VerificationStatus.APPROVED if approved else Post.VerificationStatus.REJECTED
+        )
+        post.save(update_fields=update_fields)
+
+        finish(job, VerificationJob.Status.DONE, last_error='')
+    return job
+
+
+# kind -> (model, image field, renditions kind)
+IMAGE_TARGETS = {
+    ImageJob.Kind.AVATAR: (UserProfile, 'avatar', 'avatar'),
+    ImageJob.Kind.GROUP: (Group, 'group_picture', 'group'),
+}
+
+
+def check_avatar_upload(key):
+    """
+    Validate an avatar the client uploaded straight to its key, like the images
+    of posts; any other avatar was checked when it was stored.
+    Raises prevalidation.UploadRejected.
+    """
+    if StagedUpload.objects.filter(key=key, purpose=StagedUpload.Purpose.AVATAR).exists():
+        prevalidation.check_object(get_object_store(), key)
+
+
+def process_image_job(job):
+    """
+    Check a new avatar, then generate the renditions of the avatar or group
+    picture. Failures are retried like verifications and never reach the
+    request that saved the image; a rejected avatar is removed from the profile.
+    """
+    model, field_name, kind = IMAGE_TARGETS[job.kind]
+    instance = model.objects.filter(pk=job.object_id, **{field_name: job.image_key}).first()
+    try:
+        if instance is not None:
+            if job.kind == ImageJob.Kind.AVATAR:
+                check_avatar_upload(job.image_key)
+            renditions.refresh(model, job.object_id, field_name, kind)
+    except prevalidation.UploadRejected as e:
+        with transaction.atomic():
+            setattr(instance, field_name, None)
+            setattr(instance, f'{field_name}_renditions', None)
+            instance.save(update_fields=[field_name, f'{field_name}_renditions'])
+            finish(job, ImageJob.Status.DONE, last_error=str(e))
+        get_object_store().delete(job.image_key)
+        return job
+    except Exception as e:
+        logger.warning("Processing of %s %s failed (attempt %s): %s", job.kind, job.object_id, job.attempts, e)
+        if job.attempts >= settings.VERIFICATION_MAX_ATTEMPTS:
+            finish(job, ImageJob.Status.FAILED, last_error=str(e))
+        else:
+            available_at = timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+            finish(job, ImageJob.Status.QUEUED, last_error=str(e), available_at=available_at)
+        return job
+
+    finish(job, ImageJob.Status.DONE, last_error='')
+    return job
+
+
+def run(job, labeler=None):
+    """
+    Process a claimed job of either kind.
+    """
+    if isinstance(job, ImageJob):
+        return process_image_job(job)
+    return process_job(job, labeler)
+
+
+def run_in_threads(func, items, workers):
+    """
+    Call func(item) for the items of the (lazy) iterable `items` on `workers`
+    threads, yielding (item, result) as each call completes. An item is only
+    taken once a thread is free, so jobs claimed by the iterable are claimed
+    one at a time as capacity frees up. With one worker everything runs in the
+    calling thread.
+    """
+    if workers <= 1:
+        for item in items:
+            yield item, func(item)
+        return
+
+    def call(item):
+        try:
+            return func(item)
+        finally:
+            # Worker threads own their connections
+            connection.close()
+
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(call, item): item for item in islice(items, workers)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for item in islice(items, 1):
+                    pending[executor.submit(call, item)] = item
+                yield pending.pop(future), future.result()
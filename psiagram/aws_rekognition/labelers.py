@@ -0,0 +1,56 @@
+import random
+import threading
+import time
+from django.conf import settings
+from django.utils.module_loading import import_string
+from .clients import get_rekognition_client
+from .resilience import GuardedLabeler
+
+
+class RekognitionLabeler:
+    """
+    Labels an S3 object with AWS Rekognition detect_labels.
+    """
+    max_labels = 10
+    min_confidence = 70
+
+    def detect_labels(self, bucket, key):
+        response = get_rekognition_client().detect_labels(
+            Image={'S3Object': {'Bucket': bucket, 'Name': key}},
+            MaxLabels=self.max_labels,
+            MinConfidence=self.min_confidence,
+        )
+        return response.get('Labels', [])
+
+
+class FakeLabeler:
+    """
+    Offline stand-in for tests, local development and benchmarks: every image
+    is a dog, unless `labels` is set to something else. FAKE_LABELER_LATENCY
+    (seconds) and FAKE_LABELER_ERROR_RATE (0-1) simulate Rekognition's response
+    time and transient errors; which calls fail follows one pseudo-random
+    sequence per FAKE_LABELER_SEED and process, so runs are repeatable.
+    """
+    labels = [{'Name': 'Dog', 'Confidence': 99.0}]
+    _sequences = {}
+    _lock = threading.Lock()
+
+    def draw(self):
+        seed = settings.FAKE_LABELER_SEED
+        with self._lock:
+            sequence = self._sequences.setdefault(seed, random.Random(seed))
+            return sequence.random()
+
+    def detect_labels(self, bucket, key):
+        if settings.FAKE_LABELER_LATENCY:
+            time.sleep(settings.FAKE_LABELER_LATENCY)
+        if settings.FAKE_LABELER_ERROR_RATE and self.draw() < settings.FAKE_LABELER_ERROR_RATE:
+            raise ConnectionError(f"Simulated labeling error for {key}")
+        return list(self.labels)
+
+
+def get_labeler():
+    labeler = import_string(settings.VERIFICATION_LABELER)()
+    if settings.LABELER_CIRCUIT_BREAKER:
+        return GuardedLabeler(labeler)
+    return labeler
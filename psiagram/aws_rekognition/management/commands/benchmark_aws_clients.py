@@ -0,0 +1,66 @@
+import statistics
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from aws_rekognition import clients
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare a fresh boto3 S3 client per request with the shared client from "
+        "aws_rekognition.clients, against a local S3 stand-in (MinIO, moto_server...)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint-url', help="S3-compatible endpoint (defaults to AWS_S3_ENDPOINT_URL).")
+        parser.add_argument('--bucket', help="Bucket to call (defaults to AWS_S3_BUCKET_NAME).")
+        parser.add_argument('--requests', type=int, default=200, help="Simulated requests per variant.")
+        parser.add_argument(
+            '--operation', choices=['head_bucket', 'presign'], default='head_bucket',
+            help="'presign' needs no endpoint and measures client construction alone."
+        )
+
+    def handle(self, *args, **options):
+        endpoint_url = options['endpoint_url'] or settings.AWS_S3_ENDPOINT_URL
+        bucket = options['bucket'] or settings.AWS_S3_BUCKET_NAME
+        operation = options['operation']
+        if not bucket:
+            raise CommandError("No bucket given (--bucket or AWS_S3_BUCKET_NAME).")
+        if operation == 'head_bucket' and not endpoint_url:
+            raise CommandError("head_bucket needs --endpoint-url (or AWS_S3_ENDPOINT_URL) pointing at a local S3.")
+
+        def call(s3_client):
+            if operation == 'presign':
+                s3_client.generate_presigned_url('put_object', Params={'Bucket': bucket, 'Key': 'benchmark'})
+            else:
+                s3_client.head_bucket(Bucket=bucket)
+
+        # 1. A new client per request, like the views used to do
+        fresh = self.measure(options['requests'], lambda: call(clients.create_client('s3', endpoint_url)))
+
+        # 2. One shared client, created before the first request
+        shared_client = clients.create_client('s3', endpoint_url)
+        call(shared_client)
+        shared = self.measure(options['requests'], lambda: call(shared_client))
+
+        self.stdout.write(f"Endpoint: {endpoint_url or 'AWS'}, bucket {bucket}, operation {operation}\n")
+        for title, timings in (("fresh client per request", fresh), ("shared client", shared)):
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write(
+                f"median {statistics.median(timings):.2f} ms, "
+                f"p95 {self.percentile(timings, 95):.2f} ms over {len(timings)} requests"
+            )
+        saved = statistics.median(fresh) - statistics.median(shared)
+        self.stdout.write(self.style.SUCCESS(f"\nSaved per request (median): {saved:.2f} ms"))
+
+    def measure(self, runs, func):
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    def percentile(self, timings, pct):
+        ordered = sorted(timings)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
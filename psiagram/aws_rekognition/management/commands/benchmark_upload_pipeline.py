@@ -0,0 +1,123 @@
+import io
+import statistics
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+from aws_rekognition import jobs
+from aws_rekognition.labelers import get_labeler
+from posts.models import Post
+
+STAGES = ['initiate', 'upload', 'upload-complete', 'create post', 'verification']
+
+
+class Command(BaseCommand):
+    help = (
+        "Run uploads through the whole pipeline (initiate, PUT, upload-complete, "
+        "post creation, verification worker) against the filesystem object store "
+        "and the fake labeler, and time each stage. Nothing is kept: the objects "
+        "go to a temporary directory and the database work is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--uploads', type=int, default=50, help="Number of uploads.")
+        parser.add_argument('--image-size', type=int, default=1024, help="Width and height of the test images (px).")
+        parser.add_argument('--latency', type=float, default=0.0, help="Simulated labeling latency (seconds).")
+        parser.add_argument('--error-rate', type=float, default=0.0, help="Share of labeling calls that fail (0-1).")
+        parser.add_argument('--seed', type=int, default=0, help="Seed of the simulated failures.")
+
+    def handle(self, *args, **options):
+        if options['uploads'] < 1:
+            raise CommandError("--uploads must be at least 1.")
+
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            OBJECT_STORE_BACKEND='aws_rekognition.objectstores.FilesystemObjectStore',
+            OBJECT_STORE_ROOT=root,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage', 'OPTIONS': {'location': root}},
+                'staticfiles': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+            },
+            VERIFICATION_LABELER='aws_rekognition.labelers.FakeLabeler',
+            VERIFICATION_RETRY_BACKOFF=0,
+            FAKE_LABELER_LATENCY=options['latency'],
+            FAKE_LABELER_ERROR_RATE=options['error_rate'],
+            FAKE_LABELER_SEED=options['seed'],
+        ):
+            with transaction.atomic():
+                timings, errors, statuses, elapsed = self.run(options)
+                transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"{options['uploads']} uploads of {options['image_size']}px JPEGs, labeling latency "
+            f"{options['latency']}s, error rate {options['error_rate']}\n"
+        )
+        for stage in STAGES:
+            self.stdout.write(self.style.MIGRATE_HEADING(stage))
+            self.stdout.write(
+                f"median {statistics.median(timings[stage]):.2f} ms, "
+                f"p95 {self.percentile(timings[stage], 95):.2f} ms over {len(timings[stage])} calls"
+                + (f", {errors[stage]} server errors" if errors[stage] else "")
+            )
+        self.stdout.write(f"\nPosts: {dict(statuses)}")
+        self.stdout.write(self.style.SUCCESS(f"{options['uploads'] / elapsed:.1f} uploads/s end to end"))
+
+    def run(self, options):
+        user = get_user_model().objects.create_user(
+            username=f'benchmark-{uuid.uuid4().hex[:8]}', password=uuid.uuid4().hex
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        # Generated up front, so the timings only cover the pipeline
+        images = [self.make_image(options['image_size']) for _ in range(options['uploads'])]
+        timings = defaultdict(list)
+        errors = Counter()
+
+        def timed(stage, func):
+            start = time.perf_counter()
+            response = func()
+            timings[stage].append((time.perf_counter() - start) * 1000)
+            if getattr(response, 'status_code', 200) >= 500:
+                errors[stage] += 1
+            return response
+
+        started = time.perf_counter()
+        for data in images:
+            upload = timed('initiate', lambda: client.post(reverse('initiate-upload'), {
+                'filename': 'benchmark.jpg', 'content_type': 'image/jpeg', 'size': len(data),
+            }, format='json')).data
+            timed('upload', lambda: client.put(upload['upload_url'], data, content_type='image/jpeg'))
+            timed('upload-complete', lambda: client.post(
+                reverse('upload-complete'), {'file_key': upload['file_key']}, format='json'
+            ))
+            timed('create post', lambda: client.post(
+                reverse('post-create'), {'s3_key': upload['file_key']}, format='json'
+            ))
+
+        # The worker, inline: retried jobs come back right away (no backoff)
+        labeler = get_labeler()
+        while True:
+            claimed = jobs.claim_jobs(limit=10)
+            if not claimed:
+                break
+            for job in claimed:
+                timed('verification', lambda: jobs.process_job(job, labeler))
+        elapsed = time.perf_counter() - started
+
+        statuses = Counter(Post.objects.filter(author=user).values_list('verification_status', flat=True))
+        return timings, errors, statuses, elapsed
+
+    def make_image(self, size):
+        buffer = io.BytesIO()
+        Image.effect_noise((size, size), 64).convert('RGB').save(buffer, format='JPEG', quality=85)
+        return buffer.getvalue()
+
+    def percentile(self, timings, pct):
+        ordered = sorted(timings)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
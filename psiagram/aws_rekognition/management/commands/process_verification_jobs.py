@@ -0,0 +1,61 @@
+import signal
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from aws_rekognition import jobs
+from aws_rekognition.labelers import get_labeler
+from aws_rekognition.models import VerificationJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Verify the images of PENDING posts and process new avatars/group pictures: "
+        "claim queued jobs and process them with a thread pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.VERIFICATION_WORKERS, help="Jobs processed concurrently.")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Exit once no job is runnable instead of polling.")
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        labeler = get_labeler()
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        processed = {status: 0 for status in VerificationJob.Status.values}
+
+        while not self.stopping:
+            ran = False
+            for _, job in jobs.run_in_threads(lambda job: jobs.run(job, labeler), self.claimed_jobs(), workers):
+                ran = True
+                processed[job.status] += 1
+                subject = f"Post {job.post_id}" if isinstance(job, VerificationJob) else f"{job.get_kind_display()} {job.object_id}"
+                self.stdout.write(f"{subject}: {job.status} (attempt {job.attempts})")
+            if not ran:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+
+        summary = ", ".join(f"{count} {status.lower()}" for status, count in processed.items() if count)
+        self.stdout.write(self.style.SUCCESS(f"Verification worker finished: {summary or 'no jobs'}."))
+
+    def claimed_jobs(self):
+        # One job at a time, whenever a worker is free; the two queues take
+        # turns so neither starves the other
+        claimers = [jobs.claim_jobs, jobs.claim_image_jobs]
+        while not self.stopping:
+            close_old_connections()
+            for claim in claimers:
+                claimed = claim(limit=1)
+                if claimed:
+                    break
+            else:
+                return
+            claimers.reverse()
+            yield claimed[0]
+
+    def stop(self, signum, frame):
+        # Finish the jobs in flight, claim no new ones
+        self.stopping = True
@@ -0,0 +1,96 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from aws_rekognition.models import StagedUpload, UploadedImage
+from aws_rekognition.objectstores import MAX_KEYS, get_object_store
+from groups.models import Group
+from posts.models import Post
+from profiles.models import UserProfile
+
+# Where uploaded originals live: the old staging prefix and the image fields' upload_to.
+# renditions/ is left alone, those objects are only referenced from JSON.
+PREFIXES = ['uploads/', 'posts/', 'avatars/', 'group_pictures/']
+
+
+def referenced_keys(keys):
+    """
+    The keys among `keys` that a row still points at, in a few bulk queries.
+    """
+    keys = list(keys)
+    referenced = set(Post.objects.filter(image__in=keys).values_list('image', flat=True))
+    referenced.update(UserProfile.objects.filter(avatar__in=keys).values_list('avatar', flat=True))
+    referenced.update(Group.objects.filter(group_picture__in=keys).values_list('group_picture', flat=True))
+    referenced.update(UploadedImage.objects.filter(s3_key__in=keys, ref_count__gt=0).values_list('s3_key', flat=True))
+    return referenced
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete stored images nothing points at any more: abandoned or rejected uploads "
+        "and the objects of deleted posts, profiles and groups."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', action='append', help=f"Only these prefixes (repeatable, default: {', '.join(PREFIXES)}).")
+        parser.add_argument(
+            '--min-age', type=float, default=24,
+            help="Hours an object must be old before it counts as orphaned (covers uploads in flight)."
+        )
+        parser.add_argument('--batch-size', type=int, default=MAX_KEYS, help=f"Keys per delete request (at most {MAX_KEYS}).")
+        parser.add_argument('--max-deletes-per-second', type=float, default=500, help="Rate limit for deletions.")
+        parser.add_argument('--dry-run', action='store_true', help="Only list what would be deleted.")
+
+    def handle(self, *args, **options):
+        if not 1 <= options['batch_size'] <= MAX_KEYS:
+            raise CommandError(f"--batch-size must be between 1 and {MAX_KEYS}.")
+        if options['max_deletes_per_second'] <= 0:
+            raise CommandError("--max-deletes-per-second must be positive.")
+
+        store = get_object_store()
+        cutoff = timezone.now() - timedelta(hours=options['min_age'])
+        self.started = time.monotonic()
+        self.deleted = 0
+        scanned = orphaned = 0
+
+        for prefix in options['prefix'] or PREFIXES:
+            for page in store.list_objects(prefix):
+                scanned += len(page)
+                candidates = [key for key, last_modified in page if last_modified < cutoff]
+                if not candidates:
+                    continue
+                referenced = referenced_keys(candidates)
+                orphans = [key for key in candidates if key not in referenced]
+                orphaned += len(orphans)
+
+                if options['dry_run']:
+                    for key in orphans:
+                        self.stdout.write(f"would delete {key}")
+                    continue
+                for start in range(0, len(orphans), options['batch_size']):
+                    self.delete_batch(store, orphans[start:start + options['batch_size']], options)
+
+        verb = "would delete" if options['dry_run'] else f"deleted {self.deleted} of"
+        self.stdout.write(self.style.SUCCESS(f"Scanned {scanned} objects, {verb} {orphaned} orphaned."))
+
+    def delete_batch(self, store, keys, options):
+        # Unclaimed uploads stop being claimable before their objects go...
+        StagedUpload.objects.filter(key__in=keys, status=StagedUpload.Status.STAGED).delete()
+        # ...and anything claimed since the listing is kept
+        referenced = referenced_keys(keys)
+        keys = [key for key in keys if key not in referenced]
+        if not keys:
+            return
+
+        failed = set(store.delete_many(keys))
+        for key in failed:
+            self.stderr.write(f"could not delete {key}")
+        deleted = [key for key in keys if key not in failed]
+        StagedUpload.objects.filter(key__in=deleted).delete()
+        self.deleted += len(deleted)
+
+        # Stay under the rate limit (S3 also throttles deletes per prefix)
+        earliest = self.started + self.deleted / options['max_deletes_per_second']
+        delay = earliest - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
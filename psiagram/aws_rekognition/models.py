@@ -1,7 +1,127 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 class UploadedImage(models.Model):
+    """
+    One stored image object, shared by every post whose upload had the same
+    content (see aws_rekognition.dedup). `analysis_result` caches its
+    Rekognition labels and `ref_count` counts the posts pointing at `s3_key`.
+    """
     image_file = models.ImageField(upload_to='uploads/')
-    s3_key = models.CharField(max_length=255, blank=True)
+    s3_key = models.CharField(max_length=255, blank=True, db_index=True)
     analysis_result = models.JSONField(null=True, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # SHA-256 of the bytes, and a 64-bit difference hash for near-duplicates
+    content_hash = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    perceptual_hash = models.CharField(max_length=16, blank=True, db_index=True)
+    ref_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.s3_key
+
+
+class VerificationJob(models.Model):
+    """
+    Durable queue entry for the image verification of a post.
+    Claimed by `manage.py process_verification_jobs` workers; a claimed job is
+    hidden until `available_at` (the visibility timeout) and reappears if the
+    worker dies before finishing it.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = 'QUEUED', 'Queued'
+        RUNNING = 'RUNNING', 'Running'
+        DONE = 'DONE', 'Done'
+        FAILED = 'FAILED', 'Failed'
+
+    post = models.ForeignKey(
+        'posts.Post',
+        on_delete=models.CASCADE,
+        related_name='verification_jobs'
+    )
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Claim query: runnable jobs, oldest first
+            models.Index(fields=['status', 'available_at'], name='verification_job_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"Verification of post {self.post_id} ({self.status})"
+
+
+class ImageJob(models.Model):
+    """
+    Durable queue entry for the processing of a new avatar or group picture
+    (renditions, see psiagram.renditions), outside of the request that saved it.
+    Claimed by the same `manage.py process_verification_jobs` workers as
+    VerificationJob. `image_key` is the image the job was queued for; a job whose
+    image was replaced meanwhile has nothing left to do.
+    """
+
+    Status = VerificationJob.Status
+
+    class Kind(models.TextChoices):
+        AVATAR = 'avatar', 'Avatar'
+        GROUP = 'group', 'Group picture'
+
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    object_id = models.PositiveBigIntegerField()
+    image_key = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='image_job_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} of {self.object_id} ({self.status})"
+
+
+class StagedUpload(models.Model):
+    """
+    An upload key handed out by InitiateUploadView. Clients upload straight to
+    the final key (posts/..., avatars/...); the row stays STAGED until a post or
+    profile claims it, which is only a database update.
+    """
+
+    class Purpose(models.TextChoices):
+        POST = 'post', 'Post image'
+        AVATAR = 'avatar', 'Avatar'
+
+    class Status(models.TextChoices):
+        STAGED = 'STAGED', 'Staged'
+        PROMOTED = 'PROMOTED', 'Promoted'
+
+    key = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='staged_uploads'
+    )
+    purpose = models.CharField(max_length=10, choices=Purpose.choices, default=Purpose.POST)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.STAGED)
+    created_at = models.DateTimeField(auto_now_add=True)
+    promoted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Unclaimed uploads, oldest first
+            models.Index(fields=['status', 'created_at'], name='staged_upload_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.status})"
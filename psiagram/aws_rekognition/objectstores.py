@@ -0,0 +1,261 @@
+import hashlib
+import mimetypes
+import os
+import re
+import shutil
+import uuid
+from datetime import datetime, timezone
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from .clients import get_s3_client
+
+# The object operations the upload and verification code needs (presigned
+# uploads, head, delete, ranged reads, listing and batch deletes), behind
+# one small interface so the whole pipeline can run and be benchmarked without
+# AWS. The backend is chosen with OBJECT_STORE_BACKEND, like the labeler with
+# VERIFICATION_LABELER.
+# Multipart parts are passed around as [(part_number, etag)], in order.
+
+NOT_FOUND_CODES = ('404', 'NoSuchKey', 'NotFound')
+# Most keys S3 lists per page and deletes per request
+MAX_KEYS = 1000
+
+
+class S3ObjectStore:
+    """
+    Objects in the AWS_S3_BUCKET_NAME bucket, through the shared S3 client.
+    """
+
+    def __init__(self, bucket=None):
+        self.bucket = bucket or settings.AWS_S3_BUCKET_NAME
+
+    @property
+    def client(self):
+        return get_s3_client()
+
+    def is_configured(self):
+        return bool(self.bucket) and isinstance(self.bucket, str)
+
+    def presign_put(self, key, content_type, expires):
+        return self.client.generate_presigned_url(
+            ClientMethod='put_object',
+            Params={'Bucket': self.bucket, 'Key': key, 'ContentType': content_type},
+            ExpiresIn=expires,
+        )
+
+    def create_multipart_upload(self, key, content_type):
+        response = self.client.create_multipart_upload(Bucket=self.bucket, Key=key, ContentType=content_type)
+        return response['UploadId']
+
+    def presign_part(self, key, upload_id, part_number, expires):
+        return self.client.generate_presigned_url(
+            ClientMethod='upload_part',
+            Params={'Bucket': self.bucket, 'Key': key, 'UploadId': upload_id, 'PartNumber': part_number},
+            ExpiresIn=expires,
+        )
+
+    def complete_multipart_upload(self, key, upload_id, parts):
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': [{'PartNumber': number, 'ETag': etag} for number, etag in parts]},
+        )
+
+    def abort_multipart_upload(self, key, upload_id):
+        self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+
+    def list_parts(self, key, upload_id):
+        parts = []
+        paginator = self.client.get_paginator('list_parts')
+        for page in paginator.paginate(Bucket=self.bucket, Key=key, UploadId=upload_id):
+            parts.extend((part['PartNumber'], part['ETag']) for part in page.get('Parts', []))
+        return parts
+
+    def head(self, key):
+        """
+        Size of the object in bytes, or None if there is no such object.
+        """
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)['ContentLength']
+        except ClientError as e:
+            if e.response['Error']['Code'] in NOT_FOUND_CODES:
+                return None
+            raise
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def list_objects(self, prefix):
+        """
+        Pages of [(key, last modified)] for the objects under `prefix`.
+        """
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix, PaginationConfig={'PageSize': MAX_KEYS}):
+            yield [(obj['Key'], obj['LastModified']) for obj in page.get('Contents', [])]
+
+    def delete_many(self, keys):
+        """
+        Delete up to MAX_KEYS objects in one request; returns the keys that could not be deleted.
+        """
+        response = self.client.delete_objects(
+            Bucket=self.bucket,
+            Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True},
+        )
+        return [error['Key'] for error in response.get('Errors', [])]
+
+    def get_range(self, key, byte_range):
+        """
+        (data, total object size, content type) for an HTTP `byte_range` such
+        as 'bytes=0-65535' or 'bytes=-16'.
+        """
+        response = self.client.get_object(Bucket=self.bucket, Key=key, Range=byte_range)
+        data = response['Body'].read()
+        # 'bytes 0-65535/1234567'
+        match = re.search(r'/(\d+)$', response.get('ContentRange') or '')
+        size = int(match.group(1)) if match else response.get('ContentLength', len(data))
+        return data, size, response.get('ContentType')
+
+
+class FilesystemObjectStore:
+    """
+    Objects as files under OBJECT_STORE_ROOT, for local runs and benchmarks.
+    Presigned URLs point at LocalUploadView and carry a signed token instead of
+    an AWS signature; content types are guessed from the key's extension.
+    """
+    multipart_dir = '.multipart'
+    salt = 'aws_rekognition.objectstores.local-upload'
+
+    def __init__(self, root=None):
+        self.root = os.path.abspath(root or settings.OBJECT_STORE_ROOT)
+
+    def is_configured(self):
+        return True
+
+    def path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Key outside of the object store: {key}")
+        return path
+
+    def part_path(self, upload_id, part_number):
+        return self.path(os.path.join(self.multipart_dir, upload_id, str(part_number)))
+
+    def presign(self, expires, **target):
+        token = signing.dumps({'expires': expires, **target}, salt=self.salt)
+        return reverse('local-upload', args=[token])
+
+    def unsign(self, token):
+        """
+        The upload target of a token made by `presign`, or None if it is invalid or expired.
+        """
+        try:
+            target = signing.loads(token, salt=self.salt)
+            return signing.loads(token, salt=self.salt, max_age=target['expires'])
+        except signing.BadSignature:
+            return None
+
+    def receive(self, target, data):
+        """
+        Store the body of a PUT to a presigned URL; returns its ETag.
+        """
+        if target.get('upload_id'):
+            path = self.part_path(target['upload_id'], target['part_number'])
+            if not os.path.isdir(os.path.dirname(path)):
+                raise FileNotFoundError(f"No multipart upload {target['upload_id']}")
+        else:
+            path = self.path(target['key'])
+        self.write(path, data)
+        return f'"{hashlib.md5(data).hexdigest()}"'
+
+    def write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Readers never see a half-written object
+        temporary = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(data)
+        os.replace(temporary, path)
+
+    def presign_put(self, key, content_type, expires):
+        return self.presign(expires, key=key)
+
+    def create_multipart_upload(self, key, content_type):
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self.path(os.path.join(self.multipart_dir, upload_id)))
+        return upload_id
+
+    def presign_part(self, key, upload_id, part_number, expires):
+        return self.presign(expires, key=key, upload_id=upload_id, part_number=part_number)
+
+    def complete_multipart_upload(self, key, upload_id, parts):
+        chunks = []
+        for number, etag in parts:
+            with open(self.part_path(upload_id, number), 'rb') as f:
+                chunk = f.read()
+            if f'"{hashlib.md5(chunk).hexdigest()}"' != etag:
+                raise ValueError(f"ETag mismatch for part {number}")
+            chunks.append(chunk)
+        self.write(self.path(key), b''.join(chunks))
+        self.abort_multipart_upload(key, upload_id)
+
+    def abort_multipart_upload(self, key, upload_id):
+        shutil.rmtree(self.path(os.path.join(self.multipart_dir, upload_id)), ignore_errors=True)
+
+    def list_parts(self, key, upload_id):
+        directory = self.path(os.path.join(self.multipart_dir, upload_id))
+        parts = []
+        for name in sorted(os.listdir(directory), key=lambda name: int(name) if name.isdigit() else 0):
+            if name.isdigit():
+                with open(os.path.join(directory, name), 'rb') as f:
+                    parts.append((int(name), f'"{hashlib.md5(f.read()).hexdigest()}"'))
+        return parts
+
+    def head(self, key):
+        try:
+            return os.path.getsize(self.path(key))
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def list_objects(self, prefix):
+        directory = self.path(prefix.rsplit('/', 1)[0]) if '/' in prefix else self.root
+        objects = []
+        for parent, dirs, files in os.walk(directory):
+            dirs[:] = sorted(name for name in dirs if name != self.multipart_dir)
+            for name in sorted(files):
+                path = os.path.join(parent, name)
+                key = os.path.relpath(path, self.root).replace(os.sep, '/')
+                if key.startswith(prefix) and not name.endswith('.tmp'):
+                    objects.append((key, datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc)))
+        for start in range(0, len(objects), MAX_KEYS):
+            yield objects[start:start + MAX_KEYS]
+
+    def delete_many(self, keys):
+        for key in keys:
+            self.delete(key)
+        return []
+
+    def get_range(self, key, byte_range):
+        path = self.path(key)
+        size = os.path.getsize(path)
+        start, end = byte_range.split('=', 1)[1].split('-')
+        if not start:
+            start, end = max(0, size - int(end)), size - 1
+        else:
+            start, end = int(start), min(int(end), size - 1) if end else size - 1
+        with open(path, 'rb') as f:
+            f.seek(start)
+            data = f.read(max(0, end - start + 1))
+        return data, size, mimetypes.guess_type(key)[0]
+
+
+def get_object_store():
+    return import_string(settings.OBJECT_STORE_BACKEND)()
@@ -0,0 +1,141 @@
+import io
+import struct
+import warnings
+from collections import namedtuple
+from django.conf import settings
+from PIL import Image, UnidentifiedImageError
+from psiagram import metrics
+
+# Cheap local checks run before an upload may cost a Rekognition call: only the
+# first few KiB (format and dimensions from the header) and the last bytes
+# (end-of-image marker) of the object are read, through ranged GETs.
+
+REASONS = (
+    'empty',
+    'too_large',
+    'not_an_image',
+    'unsupported_format',
+    'content_type_mismatch',
+    'too_many_pixels',
+    'bad_aspect_ratio',
+    'truncated',
+)
+ACCEPTED_METRIC = 'uploads.prevalidation.accepted'
+TAIL_BYTES = 16
+GENERIC_CONTENT_TYPES = ('', 'application/octet-stream', 'binary/octet-stream')
+
+ImageInfo = namedtuple('ImageInfo', ['format', 'width', 'height', 'size'])
+
+
+class UploadRejected(Exception):
+    def __init__(self, reason, message=None):
+        self.reason = reason
+        super().__init__(message or reason.replace('_', ' '))
+
+
+def rejection_metric(reason):
+    return f'uploads.prevalidation.rejected.{reason}'
+
+
+def metric_names():
+    return [ACCEPTED_METRIC] + [rejection_metric(reason) for reason in REASONS]
+
+
+def _normalize_content_type(content_type):
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    return 'image/jpeg' if content_type == 'image/jpg' else content_type
+
+
+def _is_complete(image_format, tail, header, size):
+    if image_format == 'JPEG':
+        # EOI marker; a few padding bytes after it are tolerated
+        return b'\xff\xd9' in tail
+    if image_format == 'PNG':
+        return b'IEND' in tail
+    if image_format == 'WEBP':
+        # RIFF chunk size covers everything after the first 8 bytes
+        return len(header) >= 8 and struct.unpack('<I', header[4:8])[0] + 8 <= size
+    return True
+
+
+def check(header, size, content_type=None, tail=None):
+    """
+    Validate an image from its first bytes (`header`), total `size`, declared
+    `content_type` and last bytes (`tail`). Returns ImageInfo or raises UploadRejected.
+    """
+    if size <= 0:
+        raise UploadRejected('empty')
+    if size > settings.UPLOAD_MAX_BYTES:
+        raise UploadRejected('too_large', f"File is larger than {settings.UPLOAD_MAX_BYTES} bytes.")
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            with Image.open(io.BytesIO(header)) as image:
+                image_format, (width, height) = image.format, image.size
+    except Image.DecompressionBombError:
+        raise UploadRejected('too_many_pixels')
+    except (UnidentifiedImageError, OSError, SyntaxError, ValueError):
+        raise UploadRejected('not_an_image')
+
+    if image_format not in settings.UPLOAD_ALLOWED_FORMATS:
+        raise UploadRejected('unsupported_format', f"{image_format} images are not accepted.")
+
+    declared = _normalize_content_type(content_type)
+    if declared not in GENERIC_CONTENT_TYPES and declared != Image.MIME.get(image_format):
+        raise UploadRejected('content_type_mismatch', f"Declared {declared} but the file is {image_format}.")
+
+    if width * height > settings.UPLOAD_MAX_PIXELS:
+        raise UploadRejected('too_many_pixels')
+    if max(width, height) > settings.UPLOAD_MAX_ASPECT_RATIO * max(1, min(width, height)):
+        raise UploadRejected('bad_aspect_ratio')
+
+    if tail is not None and not _is_complete(image_format, tail, header, size):
+        raise UploadRejected('truncated')
+
+    return ImageInfo(image_format, width, height, size)
+
+
+def record(func, *args, **kwargs):
+    """
+    Run a check and count its outcome in the prevalidation metrics.
+    """
+    try:
+        info = func(*args, **kwargs)
+    except UploadRejected as e:
+        metrics.increment(rejection_metric(e.reason))
+        raise
+    metrics.increment(ACCEPTED_METRIC)
+    return info
+
+
+def check_bytes(data, content_type=None):
+    """
+    Validate a file that is already in memory.
+    """
+    header = data[:settings.UPLOAD_PREVALIDATION_BYTES]
+    return record(check, header, len(data), content_type, data[-TAIL_BYTES:])
+
+
+def _check_object(store, key):
+    length = settings.UPLOAD_PREVALIDATION_BYTES
+    header, size, content_type = store.get_range(key, f'bytes=0-{length - 1}')
+    try:
+        check(header, size, content_type)
+    except UploadRejected as e:
+        # Large EXIF/ICC blocks can push the JPEG dimensions past the first range
+        if e.reason != 'not_an_image' or len(header) >= size:
+            raise
+        header, size, content_type = store.get_range(key, f'bytes=0-{length * 16 - 1}')
+
+    tail = header[-TAIL_BYTES:]
+    if size > len(header):
+        tail, _, _ = store.get_range(key, f'bytes=-{TAIL_BYTES}')
+    return check(header, size, content_type, tail)
+
+
+def check_object(store, key):
+    """
+    Validate a stored object (see objectstores) with at most three small ranged reads.
+    """
+    return record(_check_object, store, key)
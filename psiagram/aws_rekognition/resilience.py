@@ -0,0 +1,204 @@
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from psiagram import metrics
+
+# Load shedding around labeling calls. When Rekognition slows down or throttles,
+# callers should fail fast instead of holding a gunicorn thread until the read
+# timeout:
+# - CircuitBreaker: shared by all processes through the cache. Opens when too
+#   many calls of the current window fail or are slow, rejects calls while
+#   open, then lets a single probe through (half-open) to decide whether to close.
+# - AdaptiveLimiter: per process, caps concurrent calls; the cap halves on a
+#   failure or slow call and grows back by ~1 per `limit` good calls (AIMD).
+# - A retry budget: the Rekognition client makes a single attempt (see
+#   clients.client_config), and a failed call is retried once here, only while
+#   retries stay under LABELER_RETRY_BUDGET of the window's calls, so retries
+#   cannot multiply the load on a struggling service.
+
+OPENED_METRIC = 'labeler.breaker.opened'
+HALF_OPEN_METRIC = 'labeler.breaker.half_open'
+CLOSED_METRIC = 'labeler.breaker.closed'
+REJECTED_OPEN_METRIC = 'labeler.rejected.circuit_open'
+REJECTED_CONCURRENCY_METRIC = 'labeler.rejected.concurrency'
+RETRY_METRIC = 'labeler.retries'
+RETRY_BUDGET_EXHAUSTED_METRIC = 'labeler.retry_budget_exhausted'
+
+
+def metric_names():
+    return [
+        OPENED_METRIC,
+        HALF_OPEN_METRIC,
+        CLOSED_METRIC,
+        REJECTED_OPEN_METRIC,
+        REJECTED_CONCURRENCY_METRIC,
+        RETRY_METRIC,
+        RETRY_BUDGET_EXHAUSTED_METRIC,
+    ]
+
+
+class LabelerUnavailable(Exception):
+    """
+    A labeling call was shed; try again after `retry_after` seconds.
+    """
+    def __init__(self, message, retry_after):
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+def _count(key, timeout):
+    if not cache.add(key, 1, timeout=timeout):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, timeout=timeout)
+
+
+class CircuitBreaker:
+    def __init__(self, name='labeler'):
+        self.prefix = f'breaker:{name}:'
+
+    def window_key(self, field, now=None):
+        window = settings.LABELER_BREAKER_WINDOW
+        return f'{self.prefix}{int((now or time.time()) // window)}:{field}'
+
+    def window_counts(self):
+        keys = [self.window_key(field) for field in ('calls', 'failures', 'retries')]
+        values = cache.get_many(keys)
+        return [values.get(key, 0) for key in keys]
+
+    def state(self):
+        open_until = cache.get(self.prefix + 'open_until')
+        if open_until is None:
+            return 'closed'
+        return 'open' if time.time() < open_until else 'half_open'
+
+    def allow(self):
+        """
+        (allowed, probe): whether a call may go ahead now. In the half-open
+        state only one caller (across all processes) gets through, as the probe.
+        """
+        open_until = cache.get(self.prefix + 'open_until')
+        if open_until is None:
+            return True, False
+        if time.time() < open_until:
+            return False, False
+        # The probe lock expires on its own, should the prober die
+        if cache.add(self.prefix + 'probe', 1, timeout=max(1, int(settings.LABELER_SLOW_CALL_SECONDS * 2))):
+            metrics.increment(HALF_OPEN_METRIC)
+            return True, True
+        return False, False
+
+    def retry_after(self):
+        open_until = cache.get(self.prefix + 'open_until')
+        return max(1, int(open_until - time.time()) if open_until else 1)
+
+    def record(self, ok, probe=False):
+        timeout = settings.LABELER_BREAKER_WINDOW * 2
+        _count(self.window_key('calls'), timeout)
+        if not ok:
+            _count(self.window_key('failures'), timeout)
+
+        if probe:
+            if ok:
+                cache.delete_many([self.prefix + 'open_until', self.prefix + 'probe'])
+                metrics.increment(CLOSED_METRIC)
+            else:
+                self.open()
+            return
+
+        if not ok and self.state() == 'closed':
+            calls, failures, _ = self.window_counts()
+            if calls >= settings.LABELER_BREAKER_MIN_CALLS and failures / calls >= settings.LABELER_BREAKER_FAILURE_RATE:
+                self.open()
+
+    def open(self):
+        cache.set(self.prefix + 'open_until', time.time() + settings.LABELER_BREAKER_OPEN_SECONDS, timeout=None)
+        cache.delete(self.prefix + 'probe')
+        metrics.increment(OPENED_METRIC)
+
+    def allow_retry(self):
+        calls, _, retries = self.window_counts()
+        if retries >= max(1, settings.LABELER_RETRY_BUDGET * calls):
+            metrics.increment(RETRY_BUDGET_EXHAUSTED_METRIC)
+            return False
+        _count(self.window_key('retries'), settings.LABELER_BREAKER_WINDOW * 2)
+        metrics.increment(RETRY_METRIC)
+        return True
+
+
+class AdaptiveLimiter:
+    def __init__(self):
+        self.limit = float(settings.LABELER_MAX_CONCURRENCY)
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+    def try_acquire(self):
+        with self.lock:
+            if self.in_flight >= min(int(self.limit), settings.LABELER_MAX_CONCURRENCY):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, ok):
+        with self.lock:
+            self.in_flight -= 1
+            if ok:
+                self.limit = min(settings.LABELER_MAX_CONCURRENCY, self.limit + 1 / self.limit)
+            else:
+                self.limit = max(1.0, self.limit / 2)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = AdaptiveLimiter()
+    return _limiter
+
+
+class GuardedLabeler:
+    """
+    Wraps a labeler (see labelers.get_labeler) with the breaker, the limiter
+    and the retry budget. Shed calls raise LabelerUnavailable.
+    """
+
+    def __init__(self, labeler, breaker=None, limiter=None):
+        self.labeler = labeler
+        self.breaker = breaker or CircuitBreaker()
+        self.limiter = limiter or get_limiter()
+
+    def detect_labels(self, bucket, key):
+        try:
+            return self.call(bucket, key)
+        except LabelerUnavailable:
+            raise
+        except Exception:
+            if not self.breaker.allow_retry():
+                raise
+        return self.call(bucket, key)
+
+    def call(self, bucket, key):
+        allowed, probe = self.breaker.allow()
+        if not allowed:
+            metrics.increment(REJECTED_OPEN_METRIC)
+            raise LabelerUnavailable("Labeling circuit is open.", self.breaker.retry_after())
+        if not self.limiter.try_acquire():
+            metrics.increment(REJECTED_CONCURRENCY_METRIC)
+            raise LabelerUnavailable("Too many labeling calls in flight.", 1)
+
+        ok = False
+        start = time.monotonic()
+        try:
+            labels = self.labeler.detect_labels(bucket, key)
+            ok = time.monotonic() - start < settings.LABELER_SLOW_CALL_SECONDS
+            return labels
+        finally:
+            self.limiter.release(ok)
+            self.breaker.record(ok, probe)
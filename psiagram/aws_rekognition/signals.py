@@ -0,0 +1,21 @@
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from posts.models import Post
+from . import clients, dedup
+
+
+@receiver(setting_changed)
+def reset_clients_on_setting_change(sender, setting, **kwargs):
+    # Shared clients are built from the AWS_* settings (e.g. override_settings in tests)
+    if setting.startswith('AWS_'):
+        clients.reset_clients()
+
+
+@receiver(post_delete, sender=Post)
+def release_image_on_post_delete(sender, instance, **kwargs):
+    # Shared images are deleted with their last post
+    if instance.image:
+        key = instance.image.name
+        transaction.on_commit(lambda: dedup.release(key))
@@ -1,3 +1,867 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+from PIL import Image
+from rest_framework.test import APITestCase
+from psiagram import metrics, renditions
+from psiagram.testing import TEST_STORAGES, make_user
+from posts.models import Post, TimelineEntry
+from profiles.models import UserProfile
+from . import clients, jobs, prevalidation, resilience, uploads
+from .labelers import FakeLabeler
+from .models import ImageJob, StagedUpload, UploadedImage, VerificationJob
+from .objectstores import FilesystemObjectStore, S3ObjectStore
 
-# Create your tests here.
+User = get_user_model()
+
+
+class FailingLabeler:
+    def detect_labels(self, bucket, key):
+        raise ConnectionError("Rekognition unavailable")
+
+
+class CatLabeler:
+    def detect_labels(self, bucket, key):
+        return [{'Name': 'Cat', 'Confidence': 98.0}]
+
+
+class ThrottledLabeler:
+    calls = 0
+
+    def detect_labels(self, bucket, key):
+        ThrottledLabeler.calls += 1
+        raise ClientError({'Error': {'Code': 'ThrottlingException'}}, 'DetectLabels')
+
+
+class CountingLabeler:
+    calls = 0
+
+    def detect_labels(self, bucket, key):
+        CountingLabeler.calls += 1
+        return [{'Name': 'Dog', 'Confidence': 97.0}]
+
+
+def image_upload(name='dog.jpg', image_format='JPEG'):
+    # A gradient, so the perceptual hash has something to look at
+    image = Image.new('RGB', (64, 64))
+    image.putdata([(x * 4, y * 4, 128) for y in range(64) for x in range(64)])
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format)
+    content_type = 'image/png' if image_format == 'PNG' else 'image/jpeg'
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=content_type)
+
+
+def run_worker():
+    call_command('process_verification_jobs', '--once', '--workers', '1', stdout=io.StringIO())
+
+
+@override_settings(AWS_ACCESS_KEY_ID='test', AWS_SECRET_ACCESS_KEY='test', AWS_REGION_NAME='eu-central-1')
+class ClientRegistryTests(SimpleTestCase):
+    def setUp(self):
+        clients.reset_clients()
+
+    def test_client_is_shared_across_threads(self):
+        seen = []
+        threads = [threading.Thread(target=lambda: seen.append(clients.get_s3_client())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len({id(client) for client in seen}), 1)
+        self.assertIsNot(clients.get_rekognition_client(), seen[0])
+
+    @override_settings(AWS_CLIENT_MAX_POOL_CONNECTIONS=7, AWS_CLIENT_RETRY_MODE='adaptive', AWS_CLIENT_READ_TIMEOUT=3)
+    def test_client_uses_configured_pool_and_retries(self):
+        config = clients.get_s3_client().meta.config
+
+        self.assertEqual(config.max_pool_connections, 7)
+        self.assertEqual(config.retries['mode'], 'adaptive')
+        self.assertEqual(config.read_timeout, 3)
+
+    @override_settings(LABELER_READ_TIMEOUT=4)
+    def test_rekognition_client_makes_one_short_attempt(self):
+        config = clients.get_rekognition_client().meta.config
+
+        self.assertEqual(config.read_timeout, 4)
+        self.assertEqual(config.retries['total_max_attempts'], 1)
+
+    def test_reset_builds_a_new_client(self):
+        client = clients.get_s3_client()
+        clients.reset_clients()
+
+        self.assertIsNot(clients.get_s3_client(), client)
+
+
+@override_settings(STORAGES=TEST_STORAGES, VERIFICATION_LABELER='aws_rekognition.labelers.FakeLabeler')
+class VerificationPipelineTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = make_user('author')
+        self.client.force_authenticate(self.author)
+
+    def test_new_post_is_pending_until_worker_approves_it(self):
+        response = self.client.post(reverse('post-create'), {'image': image_upload()}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        post = Post.objects.get(pk=response.data['id'])
+
+        self.assertEqual(post.verification_status, Post.VerificationStatus.PENDING)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+
+        run_worker()
+
+        post.refresh_from_db()
+        self.assertEqual(post.verification_status, Post.VerificationStatus.APPROVED)
+        self.assertEqual(post.rekognition_labels[0]['Name'], 'Dog')
+        self.assertTrue(TimelineEntry.objects.filter(owner=self.author, post=post).exists())
+        self.assertEqual(post.verification_jobs.get().status, VerificationJob.Status.DONE)
+        self.assertEqual(post.image_renditions['source'], post.image.name)
+
+    @override_settings(VERIFICATION_LABELER='aws_rekognition.tests.CatLabeler')
+    def test_post_without_dog_is_rejected(self):
+        post = Post.objects.create(author=self.author, image='posts/cat.jpg')
+        jobs.enqueue_verification(post)
+
+        run_worker()
+
+        post.refresh_from_db()
+        self.assertEqual(post.verification_status, Post.VerificationStatus.REJECTED)
+        self.assertEqual(post.rekognition_labels, [{'Name': 'Cat', 'Confidence': 98.0}])
+
+
+@override_settings(
+    VERIFICATION_LABELER='aws_rekognition.tests.FailingLabeler',
+    VERIFICATION_MAX_ATTEMPTS=2,
+    VERIFICATION_RETRY_BACKOFF=60,
+)
+class VerificationRetryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(author=make_user('author'), image='posts/dog.jpg')
+        self.job = jobs.enqueue_verification(self.post)
+
+    def make_runnable(self):
+        VerificationJob.objects.filter(pk=self.job.pk).update(available_at=timezone.now())
+
+    def test_failures_back_off_then_fail(self):
+        run_worker()
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.attempts), (VerificationJob.Status.QUEUED, 1))
+        self.assertGreater(self.job.available_at, timezone.now() + timedelta(seconds=20))
+        self.assertIn('unavailable', self.job.last_error)
+
+        # Still backing off
+        run_worker()
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.attempts, 1)
+
+        self.make_runnable()
+        run_worker()
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.attempts), (VerificationJob.Status.FAILED, 2))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.verification_status, Post.VerificationStatus.REJECTED)
+
+    def test_job_of_dead_worker_is_reclaimed_after_visibility_timeout(self):
+        [claimed] = jobs.claim_jobs(limit=1)
+        self.assertEqual(jobs.claim_jobs(limit=1), [])
+
+        self.make_runnable()
+        [reclaimed] = jobs.claim_jobs(limit=1)
+        self.assertEqual((reclaimed.pk, reclaimed.attempts), (claimed.pk, 2))
+
+        # The first worker's late result no longer counts
+        jobs.finish(claimed, VerificationJob.Status.DONE)
+        reclaimed.refresh_from_db()
+        self.assertEqual(reclaimed.status, VerificationJob.Status.RUNNING)
+
+    def test_job_of_dead_worker_fails_after_last_attempt(self):
+        for _ in range(2):
+            self.make_runnable()
+            self.assertEqual(len(jobs.claim_jobs(limit=1)), 1)
+
+        self.make_runnable()
+        self.assertEqual(jobs.claim_jobs(limit=1), [])
+
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.attempts), (VerificationJob.Status.FAILED, 2))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.verification_status, Post.VerificationStatus.REJECTED)
+
+
+@override_settings(STORAGES=TEST_STORAGES, VERIFICATION_LABELER='aws_rekognition.tests.CountingLabeler')
+class UploadDedupTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        CountingLabeler.calls = 0
+        self.author = make_user('author')
+        self.client.force_authenticate(self.author)
+
+    def create_post(self, upload):
+        response = self.client.post(reverse('post-create'), {'image': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return Post.objects.get(pk=response.data['id'])
+
+    def test_repost_shares_object_and_verdict(self):
+        first = self.create_post(image_upload('a.jpg'))
+        second = self.create_post(image_upload('b.jpg'))
+        run_worker()
+
+        self.assertEqual(first.image.name, second.image.name)
+        upload = UploadedImage.objects.get()
+        self.assertEqual(upload.ref_count, 2)
+        self.assertEqual(CountingLabeler.calls, 1)
+        self.assertEqual(
+            set(Post.objects.values_list('verification_status', flat=True)),
+            {Post.VerificationStatus.APPROVED},
+        )
+
+    @override_settings(UPLOAD_PERCEPTUAL_HASH=True)
+    def test_near_duplicate_is_labeled_again(self):
+        first = self.create_post(image_upload('a.jpg'))
+        run_worker()
+        second = self.create_post(image_upload('a.png', image_format='PNG'))
+        run_worker()
+
+        self.assertNotEqual(first.image.name, second.image.name)
+        # Same perceptual hash, but only identical bytes share a verdict
+        hashes = set(UploadedImage.objects.values_list('perceptual_hash', flat=True))
+        self.assertEqual(len(hashes), 1)
+        self.assertEqual(CountingLabeler.calls, 2)
+
+    def test_last_reference_deletes_object(self):
+        first = self.create_post(image_upload('a.jpg'))
+        second = self.create_post(image_upload('b.jpg'))
+        key = first.image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(default_storage.exists(key))
+        self.assertEqual(UploadedImage.objects.get().ref_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(default_storage.exists(key))
+        self.assertFalse(UploadedImage.objects.exists())
+
+    def test_last_reference_deletes_renditions(self):
+        post = self.create_post(image_upload('a.jpg'))
+        renditions.refresh(Post, post.pk, 'image', 'post')
+        keys = [key for files in Post.objects.get(pk=post.pk).image_renditions['files'].values() for key in files.values()]
+        self.assertTrue(keys)
+        self.assertTrue(all(default_storage.exists(key) for key in keys))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        self.assertFalse(any(default_storage.exists(key) for key in keys))
+
+
+@override_settings(
+    AWS_ACCESS_KEY_ID='test',
+    AWS_SECRET_ACCESS_KEY='test',
+    AWS_S3_BUCKET_NAME='bucket',
+    UPLOAD_MULTIPART_THRESHOLD=10 * 1024 * 1024,
+    UPLOAD_MULTIPART_PART_SIZE=5 * 1024 * 1024,
+    UPLOAD_BATCH_MAX_FILES=3,
+)
+class UploadInitiationTests(APITestCase):
+    def setUp(self):
+        self.user = make_user('uploader')
+        self.client.force_authenticate(self.user)
+        self.stubber = Stubber(clients.get_s3_client())
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+
+    def test_batch_presigns_single_and_multipart_uploads(self):
+        self.stubber.add_response(
+            'create_multipart_upload',
+            {'UploadId': 'upload-1', 'Bucket': 'bucket', 'Key': 'uploads/big.jpg'},
+        )
+        response = self.client.post(reverse('initiate-uploads'), {'files': [
+            {'filename': 'small.jpg', 'content_type': 'image/jpeg', 'size': 1024},
+            {'filename': 'big.jpg', 'content_type': 'image/jpeg', 'size': 12 * 1024 * 1024},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        small, big = response.data['uploads']
+        self.assertIn('upload_url', small)
+        self.assertTrue(small['file_key'].startswith(timezone.now().strftime('posts/%Y/%m/%d/')))
+        self.assertEqual(big['upload_id'], 'upload-1')
+        self.assertEqual([part['part_number'] for part in big['parts']], [1, 2, 3])
+        self.assertIn('partNumber=2', big['parts'][1]['url'])
+        self.stubber.assert_no_pending_responses()
+
+    @override_settings(UPLOAD_MAX_BYTES=20 * 1024 * 1024, UPLOAD_MULTIPART_MAX_PARTS=2)
+    def test_size_and_part_count_are_capped(self):
+        response = self.client.post(reverse('initiate-upload'), {
+            'filename': 'huge.jpg', 'content_type': 'image/jpeg', 'size': 20 * 1024 * 1024 + 1,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StagedUpload.objects.exists())
+
+        self.stubber.add_response('create_multipart_upload', {'UploadId': 'upload-1'})
+        response = self.client.post(reverse('initiate-upload'), {
+            'filename': 'big.jpg', 'content_type': 'image/jpeg', 'size': 20 * 1024 * 1024,
+        }, format='json')
+        self.assertEqual(len(response.data['parts']), 2)
+        self.assertEqual(response.data['part_size'], 10 * 1024 * 1024)
+
+        too_many = [{'part_number': n, 'etag': '"a"'} for n in range(1, 4)]
+        response = self.client.post(reverse('multipart-upload-complete'), {
+            'file_key': response.data['file_key'], 'upload_id': 'upload-1', 'parts': too_many,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.stubber.assert_no_pending_responses()
+
+    def test_batch_rejects_invalid_entry_before_starting_uploads(self):
+        response = self.client.post(reverse('initiate-uploads'), {'files': [
+            {'filename': 'big.jpg', 'content_type': 'image/jpeg', 'size': 12 * 1024 * 1024},
+            {'filename': 'broken.jpg'},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_complete_sends_parts_in_order(self):
+        StagedUpload.objects.create(key='uploads/big.jpg', user=self.user)
+        self.stubber.add_response('complete_multipart_upload', {}, {
+            'Bucket': 'bucket',
+            'Key': 'uploads/big.jpg',
+            'UploadId': 'upload-1',
+            'MultipartUpload': {'Parts': [{'PartNumber': 1, 'ETag': '"a"'}, {'PartNumber': 2, 'ETag': '"b"'}]},
+        })
+        response = self.client.post(reverse('multipart-upload-complete'), {
+            'file_key': 'uploads/big.jpg',
+            'upload_id': 'upload-1',
+            'parts': [{'part_number': 2, 'etag': '"b"'}, {'part_number': 1, 'etag': '"a"'}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.stubber.assert_no_pending_responses()
+
+    def test_resume_presigns_missing_parts_only(self):
+        StagedUpload.objects.create(key='uploads/big.jpg', user=self.user)
+        self.stubber.add_response('list_parts', {'Parts': [{'PartNumber': 2, 'ETag': '"b"'}], 'IsTruncated': False})
+        response = self.client.post(reverse('multipart-upload-resume'), {
+            'file_key': 'uploads/big.jpg', 'upload_id': 'upload-1', 'size': 12 * 1024 * 1024,
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['uploaded_parts'], [{'part_number': 2, 'etag': '"b"'}])
+        self.assertEqual([part['part_number'] for part in response.data['parts']], [1, 3])
+
+    def test_abort_only_touches_own_unclaimed_keys(self):
+        StagedUpload.objects.create(key='posts/2026/01/01/used.jpg', user=self.user, status=StagedUpload.Status.PROMOTED)
+        StagedUpload.objects.create(key='posts/2026/01/01/other.jpg', user=make_user('other'))
+        for key in ('posts/2026/01/01/dog.jpg', 'posts/2026/01/01/used.jpg', 'posts/2026/01/01/other.jpg'):
+            response = self.client.post(reverse('multipart-upload-abort'), {
+                'file_key': key, 'upload_id': 'upload-1',
+            }, format='json')
+
+            self.assertEqual(response.status_code, 400)
+
+
+def s3_body(data):
+    return StreamingBody(io.BytesIO(data), len(data))
+
+
+class PrevalidationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.data = image_upload().read()
+
+    def test_accepts_valid_image(self):
+        info = prevalidation.check_bytes(self.data, 'image/jpeg')
+
+        self.assertEqual((info.format, info.width, info.height), ('JPEG', 64, 64))
+
+    def test_rejection_reasons(self):
+        png = image_upload('dog.png', 'PNG').read()
+        wide = io.BytesIO()
+        Image.new('RGB', (900, 10)).save(wide, format='PNG')
+        cases = [
+            (b'', 'image/jpeg', 'empty'),
+            (b'not an image at all', 'image/jpeg', 'not_an_image'),
+            (self.data[:-200], 'image/jpeg', 'truncated'),
+            (png, 'image/jpeg', 'content_type_mismatch'),
+            (wide.getvalue(), 'image/png', 'bad_aspect_ratio'),
+        ]
+        for data, content_type, reason in cases:
+            with self.subTest(reason=reason), self.assertRaises(prevalidation.UploadRejected) as ctx:
+                prevalidation.check_bytes(data, content_type)
+            self.assertEqual(ctx.exception.reason, reason)
+
+    @override_settings(UPLOAD_MAX_PIXELS=1000)
+    def test_rejects_too_many_pixels(self):
+        with self.assertRaises(prevalidation.UploadRejected) as ctx:
+            prevalidation.check_bytes(self.data, 'image/jpeg')
+        self.assertEqual(ctx.exception.reason, 'too_many_pixels')
+
+    def test_outcomes_are_counted(self):
+        prevalidation.check_bytes(self.data, 'image/jpeg')
+        with self.assertRaises(prevalidation.UploadRejected):
+            prevalidation.check_bytes(self.data[:-200], 'image/jpeg')
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'Password123!'))
+
+        response = self.client.get(reverse('upload-metrics'))
+
+        self.assertEqual(response.data[prevalidation.ACCEPTED_METRIC], 1)
+        self.assertEqual(response.data[prevalidation.rejection_metric('truncated')], 1)
+        self.assertEqual(response.data[prevalidation.rejection_metric('empty')], 0)
+
+
+@override_settings(
+    AWS_ACCESS_KEY_ID='test', AWS_SECRET_ACCESS_KEY='test', AWS_REGION_NAME='eu-central-1',
+    AWS_S3_BUCKET_NAME='bucket', UPLOAD_PREVALIDATION_BYTES=1024,
+)
+class PrevalidationObjectTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        # Bigger than the header range, so the tail is a separate request
+        buffer = io.BytesIO()
+        Image.effect_noise((256, 256), 64).convert('RGB').save(buffer, format='JPEG')
+        self.data = buffer.getvalue()
+        self.user = make_user('uploader')
+        self.client.force_authenticate(self.user)
+        StagedUpload.objects.create(key='uploads/dog.jpg', user=self.user)
+        self.stubber = Stubber(clients.get_s3_client())
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+
+    def add_range(self, start, end, data=None):
+        data = self.data if data is None else data
+        end = min(end, len(data) - 1)
+        self.stubber.add_response('get_object', {
+            'Body': s3_body(data[start:end + 1]),
+            'ContentRange': f'bytes {start}-{end}/{len(data)}',
+            'ContentType': 'image/jpeg',
+        }, {'Bucket': 'bucket', 'Key': 'uploads/dog.jpg', 'Range': f'bytes=0-{end}' if start == 0 else 'bytes=-16'})
+
+    def test_reads_header_and_tail_only(self):
+        self.add_range(0, 1023)
+        self.add_range(len(self.data) - 16, len(self.data) - 1)
+
+        info = prevalidation.check_object(S3ObjectStore(), 'uploads/dog.jpg')
+
+        self.assertEqual(info.size, len(self.data))
+        self.stubber.assert_no_pending_responses()
+
+    @override_settings(VERIFICATION_LABELER='aws_rekognition.tests.CountingLabeler')
+    def test_upload_complete_rejects_truncated_upload_without_rekognition(self):
+        CountingLabeler.calls = 0
+        truncated = self.data[:-200]
+        self.add_range(0, 1023, truncated)
+        self.add_range(len(truncated) - 16, len(truncated) - 1, truncated)
+        self.stubber.add_response('delete_object', {}, {'Bucket': 'bucket', 'Key': 'uploads/dog.jpg'})
+
+        response = self.client.post(reverse('upload-complete'), {'file_key': 'uploads/dog.jpg'}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['reason'], 'truncated')
+        self.assertEqual(CountingLabeler.calls, 0)
+        self.stubber.assert_no_pending_responses()
+
+    def test_rejected_upload_cannot_be_claimed(self):
+        key = 'posts/2026/01/01/dog.jpg'
+        StagedUpload.objects.create(key=key, user=self.user)
+        self.stubber.add_response('delete_object', {}, {'Bucket': 'bucket', 'Key': key})
+        with patch.object(prevalidation, 'check_object', side_effect=prevalidation.UploadRejected('truncated')):
+            response = self.client.post(reverse('upload-complete'), {'file_key': key}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(reverse('post-create'), {'s3_key': key}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('s3_key', response.data)
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(VERIFICATION_LABELER='aws_rekognition.tests.CountingLabeler')
+    def test_upload_complete_never_labels(self):
+        CountingLabeler.calls = 0
+        with patch.object(prevalidation, 'check_object'):
+            response = self.client.post(reverse('upload-complete'), {'file_key': 'uploads/dog.jpg'}, format='json')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertEqual(CountingLabeler.calls, 0)
+
+    def test_upload_complete_only_touches_own_staged_uploads(self):
+        self.client.force_authenticate(make_user('other'))
+        response = self.client.post(reverse('upload-complete'), {'file_key': 'uploads/dog.jpg'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        StagedUpload.objects.filter(key='uploads/dog.jpg').update(status=StagedUpload.Status.PROMOTED)
+        self.client.force_authenticate(self.user)
+        response = self.client.post(reverse('upload-complete'), {'file_key': 'uploads/dog.jpg'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        # No read, no delete
+        self.stubber.assert_no_pending_responses()
+
+
+@override_settings(
+    STORAGES=TEST_STORAGES,
+    VERIFICATION_LABELER='aws_rekognition.tests.CountingLabeler',
+    AWS_ACCESS_KEY_ID='test', AWS_SECRET_ACCESS_KEY='test', AWS_REGION_NAME='eu-central-1',
+    AWS_S3_BUCKET_NAME='bucket',
+)
+class UploadPromotionTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        CountingLabeler.calls = 0
+        self.author = make_user('author')
+        self.client.force_authenticate(self.author)
+        # Any S3 call without a queued response fails the test
+        self.stubber = Stubber(clients.get_s3_client())
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+
+    def upload(self, purpose='post'):
+        response = self.client.post(reverse('initiate-upload'), {
+            'filename': 'dog.jpg', 'content_type': 'image/jpeg', 'purpose': purpose,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        key = response.data['file_key']
+        default_storage.save(key, image_upload())
+        return key
+
+    def test_post_from_key_is_promoted_without_s3_calls(self):
+        key = self.upload()
+
+        response = self.client.post(reverse('post-create'), {'s3_key': key}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Post.objects.get().image.name, key)
+        self.assertEqual(StagedUpload.objects.get(key=key).status, StagedUpload.Status.PROMOTED)
+        self.stubber.assert_no_pending_responses()
+
+        # A key is used once, and only by its uploader
+        again = self.client.post(reverse('post-create'), {'s3_key': key}, format='json')
+        self.assertEqual(again.status_code, 400)
+        other_key = self.upload()
+        self.client.force_authenticate(make_user('other'))
+        stolen = self.client.post(reverse('post-create'), {'s3_key': other_key}, format='json')
+        self.assertEqual(stolen.status_code, 400)
+
+    def test_worker_deduplicates_promoted_uploads(self):
+        first_key, second_key = self.upload(), self.upload()
+        for key in (first_key, second_key):
+            self.client.post(reverse('post-create'), {'s3_key': key}, format='json')
+
+        run_worker()
+
+        self.assertEqual(set(Post.objects.values_list('image', flat=True)), {first_key})
+        self.assertEqual(UploadedImage.objects.get().ref_count, 2)
+        self.assertFalse(default_storage.exists(second_key))
+        self.assertEqual(CountingLabeler.calls, 1)
+
+    def test_worker_rejects_broken_upload_without_labeling(self):
+        key = self.upload()
+        default_storage.delete(key)
+        default_storage.save(key, SimpleUploadedFile('dog.jpg', b'not an image'))
+        self.client.post(reverse('post-create'), {'s3_key': key}, format='json')
+
+        run_worker()
+
+        post = Post.objects.get()
+        self.assertEqual(post.verification_status, Post.VerificationStatus.REJECTED)
+        self.assertEqual(post.verification_jobs.get().status, VerificationJob.Status.DONE)
+        self.assertEqual(CountingLabeler.calls, 0)
+
+    def test_legacy_keys_are_not_claimable(self):
+        response = self.client.post(reverse('post-create'), {'s3_key': 'uploads/1234_dog.jpg'}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StagedUpload.objects.exists())
+
+
+class FilesystemObjectStoreTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        settings = override_settings(
+            OBJECT_STORE_BACKEND='aws_rekognition.objectstores.FilesystemObjectStore',
+            OBJECT_STORE_ROOT=root.name,
+            STORAGES={
+                'default': {
+                    'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                    'OPTIONS': {'location': root.name},
+                },
+                'staticfiles': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+            },
+            VERIFICATION_LABELER='aws_rekognition.labelers.FakeLabeler',
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.store = FilesystemObjectStore()
+        self.client.force_authenticate(make_user('author'))
+
+    def test_upload_pipeline_end_to_end(self):
+        data = image_upload().read()
+        upload = self.client.post(reverse('initiate-upload'), {
+            'filename': 'dog.jpg', 'content_type': 'image/jpeg',
+        }, format='json').data
+
+        put = self.client.put(upload['upload_url'], data, content_type='image/jpeg')
+        self.assertEqual(put.status_code, 200)
+        complete = self.client.post(reverse('upload-complete'), {'file_key': upload['file_key']}, format='json')
+        self.assertEqual((complete.status_code, complete.data['status']), (202, 'pending'))
+        created = self.client.post(reverse('post-create'), {'s3_key': upload['file_key']}, format='json')
+        run_worker()
+
+        post = Post.objects.get(pk=created.data['id'])
+        self.assertEqual(post.verification_status, Post.VerificationStatus.APPROVED)
+        self.assertEqual(self.store.head(post.image.name), len(data))
+        self.assertTrue(post.image_renditions['files']['jpeg'])
+
+    def test_avatar_upload_is_checked_by_the_worker(self):
+        upload = self.client.post(reverse('initiate-upload'), {
+            'filename': 'me.jpg', 'content_type': 'image/jpeg', 'purpose': 'avatar',
+        }, format='json').data
+        self.client.put(upload['upload_url'], b'not an image', content_type='image/jpeg')
+        profile = UserProfile.objects.get(user__username='author')
+
+        response = self.client.patch(
+            reverse('profile-detail', args=[profile.pk]), {'s3_key': upload['file_key']}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        run_worker()
+
+        profile.refresh_from_db()
+        self.assertFalse(profile.avatar)
+        self.assertIsNone(self.store.head(upload['file_key']))
+        self.assertIn('not an image', ImageJob.objects.get().last_error)
+
+    def test_multipart_upload(self):
+        key = uploads.upload_key('big.jpg')
+        upload_id = self.store.create_multipart_upload(key, 'image/jpeg')
+        etags = []
+        for number, chunk in enumerate([b'a' * 10, b'b' * 5], start=1):
+            url = self.store.presign_part(key, upload_id, number, 60)
+            etags.append((number, self.client.put(url, chunk, content_type='application/octet-stream')['ETag']))
+
+        self.assertEqual(self.store.list_parts(key, upload_id), etags)
+        self.store.complete_multipart_upload(key, upload_id, etags)
+        self.assertEqual(self.store.get_range(key, 'bytes=-6'), (b'abbbbb', 15, 'image/jpeg'))
+
+    def test_rejects_tampered_token_and_keys_outside_root(self):
+        url = self.store.presign_put('posts/dog.jpg', 'image/jpeg', 60)
+
+        tampered = url[:-2] + ('A' if url[-2] != 'A' else 'B') + '/'
+        response = self.client.put(tampered, b'data', content_type='image/jpeg')
+
+        self.assertEqual(response.status_code, 403)
+        with self.assertRaises(ValueError):
+            self.store.path('../outside.jpg')
+
+
+class WorkerThreadTests(SimpleTestCase):
+    def test_takes_an_item_whenever_a_thread_is_free(self):
+        taken = []
+        slow_done = threading.Event()
+
+        def items():
+            for item in range(4):
+                taken.append(item)
+                yield item
+
+        def work(item):
+            if item == 0:
+                slow_done.wait(5)
+            return item * 2
+
+        results = jobs.run_in_threads(work, items(), 2)
+        # Item 1 finished while item 0 is still running: its thread gets item 2
+        self.assertEqual(next(results), (1, 2))
+        self.assertEqual(taken, [0, 1, 2])
+
+        slow_done.set()
+        self.assertEqual(dict(results), {0: 0, 2: 4, 3: 6})
+
+
+@override_settings(FAKE_LABELER_ERROR_RATE=0.5, FAKE_LABELER_SEED=7)
+class FakeLabelerTests(SimpleTestCase):
+    def outcomes(self):
+        FakeLabeler._sequences.clear()
+        results = []
+        for _ in range(20):
+            try:
+                FakeLabeler().detect_labels('bucket', 'posts/dog.jpg')
+                results.append(True)
+            except ConnectionError:
+                results.append(False)
+        return results
+
+    def test_errors_are_repeatable(self):
+        first = self.outcomes()
+
+        self.assertEqual(first, self.outcomes())
+        self.assertIn(True, first)
+        self.assertIn(False, first)
+
+
+@override_settings(
+    LABELER_BREAKER_MIN_CALLS=4,
+    LABELER_BREAKER_FAILURE_RATE=0.5,
+    LABELER_RETRY_BUDGET=0,
+    LABELER_MAX_CONCURRENCY=2,
+    VERIFICATION_LABELER='aws_rekognition.tests.FailingLabeler',
+)
+class LabelerResilienceTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        ThrottledLabeler.calls = 0
+        self.breaker = resilience.CircuitBreaker()
+
+    def guarded(self, labeler):
+        return resilience.GuardedLabeler(labeler, limiter=resilience.AdaptiveLimiter())
+
+    def trip(self):
+        labeler = self.guarded(FailingLabeler())
+        # 4 failed calls: the first one is retried, the budget allows no more
+        for _ in range(3):
+            with self.assertRaises(ConnectionError):
+                labeler.detect_labels('bucket', 'posts/dog.jpg')
+        self.assertEqual(self.breaker.state(), 'open')
+
+    def test_open_circuit_fails_fast_then_probes(self):
+        self.trip()
+        CountingLabeler.calls = 0
+        labeler = self.guarded(CountingLabeler())
+        with self.assertRaises(resilience.LabelerUnavailable):
+            labeler.detect_labels('bucket', 'posts/dog.jpg')
+        self.assertEqual(CountingLabeler.calls, 0)
+
+        # Open period over: one probe goes through and closes the circuit
+        cache.set(self.breaker.prefix + 'open_until', 0, timeout=None)
+        self.assertEqual(self.breaker.state(), 'half_open')
+        labeler.detect_labels('bucket', 'posts/dog.jpg')
+
+        self.assertEqual(self.breaker.state(), 'closed')
+        counters = metrics.snapshot(resilience.metric_names())
+        self.assertEqual(counters[resilience.OPENED_METRIC], 1)
+        self.assertEqual(counters[resilience.HALF_OPEN_METRIC], 1)
+        self.assertEqual(counters[resilience.CLOSED_METRIC], 1)
+        self.assertEqual(counters[resilience.REJECTED_OPEN_METRIC], 1)
+        # One retry per window at most
+        self.assertEqual(counters[resilience.RETRY_METRIC], 1)
+
+    @override_settings(LABELER_RETRY_BUDGET=0.1, LABELER_BREAKER_MIN_CALLS=100)
+    def test_throttled_call_is_retried_within_budget(self):
+        labeler = self.guarded(ThrottledLabeler())
+        with self.assertRaises(ClientError):
+            labeler.detect_labels('bucket', 'posts/dog.jpg')
+        self.assertEqual(ThrottledLabeler.calls, 2)
+
+        # 3 calls in the window allow no second retry
+        with self.assertRaises(ClientError):
+            labeler.detect_labels('bucket', 'posts/dog.jpg')
+        self.assertEqual(ThrottledLabeler.calls, 3)
+
+        counters = metrics.snapshot(resilience.metric_names())
+        self.assertEqual(counters[resilience.RETRY_METRIC], 1)
+        self.assertEqual(counters[resilience.RETRY_BUDGET_EXHAUSTED_METRIC], 1)
+
+    def test_limiter_halves_on_failure_and_recovers(self):
+        limiter = resilience.AdaptiveLimiter()
+        self.assertTrue(limiter.try_acquire())
+        self.assertTrue(limiter.try_acquire())
+        self.assertFalse(limiter.try_acquire())
+
+        limiter.release(False)
+        self.assertEqual(limiter.limit, 1)
+        self.assertFalse(limiter.try_acquire())
+
+        limiter.release(True)
+        self.assertEqual(limiter.limit, 2)
+        self.assertTrue(limiter.try_acquire())
+
+    def test_shed_job_keeps_its_attempts(self):
+        self.trip()
+        post = Post.objects.create(author=make_user('author'), image='posts/dog.jpg')
+        job = jobs.enqueue_verification(post)
+
+        run_worker()
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (VerificationJob.Status.QUEUED, 0))
+        self.assertGreater(job.available_at, timezone.now())
+
+
+class SweepOrphanedUploadsTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        settings = override_settings(
+            OBJECT_STORE_BACKEND='aws_rekognition.objectstores.FilesystemObjectStore',
+            OBJECT_STORE_ROOT=root.name,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.store = FilesystemObjectStore()
+        self.user = make_user('author')
+
+    def put(self, key, hours_old=48):
+        path = self.store.path(key)
+        self.store.write(path, b'image')
+        then = time.time() - hours_old * 3600
+        os.utime(path, (then, then))
+
+    def sweep(self, *args):
+        out = io.StringIO()
+        call_command('sweep_orphaned_uploads', *args, stdout=out)
+        return out.getvalue()
+
+    def test_deletes_only_unreferenced_old_objects(self):
+        self.put('posts/2026/01/01/kept.jpg')
+        Post.objects.create(author=self.user, image='posts/2026/01/01/kept.jpg')
+        self.put('posts/2026/01/01/deleted-post.jpg')
+        self.put('uploads/abandoned.jpg')
+        self.put('uploads/in-flight.jpg', hours_old=1)
+        self.put('avatars/unclaimed.jpg')
+        StagedUpload.objects.create(key='avatars/unclaimed.jpg', user=self.user, purpose=StagedUpload.Purpose.AVATAR)
+
+        output = self.sweep('--dry-run')
+        self.assertIn('would delete uploads/abandoned.jpg', output)
+        self.assertIsNotNone(self.store.head('uploads/abandoned.jpg'))
+
+        self.sweep('--batch-size', '2')
+
+        remaining = {key for page in self.store.list_objects('') for key, _ in page}
+        self.assertEqual(remaining, {'posts/2026/01/01/kept.jpg', 'uploads/in-flight.jpg'})
+        self.assertFalse(StagedUpload.objects.filter(key='avatars/unclaimed.jpg').exists())
+
+    @override_settings(
+        OBJECT_STORE_BACKEND='aws_rekognition.objectstores.S3ObjectStore',
+        AWS_ACCESS_KEY_ID='test', AWS_SECRET_ACCESS_KEY='test', AWS_S3_BUCKET_NAME='bucket',
+    )
+    def test_s3_deletes_in_batches(self):
+        old = timezone.now() - timedelta(days=2)
+        keys = [f'uploads/{n}.jpg' for n in range(3)]
+        with Stubber(clients.get_s3_client()) as stubber:
+            stubber.add_response('list_objects_v2', {
+                'Contents': [{'Key': key, 'LastModified': old} for key in keys], 'IsTruncated': False,
+            })
+            for batch in (keys[:2], keys[2:]):
+                stubber.add_response('delete_objects', {}, {
+                    'Bucket': 'bucket', 'Delete': {'Objects': [{'Key': key} for key in batch], 'Quiet': True},
+                })
+
+            output = self.sweep('--prefix', 'uploads/', '--batch-size', '2')
+
+            stubber.assert_no_pending_responses()
+        self.assertIn('deleted 3 of 3', output)
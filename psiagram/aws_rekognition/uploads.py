@@ -0,0 +1,191 @@
+import math
+import uuid
+from django.conf import settings
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+from .models import StagedUpload
+
+# Direct-to-S3 uploads. Small files get one presigned PUT URL; files above
+# UPLOAD_MULTIPART_THRESHOLD get an S3 multipart upload with one presigned URL
+# per part, so clients can send parts in parallel and resend only failed ones.
+# S3 requires parts of at least 5 MiB (except the last) and at most 10,000 parts.
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+
+# URLs are signed for the final key (matching the models' upload_to), so using
+# an upload is a database update (promote) instead of an S3 copy + delete.
+# Keys under the old uploads/ staging prefix are not accepted: nothing records
+# who uploaded them.
+KEY_PREFIXES = {
+    StagedUpload.Purpose.POST: 'posts/%Y/%m/%d',
+    StagedUpload.Purpose.AVATAR: 'avatars',
+}
+
+
+class UploadError(ValueError):
+    """
+    Invalid upload request, reported to the client as a 400.
+    """
+
+
+def final_key(purpose, filename):
+    prefix = timezone.now().strftime(KEY_PREFIXES[purpose])
+    return f"{prefix}/{get_valid_filename(filename)}"
+
+
+def upload_key(filename, purpose=StagedUpload.Purpose.POST):
+    return final_key(purpose, f"{uuid.uuid4()}_{filename}")
+
+
+def check_upload_key(file_key, user):
+    # Multipart calls only ever touch this user's keys that are not in use yet
+    if not file_key or not isinstance(file_key, str) or not StagedUpload.objects.filter(
+        key=file_key, user=user, status=StagedUpload.Status.STAGED
+    ).exists():
+        raise UploadError("Invalid or missing 'file_key'.")
+    return file_key
+
+
+def max_parts():
+    return max(1, min(settings.UPLOAD_MULTIPART_MAX_PARTS, MAX_PARTS))
+
+
+def part_size_for(size):
+    part_size = max(settings.UPLOAD_MULTIPART_PART_SIZE, MIN_PART_SIZE)
+    # Grow parts for large files so they stay within max_parts()
+    return max(part_size, math.ceil(size / max_parts()))
+
+
+def parse_size(size):
+    """
+    A declared upload size as an int, within UPLOAD_MAX_BYTES.
+    """
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        size = -1
+    if size <= 0:
+        raise UploadError("Invalid 'size'.")
+    if size > settings.UPLOAD_MAX_BYTES:
+        raise UploadError(f"Files are limited to {settings.UPLOAD_MAX_BYTES} bytes.")
+    return size
+
+
+def presign_part_urls(store, file_key, upload_id, part_numbers):
+    return [
+        {
+            'part_number': number,
+            'url': store.presign_part(file_key, upload_id, number, settings.UPLOAD_URL_EXPIRES),
+        }
+        for number in part_numbers
+    ]
+
+
+def validate(filename, content_type, size=None, purpose=StagedUpload.Purpose.POST):
+    """
+    Check one upload request; returns `size` as an int (or None).
+    """
+    if not filename or not isinstance(filename, str):
+        raise UploadError("Invalid or missing 'filename'.")
+    if purpose not in StagedUpload.Purpose.values:
+        raise UploadError("Invalid 'purpose'.")
+    if not content_type or not isinstance(content_type, str):
+        raise UploadError("Invalid or missing 'content_type'.")
+    if size is not None:
+        size = parse_size(size)
+    return size
+
+
+def initiate(store, user, filename, content_type, size=None, purpose=StagedUpload.Purpose.POST):
+    """
+    Start one upload for `user`: a single presigned PUT, or a multipart upload
+    when `size` (bytes) is above the threshold. Returns the JSON for the client.
+    """
+    size = validate(filename, content_type, size, purpose)
+    file_key = upload_key(filename, purpose)
+    StagedUpload.objects.create(key=file_key, user=user, purpose=purpose)
+
+    if size is None or size <= settings.UPLOAD_MULTIPART_THRESHOLD:
+        upload_url = store.presign_put(file_key, content_type, settings.UPLOAD_URL_EXPIRES)
+        return {'upload_url': upload_url, 'file_key': file_key}
+
+    upload_id = store.create_multipart_upload(file_key, content_type)
+    part_size = part_size_for(size)
+    part_count = math.ceil(size / part_size)
+    return {
+        'file_key': file_key,
+        'upload_id': upload_id,
+        'part_size': part_size,
+        'parts': presign_part_urls(store, file_key, upload_id, range(1, part_count + 1)),
+    }
+
+
+def complete(store, user, file_key, upload_id, parts):
+    """
+    Assemble the uploaded parts ([{'part_number', 'etag'}]) into the final object.
+    """
+    check_upload_key(file_key, user)
+    if not upload_id or not parts or not isinstance(parts, list):
+        raise UploadError("'upload_id' and 'parts' are required.")
+    if len(parts) > max_parts():
+        raise UploadError(f"At most {max_parts()} parts per upload.")
+    try:
+        parts = sorted((int(part['part_number']), str(part['etag'])) for part in parts)
+    except (KeyError, TypeError, ValueError):
+        raise UploadError("Each part needs a 'part_number' and an 'etag'.")
+
+    store.complete_multipart_upload(file_key, upload_id, parts)
+    return {'file_key': file_key}
+
+
+def abort(store, user, file_key, upload_id):
+    check_upload_key(file_key, user)
+    if not upload_id:
+        raise UploadError("'upload_id' is required.")
+    store.abort_multipart_upload(file_key, upload_id)
+
+
+def resume(store, user, file_key, upload_id, size):
+    """
+    State of an interrupted multipart upload: the parts the store already has and
+    fresh URLs for the missing ones.
+    """
+    check_upload_key(file_key, user)
+    if not upload_id:
+        raise UploadError("'upload_id' is required.")
+    size = parse_size(size)
+
+    uploaded = [{'part_number': number, 'etag': etag} for number, etag in store.list_parts(file_key, upload_id)]
+
+    part_size = part_size_for(size)
+    done = {part['part_number'] for part in uploaded}
+    missing = [number for number in range(1, math.ceil(size / part_size) + 1) if number not in done]
+    return {
+        'file_key': file_key,
+        'upload_id': upload_id,
+        'part_size': part_size,
+        'uploaded_parts': uploaded,
+        'parts': presign_part_urls(store, file_key, upload_id, missing),
+    }
+
+
+def promote(key, user, purpose):
+    """
+    Claim the uploaded `key` for a post or profile and return the key to store.
+    A database update only; only the user's own, unused uploads can be claimed.
+    """
+    if not key or not isinstance(key, str):
+        raise UploadError("Invalid or missing upload key.")
+    claimed = StagedUpload.objects.filter(
+        key=key, user=user, purpose=purpose, status=StagedUpload.Status.STAGED
+    ).update(status=StagedUpload.Status.PROMOTED, promoted_at=timezone.now())
+    if not claimed:
+        raise UploadError("Unknown or already used upload key.")
+    return key
+
+
+def discard(key):
+    """
+    Make an unclaimed upload key unusable, e.g. once its object was rejected.
+    """
+    StagedUpload.objects.filter(key=key, status=StagedUpload.Status.STAGED).delete()
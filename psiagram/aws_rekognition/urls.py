@@ -1,7 +1,22 @@
 from django.urls import path
-from .views import InitiateUploadView, UploadCompleteView
+from .views import (
+    InitiateUploadView,
+    BatchInitiateUploadView,
+    CompleteMultipartUploadView,
+    AbortMultipartUploadView,
+    ResumeMultipartUploadView,
+    UploadCompleteView,
+    UploadMetricsView,
+    LocalUploadView,
+)
 
 urlpatterns = [
     path('initiate-upload/', InitiateUploadView.as_view(), name='initiate-upload'),
+    path('initiate-uploads/', BatchInitiateUploadView.as_view(), name='initiate-uploads'),
+    path('multipart-upload/complete/', CompleteMultipartUploadView.as_view(), name='multipart-upload-complete'),
+    path('multipart-upload/abort/', AbortMultipartUploadView.as_view(), name='multipart-upload-abort'),
+    path('multipart-upload/resume/', ResumeMultipartUploadView.as_view(), name='multipart-upload-resume'),
     path('upload-complete/', UploadCompleteView.as_view(), name='upload-complete'),
-]
\ No newline at end of file
+    path('metrics/', UploadMetricsView.as_view(), name='upload-metrics'),
+    path('local-upload/<str:token>/', LocalUploadView.as_view(), name='local-upload'),
+]
@@ -0,0 +1,5 @@
+def is_dog_detected(labels):
+    """
+    True if Rekognition found a dog among `labels` (detect_labels 'Labels').
+    """
+    return any(label.get('Name') == 'Dog' for label in labels or [])
@@ -1,73 +1,54 @@
-import boto3
-import uuid
 import logging
 from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
+from psiagram import metrics
+from . import prevalidation, resilience, uploads
+from .objectstores import get_object_store
+from .resilience import CircuitBreaker
 
 logger = logging.getLogger(__name__)
 
-# Funkcje, bo lepiej wywoływać klienta w metodzie post niż zamiast przy imporcie pliku
-def get_s3_client():
-    return boto3.client(
-        's3',
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        region_name=settings.AWS_REGION_NAME,
-    )
+def get_store():
+    store = get_object_store()
+    if not store.is_configured():
+        logger.error("Missing AWS_S3_BUCKET_NAME in settings")
+        return None
+    return store
 
 
-def get_rekognition_client():
-    return boto3.client(
-        'rekognition',
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        region_name=settings.AWS_REGION_NAME,
-    )
+MISSING_BUCKET_RESPONSE = {"error": "Server misconfiguration: missing S3 bucket name."}
+
 
 class InitiateUploadView(APIView):
     """
     View to initiate an upload by generating a pre-signed S3 URL.
+    With a 'size' above UPLOAD_MULTIPART_THRESHOLD, a multipart upload is
+    started instead and one pre-signed URL per part is returned.
+    The URL is for the final key of the given 'purpose' ('post' or 'avatar').
     """
     permission_classes = [permissions.IsAuthenticated]
     def post(self, request):
-        s3_client = get_s3_client()
         try:
-            # 1. Extract filename and content type from the request
-            filename = request.data.get('filename')
-            content_type = request.data.get('content_type')
-            bucket = getattr(settings, "AWS_S3_BUCKET_NAME", None)
-
-            # walidacja
-            if not filename or not isinstance(filename, str):
-                return Response({"error": "Invalid or missing 'filename'."}, status=status.HTTP_400_BAD_REQUEST)
-            if not content_type or not isinstance(content_type, str):
-                return Response({"error": "Invalid or missing 'content_type'."}, status=status.HTTP_400_BAD_REQUEST)
-            if not bucket or not isinstance(bucket, str):
-                logger.error("Missing AWS_S3_BUCKET_NAME in settings")
-                return Response({"error": "Server misconfiguration: missing S3 bucket name."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            # 2. Generate a unique filename (S3 key)
-            file_key = f"uploads/{uuid.uuid4()}_{filename}"
-
-            # 3. Generate a pre-signed URL for PUT operation
-            presigned_url = s3_client.generate_presigned_url(
-                ClientMethod='put_object',
-                Params={
-                    'Bucket': bucket,
-                    'Key': file_key,
-                    'ContentType': content_type
-                    # 'ACL': 'public-read' #TODO decide on ACL, it may be needed for public access
-                },
-                ExpiresIn=3600  # URL expiration time in seconds (1 hour)
+            store = get_store()
+            if store is None:
+                return Response(MISSING_BUCKET_RESPONSE, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+            # 1. Generate a unique S3 key and the pre-signed URL(s)
+            upload = uploads.initiate(
+                store,
+                request.user,
+                request.data.get('filename'),
+                request.data.get('content_type'),
+                request.data.get('size'),
+                request.data.get('purpose', 'post'),
             )
 
-            # 4. Return the pre-signed URL and S3 key to the client
-            return Response({
-                "upload_url": presigned_url,
-                "file_key": file_key
-            }, status=status.HTTP_200_OK)
+            # 2. Return the pre-signed URL(s) and S3 key to the client
+            return Response(upload, status=status.HTTP_200_OK)
+        except uploads.UploadError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response(
                 {"error": f"Error generating URL: {str(e)}"},
@@ -75,14 +56,119 @@ class InitiateUploadView(APIView):
             )
 
 
+class BatchInitiateUploadView(APIView):
+    """
+    Initiate several uploads in one request.
+    Body: {"files": [{"filename", "content_type", "size"?, "purpose"?}, ...]}
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        files = request.data.get('files')
+        if not isinstance(files, list) or not files:
+            return Response({"error": "'files' must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(files) > settings.UPLOAD_BATCH_MAX_FILES:
+            return Response(
+                {"error": f"At most {settings.UPLOAD_BATCH_MAX_FILES} files per request."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        store = get_store()
+        if store is None:
+            return Response(MISSING_BUCKET_RESPONSE, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        try:
+            # Validate everything first, so a bad entry does not leave multipart uploads behind
+            for item in files:
+                if not isinstance(item, dict):
+                    raise uploads.UploadError("Each file must be an object.")
+                uploads.validate(item.get('filename'), item.get('content_type'), item.get('size'), item.get('purpose', 'post'))
+            upload_list = [
+                uploads.initiate(
+                    store,
+                    request.user,
+                    item.get('filename'),
+                    item.get('content_type'),
+                    item.get('size'),
+                    item.get('purpose', 'post'),
+                )
+                for item in files
+            ]
+            return Response({"uploads": upload_list}, status=status.HTTP_200_OK)
+        except uploads.UploadError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response(
+                {"error": f"Error generating URLs: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class MultipartUploadView(APIView):
+    """
+    Base for the multipart upload follow-up calls (complete/abort/resume).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    error_message = "Error processing multipart upload"
+
+    def post(self, request):
+        store = get_store()
+        if store is None:
+            return Response(MISSING_BUCKET_RESPONSE, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        try:
+            return self.handle_upload(store, request.user, request.data)
+        except uploads.UploadError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response(
+                {"error": f"{self.error_message}: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class CompleteMultipartUploadView(MultipartUploadView):
+    """
+    Assemble the uploaded parts. Body: {"file_key", "upload_id", "parts": [{"part_number", "etag"}]}
+    """
+    error_message = "Error completing upload"
+
+    def handle_upload(self, store, user, data):
+        result = uploads.complete(store, user, data.get('file_key'), data.get('upload_id'), data.get('parts'))
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class AbortMultipartUploadView(MultipartUploadView):
+    """
+    Drop an unfinished multipart upload and its parts. Body: {"file_key", "upload_id"}
+    """
+    error_message = "Error aborting upload"
+
+    def handle_upload(self, store, user, data):
+        uploads.abort(store, user, data.get('file_key'), data.get('upload_id'))
+        return Response({"status": "aborted"}, status=status.HTTP_200_OK)
+
+
+class ResumeMultipartUploadView(MultipartUploadView):
+    """
+    Parts already uploaded plus fresh URLs for the missing ones.
+    Body: {"file_key", "upload_id", "size"}
+    """
+    error_message = "Error resuming upload"
+
+    def handle_upload(self, store, user, data):
+        result = uploads.resume(store, user, data.get('file_key'), data.get('upload_id'), data.get('size'))
+        return Response(result, status=status.HTTP_200_OK)
+
+
 class UploadCompleteView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     """
-    View to handle post-upload processing, such as Rekognition analysis.
+    View to handle post-upload processing: cheap local checks of the uploaded
+    file. Labeling is left to the verification worker once the post is created.
     """
     def post(self, request):
         try:
-            # 1. Extract the S3 key from the request
+            # 1. Extract the S3 key from the request: only the user's own
+            # uploads that are not in use yet may be checked (and deleted)
             file_key = request.data.get('file_key')
 
             if not file_key:
@@ -90,50 +176,69 @@ class UploadCompleteView(APIView):
                     {"error": "file_key is required."},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            
-            # Initialize AWS clients
-            s3_client = get_s3_client()
-            rek_client = get_rekognition_client()
-            
-            # 2. Call Rekognition to analyze the image
-            response = rek_client.detect_labels(
-                Image={
-                    'S3Object': {
-                        'Bucket': settings.AWS_S3_BUCKET_NAME,
-                        'Name': file_key
-                    }
-                },
-                MaxLabels=10,
-                MinConfidence=70
-            )
+            try:
+                uploads.check_upload_key(file_key, request.user)
+            except uploads.UploadError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            is_dog_detected = False
-            for label in response.get('Labels'):
-                if label['Name'] == 'Dog':
-                    is_dog_detected = True
-                    break
-            
-            # 3. Dog detected
-            # TODO post photo approved, decide what to do
-            if is_dog_detected:
-                return Response({
-                    "status": "approved",
-                    "message": "Cute dog! Photo accepted.",
-                    "labels": response.get('Labels')
-                }, status=status.HTTP_200_OK)
-            else:
-                s3_client.delete_object(
-                    Bucket=settings.AWS_S3_BUCKET_NAME,
-                    Key=file_key
-                )
+            store = get_object_store()
+
+            # 2. Reject broken or oversized files from their first/last bytes,
+            # before they cost a Rekognition call
+            try:
+                prevalidation.check_object(store, file_key)
+            except prevalidation.UploadRejected as e:
+                # The key stops being claimable before its object goes
+                uploads.discard(file_key)
+                store.delete(file_key)
                 return Response({
                     "status": "rejected",
-                    "message": "No dog detected :( Photo rejected.",
-                    "labels": response.get('Labels')
+                    "reason": e.reason,
+                    "message": str(e),
                 }, status=status.HTTP_400_BAD_REQUEST)
+
+            # 3. Rekognition runs once, in process_verification_jobs, after the
+            # post is created
+            return Response({
+                "status": "pending",
+                "message": "Photo will be checked shortly.",
+            }, status=status.HTTP_202_ACCEPTED)
         except Exception as e:
             #TODO there might be a need to handle specific exceptions like file not found in S3
             return Response(
                 {"error": f"Error processing upload: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class UploadMetricsView(APIView):
+    """
+    Upload pre-validation counters (accepted / rejected per reason) and the
+    labeling circuit breaker's state and counters, for staff.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        data = metrics.snapshot(prevalidation.metric_names() + resilience.metric_names())
+        data['labeler.breaker.state'] = CircuitBreaker().state()
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class LocalUploadView(APIView):
+    """
+    Target of the pre-signed URLs of the FilesystemObjectStore (local runs and
+    benchmarks): like a pre-signed S3 URL, the signed token is the permission.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def put(self, request, token):
+        store = get_object_store()
+        target = store.unsign(token) if hasattr(store, 'unsign') else None
+        if target is None:
+            return Response({"error": "Invalid or expired upload URL."}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            etag = store.receive(target, request.body)
+        except FileNotFoundError as e:
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_200_OK, headers={'ETag': etag})
@@ -1,16 +1,9 @@
-from django.conf import settings
 from rest_framework import serializers
 from .models import Event, EventAttendance
 from users.serializers import UserSerializer
+from psiagram.media import media_url
+from psiagram.serializers import SparseFieldsetMixin
 
-def get_s3_url(file_path):
-    if not file_path:
-        return None
-    # Check if it's already a full URL
-    if str(file_path).startswith('http'):
-        return str(file_path)
-        
-    return f"https://{settings.AWS_S3_BUCKET_NAME}.s3.{settings.AWS_REGION_NAME}.amazonaws.com/{file_path}"
 
 class EventAttendanceSerializer(serializers.ModelSerializer):
     """
@@ -28,7 +21,7 @@ class EventAttendanceSerializer(serializers.ModelSerializer):
         }
 
 
-class EventSerializer(serializers.ModelSerializer):
+class EventSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for the Event model. It includes details about the organizer and attendees.
     """
@@ -42,6 +35,18 @@ class EventSerializer(serializers.ModelSerializer):
 
     group_name = serializers.CharField(source='group.name', read_only=True)
 
+    # Joins and prefetches needed by each field (see SparseFieldsetMixin.optimize_queryset)
+    select_related_fields = {
+        'organizer_username': 'organizer',
+        'organizer_avatar': 'organizer__profile',
+        'group_name': 'group',
+    }
+    prefetch_related_fields = {
+        'attendees': 'attendees',
+        'attendees_count': 'attendees',
+        'attendees_details': 'eventattendance_set__user',
+    }
+
     class Meta:
         model = Event
         fields = [
@@ -70,7 +75,7 @@ class EventSerializer(serializers.ModelSerializer):
 
     def get_organizer_avatar(self, obj):
         if hasattr(obj.organizer, 'profile') and obj.organizer.profile.avatar:
-            return get_s3_url(obj.organizer.profile.avatar)
+            return media_url(obj.organizer.profile.avatar)
         return None
 
     def get_attendees_count(self, obj):
@@ -33,7 +33,8 @@ class PublicEventsView(generics.ListAPIView):
     pagination_class = EventListPagination
 
     def get_queryset(self):
-        return Event.objects.filter(group__isnull=True).order_by('start_time')
+        queryset = Event.objects.filter(group__isnull=True).order_by('start_time')
+        return EventSerializer.optimize_queryset(queryset, self.request)
 
 
 class EventFeedView(generics.ListAPIView):
@@ -48,10 +49,11 @@ class EventFeedView(generics.ListAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        return Event.objects.filter(
+        queryset = Event.objects.filter(
             Q(group__isnull=True) | 
             Q(group__members=user)
         ).distinct().order_by('-created_at')
+        return EventSerializer.optimize_queryset(queryset, self.request)
 
 
 class GroupEventsView(generics.ListAPIView):
@@ -71,7 +73,8 @@ class GroupEventsView(generics.ListAPIView):
         if not group.members.filter(id=self.request.user.id).exists():
              raise exceptions.PermissionDenied("You must be a member to view these events.")
 
-        return Event.objects.filter(group=group).order_by('start_time')
+        queryset = Event.objects.filter(group=group).order_by('start_time')
+        return EventSerializer.optimize_queryset(queryset, self.request)
 
 
 class CreateEventView(generics.CreateAPIView):
@@ -93,10 +96,12 @@ class EventDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
     View to retrieve, update, or delete a single event.
     """
-    queryset = Event.objects.all()
     serializer_class = EventSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_queryset(self):
+        return EventSerializer.optimize_queryset(Event.objects.all(), self.request)
+
     def check_object_permissions(self, request, obj):
         super().check_object_permissions(request, obj)
         
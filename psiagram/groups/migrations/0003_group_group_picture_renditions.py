@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='group_picture_renditions',
+            field=models.JSONField(blank=True, null=True, verbose_name='Group Picture Renditions'),
+        ),
+    ]
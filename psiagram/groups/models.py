@@ -1,7 +1,8 @@
 from django.db import models
 from django.conf import settings
+from psiagram.db import LoadedFieldsMixin
 
-class Group(models.Model):
+class Group(LoadedFieldsMixin, models.Model):
     """
     Model representing a user group in the application.
     """
@@ -29,6 +30,11 @@ class Group(models.Model):
         blank=True,
         verbose_name='Group Picture'
     )
+    # Resized copies and blurhash of `group_picture` (see psiagram.renditions)
+    group_picture_renditions = models.JSONField(blank=True, null=True, verbose_name='Group Picture Renditions')
+
+    # The picture is only processed again when it changes
+    tracked_fields = ('group_picture',)
 
     class Meta:
         verbose_name = "Group"
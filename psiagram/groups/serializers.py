@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from .models import Group, GroupJoinRequest
 from users.serializers import UserSerializer
+from psiagram import renditions
+from psiagram.media import media_url
+from profiles.serializers import FollowStateListSerializer, resolve_is_following
 
 class GroupMemberSerializer(UserSerializer):
     """
@@ -9,22 +12,20 @@ class GroupMemberSerializer(UserSerializer):
     is_following = serializers.SerializerMethodField()
     is_admin = serializers.SerializerMethodField()
 
+    follow_user_id_attr = 'pk'
+
     class Meta(UserSerializer.Meta):
         fields = list(UserSerializer.Meta.fields) + ['is_following', 'is_admin']
+        list_serializer_class = FollowStateListSerializer
 
     def get_is_following(self, obj):
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return False
-        
-        try:
-            if hasattr(request.user, 'profile') and hasattr(request.user.profile, 'following'):
-                return request.user.profile.following.filter(id=obj.id).exists()
-        except Exception:
-            pass
-        return False
+        return resolve_is_following(self, obj.pk)
 
     def get_is_admin(self, obj):
+        # Filled once per group by GroupSerializer.get_members_details
+        admin_ids = self.context.get('group_admin_ids')
+        if admin_ids is not None:
+            return obj.pk in admin_ids
         group = self.context.get('group')
         if group:
             return group.admins.filter(id=obj.id).exists()
@@ -54,6 +55,7 @@ class GroupSerializer(serializers.ModelSerializer):
     is_member = serializers.SerializerMethodField(read_only=True)
     is_admin = serializers.SerializerMethodField(read_only=True)
     has_pending_request = serializers.SerializerMethodField(read_only=True)
+    group_picture_renditions = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Group
@@ -62,6 +64,7 @@ class GroupSerializer(serializers.ModelSerializer):
             'name', 
             'description', 
             'group_picture',
+            'group_picture_renditions',
             'admins',
             'admins_details',
             'members_details',
@@ -77,11 +80,23 @@ class GroupSerializer(serializers.ModelSerializer):
             'admins': {'read_only': True},
         }
 
+    def to_representation(self, instance):
+        representation = super().to_representation(instance)
+        if representation.get('group_picture'):
+            representation['group_picture'] = media_url(instance.group_picture)
+        return representation
+
     def get_members_details(self, obj):
+        # Created before the copy, so the follow state is shared with the other groups of the response
+        self.context.setdefault('follow_state', {})
         context = self.context.copy()
         context['group'] = obj
+        context['group_admin_ids'] = {admin.pk for admin in obj.admins.all()}
         return GroupMemberSerializer(obj.members.all(), many=True, context=context).data
 
+    def get_group_picture_renditions(self, obj):
+        return renditions.srcset(obj.group_picture_renditions, obj.group_picture.name, media_url)
+
     def get_members_count(self, obj):
         return obj.members.count()
 
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from aws_rekognition import jobs
+from aws_rekognition.models import ImageJob
+from .models import Group
+
+
+@receiver(post_save, sender=Group)
+def queue_group_picture_processing(sender, instance, raw=False, **kwargs):
+    # Only for a new picture; renditions are made by the job workers, never in the save
+    if raw or not instance.group_picture:
+        return
+    if getattr(instance, '_loaded_group_picture', None) != instance.group_picture.name:
+        jobs.enqueue_image(ImageJob.Kind.GROUP, instance.pk, instance.group_picture.name)
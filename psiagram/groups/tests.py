@@ -1,3 +1,36 @@
-from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from psiagram.testing import make_user
+from .models import Group
 
-# Create your tests here.
+
+class GroupMemberTests(APITestCase):
+    def setUp(self):
+        self.viewer = make_user('viewer')
+        self.group = Group.objects.create(name='dogs')
+        self.admin = make_user('admin')
+        self.group.admins.add(self.admin)
+        self.group.members.add(self.viewer, self.admin)
+        self.viewer.profile.follows.add(self.admin.profile)
+        self.client.force_authenticate(self.viewer)
+        self.url = reverse('group-detail', args=[self.group.pk])
+
+    def get_members(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return {member['username']: member for member in response.data['members_details']}, len(queries)
+
+    def test_member_state_is_resolved_per_page(self):
+        _, baseline = self.get_members()
+        self.group.members.add(*(make_user(f'member{i}') for i in range(4)))
+
+        members, queries = self.get_members()
+
+        self.assertEqual(queries, baseline)
+        self.assertTrue(members['admin']['is_following'])
+        self.assertTrue(members['admin']['is_admin'])
+        self.assertFalse(members['member0']['is_following'])
+        self.assertFalse(members['viewer']['is_admin'])
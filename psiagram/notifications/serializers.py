@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from psiagram.media import media_url
 from .models import Notification
 
 class NotificationSerializer(serializers.ModelSerializer):
@@ -22,11 +23,10 @@ class NotificationSerializer(serializers.ModelSerializer):
 
     def get_sender_avatar(self, obj):
         if hasattr(obj.sender, 'profile') and obj.sender.profile.avatar:
-            # Assuming you have the logic to build full URL or standard ImageField behavior
-            return obj.sender.profile.avatar.url
+            return media_url(obj.sender.profile.avatar)
         return None
 
     def get_post_image(self, obj):
         if obj.post and obj.post.image:
-            return obj.post.image.url
+            return media_url(obj.post.image)
         return None
\ No newline at end of file
@@ -3,9 +3,10 @@ from .models import Post, Comment, Like
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
-    list_display = ('id', 'author', 'verification_status', 'created_at')
+    list_display = ('id', 'author', 'verification_status', 'like_count', 'comment_count', 'created_at')
     list_filter = ('verification_status', 'created_at')
     search_fields = ('caption', 'author__username')
+    readonly_fields = ('like_count', 'comment_count')
 
 admin.site.register(Comment)
 admin.site.register(Like)
\ No newline at end of file
@@ -0,0 +1,90 @@
+import hashlib
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from . import timeline
+
+# Feed pages are cached under a per-user version. Bumping the version makes every
+# cached page of that user unreachable at once, without deleting keys one by one.
+USER_VERSION_KEY = 'feed:version:user:{}'
+# Hybrid mode: posts of pulled authors are not pushed, so their changes bump a
+# per-author version instead of one version per follower.
+AUTHOR_VERSION_KEY = 'feed:version:author:{}'
+PAGE_KEY = 'feed:page:{user_id}:{digest}'
+
+BUMP_BATCH_SIZE = 1000
+
+
+def is_enabled():
+    return settings.FEED_CACHE_TIMEOUT > 0
+
+
+def _new_version():
+    return uuid.uuid4().hex[:12]
+
+
+def _bump(keys):
+    keys = list(keys)
+    for start in range(0, len(keys), BUMP_BATCH_SIZE):
+        chunk = keys[start:start + BUMP_BATCH_SIZE]
+        # Versions never expire on their own, a lost version only costs a cache miss
+        cache.set_many({key: _new_version() for key in chunk}, timeout=None)
+
+
+# Versions are bumped once the change is committed: bumped earlier, a feed read
+# in between would cache the old page under the new version.
+
+
+def bump_user_versions(user_ids):
+    """
+    Invalidate every cached feed page of the given users (on commit).
+    """
+    if is_enabled():
+        keys = [USER_VERSION_KEY.format(user_id) for user_id in user_ids]
+        transaction.on_commit(lambda: _bump(keys))
+
+
+def _invalidate_author(author_id):
+    if timeline.is_pull_author(author_id):
+        _bump([USER_VERSION_KEY.format(author_id), AUTHOR_VERSION_KEY.format(author_id)])
+        return
+
+    _bump([USER_VERSION_KEY.format(author_id)])
+    follower_ids = timeline.follower_user_ids(author_id).iterator(chunk_size=BUMP_BATCH_SIZE)
+    _bump(USER_VERSION_KEY.format(user_id) for user_id in follower_ids)
+
+
+def invalidate_author(author_id):
+    """
+    Invalidate the feeds an author's posts appear in (on commit): the author's own
+    feed and, depending on the feed mode, each follower's feed or the
+    pulled-author version.
+    """
+    if is_enabled():
+        transaction.on_commit(lambda: _invalidate_author(author_id))
+
+
+def page_key(request):
+    """
+    Cache key of the requested feed page, or None when the cache is disabled.
+    Includes the user's feed version (and pulled authors' versions in hybrid mode).
+    """
+    if not is_enabled():
+        return None
+
+    user = request.user
+    version_keys = [USER_VERSION_KEY.format(user.id)]
+    version_keys.extend(AUTHOR_VERSION_KEY.format(author_id) for author_id in timeline.pull_author_ids(user))
+
+    versions = cache.get_many(version_keys)
+    for key in version_keys:
+        if key not in versions:
+            # First visit (or evicted version): start a fresh one, unless a bump won the race
+            cache.add(key, _new_version(), timeout=None)
+            versions[key] = cache.get(key)
+
+    parts = [settings.FEED_MODE, request.get_full_path()]
+    parts.extend(f'{key}={versions[key]}' for key in version_keys)
+    digest = hashlib.md5('|'.join(parts).encode()).hexdigest()
+    return PAGE_KEY.format(user_id=user.id, digest=digest)
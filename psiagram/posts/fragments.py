@@ -0,0 +1,102 @@
+import hashlib
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from psiagram import media
+
+# The viewer-independent part of a serialized post is cached per post. The key
+# carries the post's updated_at plus an author and a group version, so editing the
+# post, changing the author's username/avatar or renaming the group simply makes
+# old fragments unreachable (they expire on their own).
+AUTHOR_VERSION_KEY = 'post:fragment:author:{}'
+GROUP_VERSION_KEY = 'post:fragment:group:{}'
+FRAGMENT_KEY = 'post:fragment:{name}:{post_id}:{updated}:{author_version}:{group_version}'
+
+
+def is_enabled():
+    return settings.POST_FRAGMENT_CACHE_TIMEOUT > 0
+
+
+def bump_author(user_id):
+    if is_enabled():
+        cache.set(AUTHOR_VERSION_KEY.format(user_id), uuid.uuid4().hex[:12], timeout=None)
+
+
+def bump_group(group_id):
+    if is_enabled():
+        cache.set(GROUP_VERSION_KEY.format(group_id), uuid.uuid4().hex[:12], timeout=None)
+
+
+def name_for(serializer):
+    """
+    Fragment namespace of a serializer; sparse fieldsets get their own.
+    """
+    selected = getattr(serializer, 'selected_fields', None)
+    if selected is None:
+        return serializer.fragment_name
+    digest = hashlib.md5(','.join(sorted(selected)).encode()).hexdigest()[:8]
+    return f'{serializer.fragment_name}-{digest}'
+
+
+def render_overlay(serializer, instance):
+    """
+    Render only the serializer's overlay fields (those it still has).
+    """
+    overlay = {}
+    for name in serializer.overlay_fields:
+        field = serializer.fields.get(name)
+        if field is not None:
+            overlay[name] = field.to_representation(field.get_attribute(instance))
+    return overlay
+
+
+def load(name, posts):
+    """
+    Look up the cached fragments of `posts` for serializer `name` with two cache
+    round trips (versions, then fragments). Returns {post_id: (key, fragment or None)}.
+    """
+    if not is_enabled():
+        return {}
+
+    version_keys = {AUTHOR_VERSION_KEY.format(post.author_id) for post in posts}
+    version_keys.update(GROUP_VERSION_KEY.format(post.group_id) for post in posts if post.group_id)
+    versions = cache.get_many(version_keys)
+
+    keys = {}
+    for post in posts:
+        keys[post.pk] = FRAGMENT_KEY.format(
+            name=name,
+            post_id=post.pk,
+            updated=post.updated_at.timestamp(),
+            author_version=versions.get(AUTHOR_VERSION_KEY.format(post.author_id), 0),
+            group_version=versions.get(GROUP_VERSION_KEY.format(post.group_id), 0) if post.group_id else '-',
+        )
+
+    fragments = cache.get_many(keys.values())
+    return {pk: (key, fragments.get(key)) for pk, key in keys.items()}
+
+
+def render(serializer, instance):
+    """
+    Representation of `instance`: the cached fragment with the serializer's
+    viewer-specific/live fields (`overlay_fields`) on top. Misses are rendered in
+    full with render_fragment() and stored.
+    """
+    if not is_enabled():
+        return serializer.render_fragment(instance)
+
+    fragments = serializer.context.get('post_fragments') or {}
+    if instance.pk not in fragments:
+        fragments = load(name_for(serializer), [instance])
+    key, fragment = fragments[instance.pk]
+
+    if fragment is None:
+        representation = serializer.render_fragment(instance)
+        # Overlay fields are kept as placeholders so the field order is preserved
+        fragment = {name: (None if name in serializer.overlay_fields else value) for name, value in representation.items()}
+        cache.set(key, fragment, media.cache_timeout(settings.POST_FRAGMENT_CACHE_TIMEOUT))
+        return representation
+
+    representation = dict(fragment)
+    representation.update(render_overlay(serializer, instance))
+    return representation
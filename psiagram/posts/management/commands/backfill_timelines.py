@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from posts.timeline import rebuild_timeline
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Fill the materialized home timelines (TimelineEntry) for existing users, in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help="Users processed per transaction.")
+        parser.add_argument('--limit', type=int, default=None, help="Max posts copied per timeline (defaults to FEED_FOLLOW_BACKFILL_LIMIT).")
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help="Only backfill these user ids (repeatable).")
+        parser.add_argument(
+            '--followers-of', type=int, action='append', dest='author_ids',
+            help="Only backfill the followers of these user ids (repeatable), e.g. after an author dropped out of hybrid pull mode.",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        users = User.objects.select_related('profile').order_by('pk')
+        if options['user_ids']:
+            users = users.filter(pk__in=options['user_ids'])
+        if options['author_ids']:
+            users = users.filter(profile__follows__user_id__in=options['author_ids']).distinct()
+
+        # Keyset walk over users so each chunk is a cheap indexed query
+        last_pk = 0
+        processed = 0
+        while True:
+            chunk = list(users.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+
+            with transaction.atomic():
+                for user in chunk:
+                    rebuild_timeline(user, limit=options['limit'])
+
+            last_pk = chunk[-1].pk
+            processed += len(chunk)
+            self.stdout.write(f"Backfilled {processed} timelines (last user id {last_pk})")
+
+        self.stdout.write(self.style.SUCCESS(f"Done. {processed} timelines backfilled."))
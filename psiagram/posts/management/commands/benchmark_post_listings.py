@@ -0,0 +1,97 @@
+import statistics
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q
+from groups.models import Group
+from posts.models import Post, TimelineEntry
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the query plans and timings of the post listing queries "
+        "(FeedView, UserPostsView, GroupPostsView) and check which index they use."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help="User id to run the queries for (defaults to the most active author).")
+        parser.add_argument('--group', type=int, help="Group id for the group listing (defaults to the busiest group).")
+        parser.add_argument('--page-size', type=int, default=5)
+        parser.add_argument('--runs', type=int, default=20, help="Executions per query for the timing.")
+        parser.add_argument('--analyze', action='store_true', help="Use EXPLAIN ANALYZE (PostgreSQL only).")
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        group = self.get_group(options['group'])
+        page_size = options['page_size']
+        approved = Post.VerificationStatus.APPROVED
+
+        # The same shapes the views produce, limited to one page (+1 for has_next)
+        queries = [
+            (
+                "FeedView (query mode)",
+                Post.objects.filter(verification_status=approved)
+                .filter(Q(author__profile__in=user.profile.follows.all()) | Q(author=user))
+                .order_by('-created_at', '-id')[:page_size + 1],
+                'post_status_author_created_idx',
+            ),
+            (
+                "FeedView (timeline mode)",
+                TimelineEntry.objects.filter(owner=user)
+                .order_by('-created_at', '-post_id')[:page_size + 1],
+                'timeline_owner_created_idx',
+            ),
+            (
+                "UserPostsView",
+                Post.objects.filter(author=user, group__isnull=True, verification_status=approved)
+                .order_by('-created_at', '-id')[:page_size + 1],
+                'post_status_author_created_idx',
+            ),
+        ]
+        if group is not None:
+            queries.append((
+                "GroupPostsView",
+                Post.objects.filter(group=group, verification_status=approved)
+                .order_by('-created_at', '-id')[:page_size + 1],
+                'post_group_status_created_idx',
+            ))
+
+        explain_options = {}
+        if options['analyze']:
+            if connection.vendor != 'postgresql':
+                raise CommandError("--analyze is only supported on PostgreSQL.")
+            explain_options = {'analyze': True, 'buffers': True}
+
+        self.stdout.write(f"Database: {connection.vendor}, user id {user.pk}, group id {getattr(group, 'pk', None)}\n")
+        for title, queryset, expected_index in queries:
+            plan = queryset.explain(**explain_options)
+            timings = []
+            for _ in range(options['runs']):
+                start = time.perf_counter()
+                list(queryset.all())  # fresh queryset, no result cache
+                timings.append((time.perf_counter() - start) * 1000)
+
+            uses_index = expected_index in plan
+            style = self.style.SUCCESS if uses_index else self.style.WARNING
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write(plan)
+            self.stdout.write(style(f"uses {expected_index}: {'yes' if uses_index else 'no'}"))
+            self.stdout.write(f"median {statistics.median(timings):.2f} ms over {len(timings)} runs\n")
+
+    def get_user(self, user_id):
+        users = User.objects.select_related('profile')
+        if user_id is not None:
+            user = users.filter(pk=user_id).first()
+        else:
+            user = users.annotate(post_total=Count('posts')).order_by('-post_total').first()
+        if user is None:
+            raise CommandError("No user to run the queries for.")
+        return user
+
+    def get_group(self, group_id):
+        if group_id is not None:
+            return Group.objects.filter(pk=group_id).first()
+        return Group.objects.annotate(post_total=Count('posts')).order_by('-post_total').first()
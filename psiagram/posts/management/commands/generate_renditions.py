@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from aws_rekognition.jobs import run_in_threads
+from groups.models import Group
+from posts.models import Post
+from profiles.models import UserProfile
+from psiagram import renditions
+
+# kind -> (model, image field, extra updates when renditions are written)
+TARGETS = {
+    # updated_at is part of the post fragment cache key (see posts.fragments)
+    'post': (Post, 'image', lambda: {'updated_at': timezone.now()}),
+    'avatar': (UserProfile, 'avatar', dict),
+    'group': (Group, 'group_picture', dict),
+}
+
+
+class Command(BaseCommand):
+    help = "Generate missing image renditions (posts, avatars, group pictures) in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=list(TARGETS), action='append', help="Only these kinds (repeatable).")
+        parser.add_argument('--workers', type=int, default=4, help="Images processed concurrently.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Rows loaded per batch.")
+        parser.add_argument('--force', action='store_true', help="Regenerate renditions that already exist.")
+
+    def handle(self, *args, **options):
+        for kind in options['kind'] or list(TARGETS):
+            self.backfill(kind, options)
+
+    def backfill(self, kind, options):
+        model, field_name, extra_updates = TARGETS[kind]
+        renditions_field = f'{field_name}_renditions'
+        queryset = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+        if not options['force']:
+            # Replaced avatars/group pictures are queued on save (ImageJob), only look for missing ones
+            queryset = queryset.filter(**{f'{renditions_field}__isnull': True})
+
+        def refresh(pk):
+            try:
+                return renditions.refresh(model, pk, field_name, kind, force=options['force'], **extra_updates())
+            except Exception as e:
+                self.stderr.write(f"{kind} {pk}: {e}")
+                return False
+
+        def pks():
+            last_pk = 0
+            while True:
+                batch = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:options['batch_size']])
+                if not batch:
+                    return
+                last_pk = batch[-1]
+                yield from batch
+
+        generated = 0
+        # Pillow releases the GIL while resizing/encoding, so threads do scale
+        results = run_in_threads(refresh, pks(), max(1, options['workers']))
+        for done, (pk, ok) in enumerate(results, 1):
+            generated += ok
+            if done % options['batch_size'] == 0:
+                self.stdout.write(f"{kind}: {generated} generated so far ({done} images checked)")
+
+        self.stdout.write(self.style.SUCCESS(f"{kind}: generated renditions for {generated} images."))
@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from posts.models import Post, Like, Comment
+
+
+def actual_count(model):
+    """
+    Correlated COUNT of `model` rows pointing at the outer Post.
+    """
+    rows = (
+        model.objects
+        .filter(post=OuterRef('pk'))
+        .order_by()
+        .values('post')
+        .annotate(n=Count('*'))
+        .values('n')
+    )
+    return Coalesce(Subquery(rows), 0)
+
+
+class Command(BaseCommand):
+    help = "Repair drift in Post.like_count / Post.comment_count, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Posts checked per batch.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report drifted posts.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_pk = 0
+        checked = 0
+        repaired = 0
+
+        while True:
+            batch = list(
+                Post.objects
+                .filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+
+            drifted = list(
+                Post.objects
+                .filter(pk__in=batch)
+                .annotate(actual_likes=actual_count(Like), actual_comments=actual_count(Comment))
+                .filter(~Q(like_count=F('actual_likes')) | ~Q(comment_count=F('actual_comments')))
+                .values_list('pk', flat=True)
+            )
+
+            if drifted and not options['dry_run']:
+                # Recount inside the UPDATE itself so concurrent likes are not lost
+                Post.objects.filter(pk__in=drifted).update(
+                    like_count=actual_count(Like),
+                    comment_count=actual_count(Comment),
+                )
+
+            for pk in drifted:
+                self.stdout.write(f"Post {pk}: counters drifted")
+
+            last_pk = batch[-1]
+            checked += len(batch)
+            repaired += len(drifted)
+
+        verb = "Found" if options['dry_run'] else "Repaired"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} posts. {verb} {repaired} drifted."))
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:19
+
+from django.conf import settings
+from django.db import migrations, models
+from psiagram.db import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('groups', '0002_initial'),
+        ('posts', '0004_post_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='post',
+            index=models.Index(fields=['verification_status', 'author', 'created_at', 'id'], name='post_status_author_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='post',
+            index=models.Index(fields=['group', 'verification_status', 'created_at', 'id'], name='post_group_status_created_idx'),
+        ),
+    ]
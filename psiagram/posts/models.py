@@ -1,7 +1,8 @@
 from django.db import models
 from django.conf import settings
+from psiagram.db import CounterFieldsMixin, LoadedFieldsMixin
 
-class Post(models.Model):
+class Post(CounterFieldsMixin, LoadedFieldsMixin, models.Model):
     """
     Model representing a user post in the application.
     """
@@ -45,7 +46,7 @@ class Post(models.Model):
     verification_status = models.CharField(
         max_length=20,
         choices=VerificationStatus.choices,
-        default=VerificationStatus.APPROVED,
+        default=VerificationStatus.PENDING,
         verbose_name='Verification Status'
     )
     rekognition_labels = models.JSONField(
@@ -53,11 +54,36 @@ class Post(models.Model):
         null=True,
         verbose_name='AWS Rekognition Labels'
     )
+    # Resized copies and blurhash of `image` (see psiagram.renditions)
+    image_renditions = models.JSONField(
+        blank=True,
+        null=True,
+        verbose_name='Image Renditions'
+    )
+    # Denormalized counters, only ever changed with F() updates (see posts.signals)
+    like_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Like Count'
+    )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Comment Count'
+    )
+
+    counter_fields = ('like_count', 'comment_count')
+    # Signals react to status transitions only
+    tracked_fields = ('verification_status',)
 
     class Meta:
         verbose_name = "Post"
         verbose_name_plural = "Posts"
         ordering = ['-created_at']
+        indexes = [
+            # FeedView (query mode), UserPostsView and pulled authors in the hybrid feed
+            models.Index(fields=['verification_status', 'author', 'created_at', 'id'], name='post_status_author_created_idx'),
+            # GroupPostsView
+            models.Index(fields=['group', 'verification_status', 'created_at', 'id'], name='post_group_status_created_idx'),
+        ]
     
     def __str__(self):
         return f"Post by {self.author.username} at {self.created_at}"
@@ -87,6 +113,10 @@ class Comment(models.Model):
         verbose_name = "Comment"
         verbose_name_plural = "Comments"
         ordering = ['created_at']
+        indexes = [
+            # Comment pages and the latest-comments window per post
+            models.Index(fields=['post', 'created_at', 'id'], name='comment_post_created_idx'),
+        ]
     
     def __str__(self):
         return f"Comment by {self.author.username} on {self.post.id}"
@@ -120,6 +150,57 @@ class Like(models.Model):
                 name='unique_like'
             )
         ]
+        indexes = [
+            # PostLikesListView, newest first
+            models.Index(fields=['post', '-created_at', '-id'], name='like_post_created_idx'),
+        ]
     
     def __str__(self):
-        return f"Like by {self.user.username} on {self.post.id}"
\ No newline at end of file
+        return f"Like by {self.user.username} on {self.post.id}"
+
+
+class TimelineEntry(models.Model):
+    """
+    Materialized home feed row: one entry per (owner, post) the owner should see.
+    Filled on write (fan-out) so the feed is read with a single index range scan.
+    """
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Owner'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Post'
+    )
+    # Denormalized from the post so unfollows can drop entries without a join
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Author'
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Post Created At'
+    )
+
+    class Meta:
+        verbose_name = "Timeline Entry"
+        verbose_name_plural = "Timeline Entries"
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['owner', 'post'],
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-post'], name='timeline_owner_created_idx'),
+            models.Index(fields=['owner', 'author'], name='timeline_owner_author_idx'),
+        ]
+
+    def __str__(self):
+        return f"Post {self.post_id} in timeline of {self.owner_id}"
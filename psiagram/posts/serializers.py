@@ -1,20 +1,135 @@
-from django.utils import timezone
-import boto3
 from django.conf import settings
+from django.db import models
+from django.db.models import F, Window
+from django.contrib.auth import get_user_model
+from django.db.models.functions import RowNumber
 from rest_framework import serializers
 from .models import Post, Comment, Like
+from . import fragments
 from users.serializers import UserSerializer
 from groups.models import Group
+from psiagram import renditions
+from psiagram.media import media_url
+from psiagram.serializers import SparseFieldsetMixin
+from aws_rekognition import dedup, prevalidation, uploads
+from aws_rekognition.models import StagedUpload
 
+User = get_user_model()
 
-def get_s3_url(file_path):
-    if not file_path:
-        return None
-    # Check if it's already a full URL (in case we change logic later)
-    if str(file_path).startswith('http'):
-        return str(file_path)
-        
-    return f"https://{settings.AWS_S3_BUCKET_NAME}.s3.{settings.AWS_REGION_NAME}.amazonaws.com/{file_path}"
+
+def liked_post_ids(user, post_ids):
+    """
+    Ids (among post_ids) of the posts the user has liked, resolved in one query.
+    """
+    return set(
+        Like.objects
+        .filter(user=user, post_id__in=post_ids)
+        .values_list('post_id', flat=True)
+    )
+
+
+def latest_comments_by_post(post_ids, limit=None):
+    """
+    The latest `limit` comments of every post in post_ids, fetched with a single
+    windowed query (ROW_NUMBER() partitioned by post). Returns {post_id: [comments]}
+    with each list in chronological order.
+    """
+    if limit is None:
+        limit = settings.POST_COMMENT_PREVIEW_SIZE
+
+    ranked = (
+        Comment.objects
+        .filter(post_id__in=post_ids)
+        .annotate(rank=Window(
+            expression=RowNumber(),
+            partition_by=F('post_id'),
+            order_by=(F('created_at').desc(), F('id').desc()),
+        ))
+        .filter(rank__lte=limit)
+        .select_related('author')
+        .order_by('post_id', 'created_at', 'id')
+    )
+
+    comments = {post_id: [] for post_id in post_ids}
+    for comment in ranked:
+        comments[comment.post_id].append(comment)
+    return comments
+
+
+def is_normalized(request):
+    """
+    True when the client asked for the normalized shape (?normalized=true): posts
+    only carry author/group ids and the referenced objects come once in `included`.
+    """
+    if request is None or request.method != 'GET':
+        return False
+    return request.query_params.get('normalized', '').lower() in ('1', 'true', 'yes')
+
+
+def build_included(posts_data):
+    """
+    The `included` map of a normalized page: every author and group referenced by
+    the serialized posts, once each, loaded with one query per type.
+    """
+    author_ids = {post['author'] for post in posts_data if post.get('author')}
+    group_ids = {post['group'] for post in posts_data if post.get('group')}
+
+    users = {}
+    for user in User.objects.filter(pk__in=author_ids).select_related('profile'):
+        profile = getattr(user, 'profile', None)
+        users[str(user.pk)] = {
+            'id': user.pk,
+            'username': user.username,
+            'avatar': media_url(profile.avatar) if profile and profile.avatar else None,
+        }
+
+    groups = {
+        str(group['id']): group
+        for group in Group.objects.filter(pk__in=group_ids).values('id', 'name')
+    }
+    return {'users': users, 'groups': groups}
+
+
+def resolve_latest_comments(serializer, obj):
+    # Filled once per page by PostListSerializer
+    latest = serializer.context.get('latest_comments')
+    if latest is None or obj.pk not in latest:
+        latest = latest_comments_by_post([obj.pk])
+    return CommentSerializer(latest[obj.pk], many=True, context=serializer.context).data
+
+
+def resolve_is_liked(serializer, obj):
+    request = serializer.context.get('request')
+    if request and request.user.is_authenticated:
+        # Filled once per page by PostListSerializer
+        liked = serializer.context.get('liked_post_ids')
+        if liked is not None:
+            return obj.pk in liked
+        return obj.likes.filter(user=request.user).exists()
+    return False
+
+
+class PostListSerializer(serializers.ListSerializer):
+    """
+    List serializer for posts that resolves the viewer's state (is_liked) and
+    the latest comments for every post on the page with one query each, and
+    loads the page's cached fragments (see posts.fragments) in one cache round trip.
+    """
+
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        post_ids = [post.pk for post in posts]
+        fields = self.child.fields
+
+        # Batch lookups are skipped when a sparse fieldset left their field out
+        request = self.context.get('request')
+        if 'is_liked' in fields and request and request.user.is_authenticated:
+            self.context['liked_post_ids'] = liked_post_ids(request.user, post_ids)
+        if 'comments' in fields or 'latest_comments' in fields:
+            self.context['latest_comments'] = latest_comments_by_post(post_ids)
+        # Cached viewer-independent fragments for the whole page in one go
+        self.context['post_fragments'] = fragments.load(fragments.name_for(self.child), posts)
+        return super().to_representation(posts)
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -47,16 +162,20 @@ class LikeSerializer(serializers.ModelSerializer):
         }
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer for the Post model. Includes details about the author, comments, and likes.
     """
     author_username = serializers.CharField(source='author.username', read_only=True)
     author_avatar = serializers.SerializerMethodField(read_only=True)
-    comments = CommentSerializer(many=True, read_only=True)
-    likes_count = serializers.SerializerMethodField(read_only=True)
+    # Only the latest POST_COMMENT_PREVIEW_SIZE comments, the rest is paginated
+    # under posts/<pk>/comments/
+    comments = serializers.SerializerMethodField(read_only=True)
+    comments_count = serializers.IntegerField(source='comment_count', read_only=True)
+    likes_count = serializers.IntegerField(source='like_count', read_only=True)
     is_liked = serializers.SerializerMethodField(read_only=True)
     group_name = serializers.CharField(source='group.name', read_only=True)
+    image_renditions = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Post
@@ -67,10 +186,12 @@ class PostSerializer(serializers.ModelSerializer):
             'group',
             'group_name',
             'image', 
+            'image_renditions',
             'caption', 
             'created_at', 
             'updated_at',
             'comments',
+            'comments_count',
             'likes_count',
             'is_liked',
             'verification_status',
@@ -82,42 +203,55 @@ class PostSerializer(serializers.ModelSerializer):
             'verification_status': {'read_only': True},
             'rekognition_labels': {'read_only': True}
         }
+        list_serializer_class = PostListSerializer
+
+    # Fields that differ per viewer or change often, rendered on top of the cached fragment
+    fragment_name = 'post-detail'
+    overlay_fields = ('comments', 'comments_count', 'likes_count', 'is_liked')
+    # Joins needed by each field (see SparseFieldsetMixin.optimize_queryset)
+    select_related_fields = {
+        'author_username': 'author',
+        'author_avatar': 'author__profile',
+        'group_name': 'group',
+    }
 
     def get_author_avatar(self, obj):
         if hasattr(obj.author, 'profile') and obj.author.profile.avatar:
-            return get_s3_url(obj.author.profile.avatar)
+            return media_url(obj.author.profile.avatar)
         return None
 
-    def get_likes_count(self, obj):
-        return obj.likes.count()
+    def get_image_renditions(self, obj):
+        return renditions.srcset(obj.image_renditions, obj.image.name, media_url)
 
     def get_is_liked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.likes.filter(user=request.user).exists()
-        return False
+        return resolve_is_liked(self, obj)
 
-    def to_representation(self, instance):
+    def get_comments(self, obj):
+        return resolve_latest_comments(self, obj)
+
+    def render_fragment(self, instance):
         representation = super().to_representation(instance)
         # Convert relative image path to full S3 URL
-        if instance.image:
-            representation['image'] = get_s3_url(instance.image)
+        if 'image' in representation and instance.image:
+            representation['image'] = media_url(instance.image)
         return representation
 
+    def to_representation(self, instance):
+        return fragments.render(self, instance)
+
 
-class PostFeedSerializer(serializers.ModelSerializer):
+class PostFeedSerializer(PostSerializer):
+    """
+    Posts as listed in feeds, also used to create them: the latest comments
+    instead of the detail's comments, and an optional s3_key of a direct upload
+    instead of the image file.
+    """
     author = serializers.PrimaryKeyRelatedField(read_only=True)
-    author_username = serializers.CharField(source='author.username', read_only=True)
-    author_avatar = serializers.SerializerMethodField(read_only=True)
-    likes_count = serializers.IntegerField(source='likes.count', read_only=True)
-    comments_count = serializers.IntegerField(source='comments.count', read_only=True)
     s3_key = serializers.CharField(write_only=True, required=False)
-    is_liked = serializers.SerializerMethodField(read_only=True)
+    latest_comments = serializers.SerializerMethodField(read_only=True)
     group = serializers.PrimaryKeyRelatedField(queryset=Group.objects.all(), required=False, allow_null=True)
-    group_name = serializers.CharField(source='group.name', read_only=True)
 
-    class Meta:
-        model = Post
+    class Meta(PostSerializer.Meta):
         fields = [
             "id",
             "author",
@@ -126,21 +260,35 @@ class PostFeedSerializer(serializers.ModelSerializer):
             "group",
             "group_name",
             "image",
+            "image_renditions",
             "caption",
             "created_at",
             "likes_count",
             "comments_count",
             "s3_key",
             "is_liked",
+            "latest_comments",
         ]
         extra_kwargs = {
             'image': {'required': False}
         }
 
-    def get_author_avatar(self, obj):
-        if hasattr(obj.author, 'profile') and obj.author.profile.avatar:
-            return get_s3_url(obj.author.profile.avatar)
-        return None
+    fragment_name = 'post-feed'
+    overlay_fields = ('likes_count', 'comments_count', 'is_liked', 'latest_comments')
+    # Replaced by the `included` map in the normalized shape
+    sideloaded_fields = ('author_username', 'author_avatar', 'group_name')
+
+    @classmethod
+    def get_selected_fields(cls, request):
+        selected = super().get_selected_fields(request)
+        if not is_normalized(request):
+            return selected
+        if selected is None:
+            selected = set(cls.Meta.fields)
+        return selected - set(cls.sideloaded_fields)
+
+    def get_latest_comments(self, obj):
+        return resolve_latest_comments(self, obj)
 
     def validate(self, attrs):
         if not attrs.get('image') and not attrs.get('s3_key'):
@@ -151,47 +299,36 @@ class PostFeedSerializer(serializers.ModelSerializer):
         s3_key = validated_data.pop('s3_key', None)
 
         if s3_key:
-            # Logic to move the file from 'uploads/' to 'posts/' on S3
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_REGION_NAME,
-            )
-            bucket_name = settings.AWS_S3_BUCKET_NAME
-
-            # 1. Define new path (mimicking upload_to='posts/%Y/%m/%d/')
-            filename = s3_key.split('/')[-1]
-            date_path = timezone.now().strftime('posts/%Y/%m/%d')
-            new_key = f"{date_path}/{filename}"
-
+            # The client uploaded straight to the final key (see InitiateUploadView),
+            # so using it is a database update; checks and dedup happen in the
+            # verification worker
             try:
-                # 2. Copy object
-                s3_client.copy_object(
-                    Bucket=bucket_name,
-                    CopySource={'Bucket': bucket_name, 'Key': s3_key},
-                    Key=new_key
+                validated_data['image'] = uploads.promote(
+                    s3_key, self.context['request'].user, StagedUpload.Purpose.POST
                 )
-                # 3. Delete original from 'uploads/'
-                s3_client.delete_object(Bucket=bucket_name, Key=s3_key)
+            except uploads.UploadError as e:
+                raise serializers.ValidationError({'s3_key': str(e)})
 
-                # 4. Set the image field to the new path
-                validated_data['image'] = new_key
-                
-            except Exception as e:
-                raise serializers.ValidationError(f"Failed to process S3 file: {str(e)}")
+            return super().create(validated_data)
 
-        return super().create(validated_data)
-    
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        # Convert relative image path to full S3 URL
-        if instance.image:
-             representation['image'] = get_s3_url(instance.image)
-        return representation
-    
-    def get_is_liked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.likes.filter(user=request.user).exists()
-        return False
+        # Direct file upload: only store bytes we have not seen before
+        image = validated_data['image']
+        data = image.read()
+        image.seek(0)
+        try:
+            prevalidation.check_bytes(data, getattr(image, 'content_type', None))
+        except prevalidation.UploadRejected as e:
+            raise serializers.ValidationError({'image': str(e)})
+        fingerprint = dedup.fingerprint(data)
+        upload = dedup.acquire(fingerprint)
+        if upload is not None:
+            validated_data['image'] = upload.s3_key
+            return super().create(validated_data)
+
+        post = super().create(validated_data)
+        upload = dedup.register(fingerprint, post.image.name)
+        if upload.s3_key != post.image.name:
+            post.image.delete(save=False)
+            post.image = upload.s3_key
+            post.save(update_fields=['image'])
+        return post
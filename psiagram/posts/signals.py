@@ -0,0 +1,154 @@
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from groups.models import Group
+from profiles.models import UserProfile
+from .models import Post, TimelineEntry, Like, Comment
+from . import feed_cache, fragments, timeline
+
+
+@receiver(post_save, sender=Post)
+def sync_feeds_on_post_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    previous_status = getattr(instance, '_loaded_verification_status', None)
+    current_status = instance.verification_status
+
+    # Only react to status transitions, not to every caption edit
+    if not created and previous_status == current_status:
+        return
+
+    if current_status == Post.VerificationStatus.APPROVED:
+        timeline.fan_out_post(instance)
+    elif not created:
+        timeline.retract_post(instance)
+    else:
+        # A new post awaiting verification is not visible anywhere yet
+        return
+
+    feed_cache.invalidate_author(instance.author_id)
+
+
+@receiver(m2m_changed, sender=UserProfile.follows.through)
+def sync_timelines_on_follow(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ("post_add", "post_remove"):
+        other_user_ids = list(
+            UserProfile.objects.filter(pk__in=pk_set).values_list('user_id', flat=True)
+        )
+
+        # reverse=False: instance follows/unfollows pk_set
+        # reverse=True: pk_set follow/unfollow instance (e.g. profile.followed_by.add())
+        if reverse:
+            owner_ids, author_ids = other_user_ids, [instance.user_id]
+        else:
+            owner_ids, author_ids = [instance.user_id], other_user_ids
+
+        if action == "post_add":
+            # High-follower authors are pulled at read time in hybrid mode
+            author_ids = timeline.push_author_ids(author_ids)
+
+        for owner_id in owner_ids:
+            if action == "post_add":
+                timeline.add_authors_to_timeline(owner_id, author_ids)
+            else:
+                timeline.remove_authors_from_timeline(owner_id, author_ids)
+
+    elif action == "post_clear":
+        if reverse:
+            # Nobody follows instance anymore
+            TimelineEntry.objects.filter(author_id=instance.user_id).exclude(owner_id=instance.user_id).delete()
+        else:
+            # Instance follows nobody anymore
+            TimelineEntry.objects.filter(owner_id=instance.user_id).exclude(author_id=instance.user_id).delete()
+
+
+# Counters
+# Adjusted with F() expressions so concurrent writers never lose an update.
+# They run inside the caller's transaction, together with the Like/Comment write.
+# Likes and comments have no delete receivers, so they are fast-deleted (one
+# DELETE) with their post or user: unlikes are counted by LikePostView, the
+# likes/comments of a deleted user on other posts by release_counters_of_user.
+
+@receiver(post_save, sender=Like)
+def increment_like_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Post.objects.filter(pk=instance.post_id).update(like_count=F('like_count') + 1)
+
+
+@receiver(post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Post.objects.filter(pk=instance.post_id).update(comment_count=F('comment_count') + 1)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def release_counters_of_user(sender, instance, **kwargs):
+    # The user's own posts go away with their counters
+    Post.objects.filter(likes__user=instance).exclude(author=instance).update(
+        like_count=Greatest(F('like_count') - 1, 0)
+    )
+    comments = (
+        Comment.objects.filter(post=OuterRef('pk'), author=instance)
+        .order_by().values('post').annotate(total=Count('pk')).values('total')
+    )
+    Post.objects.filter(comments__author=instance).exclude(author=instance).update(
+        comment_count=Greatest(F('comment_count') - Subquery(comments), 0)
+    )
+
+
+# Feed cache
+# Cached feed pages are keyed by a per-user version; these receivers bump it
+# for exactly the users whose feed changed.
+
+@receiver(post_delete, sender=Post)
+def invalidate_feeds_on_post_delete(sender, instance, **kwargs):
+    feed_cache.invalidate_author(instance.author_id)
+
+
+@receiver(m2m_changed, sender=UserProfile.follows.through)
+def invalidate_feeds_on_follow(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ("post_add", "post_remove"):
+        if reverse:
+            follower_ids = UserProfile.objects.filter(pk__in=pk_set).values_list('user_id', flat=True)
+        else:
+            follower_ids = [instance.user_id]
+        feed_cache.bump_user_versions(follower_ids)
+    elif action == "pre_clear":
+        if reverse:
+            feed_cache.bump_user_versions(instance.followed_by.values_list('user_id', flat=True))
+        else:
+            feed_cache.bump_user_versions([instance.user_id])
+
+
+@receiver(post_save, sender=Like)
+def invalidate_feed_on_like(sender, instance, **kwargs):
+    # is_liked on the liker's own cached pages (unlikes: see LikePostView)
+    feed_cache.bump_user_versions([instance.user_id])
+
+
+# Fragment cache
+# Cached post fragments embed the author's username/avatar and the group name.
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_fragments_on_user_save(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    fragments.bump_author(instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_fragments_on_avatar_change(sender, instance, created, **kwargs):
+    if created:
+        return
+    if getattr(instance, '_loaded_avatar', None) == instance.avatar.name:
+        return
+    fragments.bump_author(instance.user_id)
+
+
+@receiver(post_save, sender=Group)
+def invalidate_fragments_on_group_save(sender, instance, created, **kwargs):
+    if not created:
+        fragments.bump_group(instance.pk)
@@ -1,3 +1,627 @@
-from django.test import TestCase
+from io import BytesIO, StringIO
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APITestCase
+from aws_rekognition.models import ImageJob
+from psiagram import media
+from psiagram.testing import TEST_STORAGES, make_user
+from groups.models import Group
+from profiles.models import UserProfile
+from .models import Post, Comment, Like, TimelineEntry
+from . import timeline
 
-# Create your tests here.
+
+def make_post(author, **kwargs):
+    kwargs.setdefault('verification_status', Post.VerificationStatus.APPROVED)
+    return Post.objects.create(author=author, image=f'posts/{author.username}.jpg', **kwargs)
+
+
+class TimelineFanOutTests(TestCase):
+    def setUp(self):
+        self.author = make_user('author')
+        self.follower = make_user('follower')
+        self.follower.profile.follows.add(self.author.profile)
+
+    def timeline_of(self, user):
+        return list(TimelineEntry.objects.filter(owner=user).values_list('post_id', flat=True))
+
+    def test_approved_post_is_pushed_to_author_and_followers(self):
+        post = make_post(self.author)
+
+        self.assertEqual(self.timeline_of(self.author), [post.id])
+        self.assertEqual(self.timeline_of(self.follower), [post.id])
+
+    def test_pending_post_is_pushed_only_once_approved(self):
+        post = make_post(self.author, verification_status=Post.VerificationStatus.PENDING)
+        self.assertEqual(self.timeline_of(self.follower), [])
+
+        post = Post.objects.get(pk=post.pk)
+        post.verification_status = Post.VerificationStatus.APPROVED
+        post.save()
+        self.assertEqual(self.timeline_of(self.follower), [post.id])
+
+        post.verification_status = Post.VerificationStatus.REJECTED
+        post.save()
+        self.assertEqual(self.timeline_of(self.follower), [])
+
+    def test_follow_and_unfollow_update_timeline(self):
+        other = make_user('other')
+        post = make_post(other)
+        self.assertEqual(self.timeline_of(self.follower), [])
+
+        self.follower.profile.follows.add(other.profile)
+        self.assertEqual(self.timeline_of(self.follower), [post.id])
+
+        self.follower.profile.follows.remove(other.profile)
+        self.assertEqual(self.timeline_of(self.follower), [])
+
+
+@override_settings(FEED_MODE='timeline', STORAGES=TEST_STORAGES)
+class TimelineFeedViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = make_user('author')
+        self.follower = make_user('follower')
+        self.follower.profile.follows.add(self.author.profile)
+        self.client.force_authenticate(self.follower)
+
+    def test_feed_reads_from_timeline(self):
+        older = make_post(self.author)
+        newer = make_post(self.author)
+        make_post(make_user('stranger'))
+
+        response = self.client.get(reverse('posts-feed'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['id'] for p in response.data['results']], [newer.id, older.id])
+
+
+@override_settings(FEED_MODE='hybrid', FEED_PULL_FOLLOWER_THRESHOLD=2, STORAGES=TEST_STORAGES)
+class HybridFeedViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.viewer = make_user('viewer')
+        self.celebrity = make_user('celebrity')
+        self.regular = make_user('regular')
+        make_user('fan').profile.follows.add(self.celebrity.profile)
+        self.viewer.profile.follows.add(self.celebrity.profile, self.regular.profile)
+        self.client.force_authenticate(self.viewer)
+
+    def test_high_follower_author_is_pulled_not_pushed(self):
+        post = make_post(self.celebrity)
+
+        self.assertFalse(TimelineEntry.objects.filter(owner=self.viewer, post=post).exists())
+        self.assertTrue(TimelineEntry.objects.filter(owner=self.celebrity, post=post).exists())
+
+    def test_push_authors_are_resolved_with_one_query(self):
+        with self.assertNumQueries(1):
+            pushed = timeline.push_author_ids([self.celebrity.id, self.regular.id, self.viewer.id])
+
+        self.assertEqual(pushed, [self.regular.id, self.viewer.id])
+
+    def test_backfill_followers_of_author_after_leaving_pull_mode(self):
+        post = make_post(self.celebrity)
+        UserProfile.objects.filter(user=self.celebrity).update(followers_count=1)
+        self.assertFalse(TimelineEntry.objects.filter(owner=self.viewer, post=post).exists())
+
+        call_command('backfill_timelines', '--followers-of', str(self.celebrity.id), stdout=StringIO())
+
+        self.assertTrue(TimelineEntry.objects.filter(owner=self.viewer, post=post).exists())
+
+    def test_pages_merge_pushed_and_pulled_posts(self):
+        posts = [make_post(author) for author in [self.regular, self.celebrity] * 4]
+        expected = [post.id for post in sorted(posts, key=lambda p: (p.created_at, p.id), reverse=True)]
+
+        seen = []
+        url = reverse('posts-feed')
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(p['id'] for p in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(seen, expected)
+
+
+class PostCounterTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = make_user('author')
+        self.viewer = make_user('viewer')
+        self.post = make_post(self.author)
+        self.client.force_authenticate(self.viewer)
+
+    def test_like_toggle_keeps_like_count(self):
+        url = reverse('post-like', args=[self.post.pk])
+
+        response = self.client.post(url)
+        self.assertEqual(response.data['likes_count'], 1)
+        response = self.client.post(url)
+        self.assertEqual(response.data['likes_count'], 0)
+
+    def test_comment_updates_comment_count(self):
+        self.client.post(reverse('post-comment', args=[self.post.pk]), {'content': 'Good dog'})
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+    def test_save_does_not_overwrite_counters(self):
+        stale = Post.objects.get(pk=self.post.pk)
+        Like.objects.create(post=self.post, user=self.viewer)
+
+        stale.caption = 'edited'
+        stale.save()
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+
+    def test_post_delete_fast_deletes_likes_and_comments(self):
+        for n in range(3):
+            Like.objects.create(post=self.post, user=make_user(f'fan{n}'))
+            Comment.objects.create(post=self.post, author=self.viewer, content='Good dog')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.post.delete()
+
+        sqls = [q['sql'] for q in queries.captured_queries]
+        # Deleted straight away, without being loaded first
+        self.assertFalse(any(sql.startswith('SELECT') and 'FROM "posts_like"' in sql for sql in sqls))
+        self.assertFalse(any(sql.startswith('SELECT') and 'FROM "posts_comment"' in sql for sql in sqls))
+        self.assertEqual(sum(sql.startswith('DELETE FROM "posts_like"') for sql in sqls), 1)
+        self.assertFalse(any(sql.startswith('UPDATE "posts_post"') for sql in sqls))
+
+    def test_deleted_user_releases_counters_on_other_posts(self):
+        own_post = make_post(self.viewer)
+        Like.objects.create(post=self.post, user=self.viewer)
+        Like.objects.create(post=own_post, user=self.viewer)
+        Like.objects.create(post=self.post, user=self.author)
+        for _ in range(2):
+            Comment.objects.create(post=self.post, author=self.viewer, content='Good dog')
+
+        self.viewer.delete()
+
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (1, 0))
+
+    def test_reconcile_repairs_drift(self):
+        Like.objects.create(post=self.post, user=self.viewer)
+        Post.objects.filter(pk=self.post.pk).update(like_count=7, comment_count=3)
+
+        call_command('reconcile_post_counters', stdout=StringIO())
+
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (1, 0))
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class FeedViewerStateTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = make_user('author')
+        self.viewer = make_user('viewer')
+        self.viewer.profile.follows.add(self.author.profile)
+        self.client.force_authenticate(self.viewer)
+
+    def count_feed_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts-feed'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data['results']
+
+    def test_is_liked_costs_one_query_per_page(self):
+        Like.objects.create(post=make_post(self.author), user=self.viewer)
+        small_page_queries, _ = self.count_feed_queries()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(4):
+                make_post(self.author)
+        full_page_queries, results = self.count_feed_queries()
+
+        self.assertEqual(len(results), 5)
+        self.assertEqual(full_page_queries, small_page_queries)
+        self.assertEqual([post['is_liked'] for post in results], [False] * 4 + [True])
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class FeedPaginationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = make_user('author')
+        self.client.force_authenticate(self.author)
+
+    def test_posts_created_in_same_instant_are_not_skipped_or_repeated(self):
+        posts = [make_post(self.author) for _ in range(12)]
+        same_instant = posts[0].created_at
+        Post.objects.update(created_at=same_instant)
+        TimelineEntry.objects.update(created_at=same_instant)
+        expected = sorted((post.id for post in posts), reverse=True)
+
+        seen = []
+        url = reverse('user-posts', args=[self.author.pk])
+        while url:
+            response = self.client.get(url)
+            seen.extend(p['id'] for p in response.data['results'])
+            last_response, url = response, response.data['next']
+        self.assertEqual(seen, expected)
+
+        # And back again through the previous links
+        seen_backwards = []
+        url = last_response.data['previous']
+        while url:
+            response = self.client.get(url)
+            seen_backwards = [p['id'] for p in response.data['results']] + seen_backwards
+            url = response.data['previous']
+        self.assertEqual(seen_backwards, expected[:-len(last_response.data['results'])])
+
+
+
+@override_settings(FEED_CACHE_TIMEOUT=60, STORAGES=TEST_STORAGES)
+class FeedCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = make_user('author')
+        self.viewer = make_user('viewer')
+        self.viewer.profile.follows.add(self.author.profile)
+        self.client.force_authenticate(self.viewer)
+
+    def get_feed_ids(self):
+        response = self.client.get(reverse('posts-feed'))
+        return [post['id'] for post in response.data['results']]
+
+    def test_repeated_page_is_served_from_cache(self):
+        make_post(self.author)
+        self.get_feed_ids()
+
+        with self.assertNumQueries(0):
+            self.get_feed_ids()
+
+    def test_followed_author_activity_invalidates_page(self):
+        first = make_post(self.author)
+        self.assertEqual(self.get_feed_ids(), [first.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second = make_post(self.author)
+        self.assertEqual(self.get_feed_ids(), [second.id, first.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(self.get_feed_ids(), [first.id])
+
+    def test_versions_are_bumped_on_commit(self):
+        make_post(self.author)
+        self.get_feed_ids()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            second = make_post(self.author)
+            # A read before the commit caches nothing under a new version
+            self.assertNotIn(second.id, self.get_feed_ids())
+        for callback in callbacks:
+            callback()
+        self.assertIn(second.id, self.get_feed_ids())
+
+    def test_unrelated_activity_keeps_page(self):
+        make_post(self.author)
+        self.get_feed_ids()
+
+        make_post(make_user('stranger'))
+        with self.assertNumQueries(0):
+            self.get_feed_ids()
+
+
+@override_settings(FEED_CACHE_TIMEOUT=0, POST_FRAGMENT_CACHE_TIMEOUT=60, STORAGES=TEST_STORAGES)
+class PostFragmentCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = make_user('author')
+        self.viewer = make_user('viewer')
+        self.post = make_post(self.author)
+        self.client.force_authenticate(self.viewer)
+        self.url = reverse('user-posts', args=[self.author.pk])
+
+    def get_first_post(self):
+        return self.client.get(self.url).data['results'][0]
+
+    def test_viewer_fields_are_overlaid_on_cached_fragment(self):
+        self.assertFalse(self.get_first_post()['is_liked'])
+
+        # Bypasses updated_at, so the cached fragment must still be served
+        Post.objects.filter(pk=self.post.pk).update(caption='not rendered')
+        Like.objects.create(post=self.post, user=self.viewer)
+
+        post = self.get_first_post()
+        self.assertIsNone(post['caption'])
+        self.assertTrue(post['is_liked'])
+        self.assertEqual(post['likes_count'], 1)
+
+    def test_author_and_group_changes_invalidate_fragment(self):
+        self.assertIsNone(self.get_first_post()['author_avatar'])
+
+        self.author.username = 'renamed'
+        self.author.save()
+        profile = UserProfile.objects.get(user=self.author)
+        profile.avatar = 'avatars/new.jpg'
+        profile.save()
+
+        post = self.get_first_post()
+        self.assertEqual(post['author_username'], 'renamed')
+        self.assertTrue(post['author_avatar'].endswith('avatars/new.jpg'))
+
+
+@override_settings(POST_COMMENT_PREVIEW_SIZE=2, STORAGES=TEST_STORAGES)
+class CommentPreviewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = make_user('author')
+        self.client.force_authenticate(self.author)
+        self.posts = [make_post(self.author) for _ in range(3)]
+        self.comments = {
+            post.id: [Comment.objects.create(post=post, author=self.author, content=f'{post.id}-{i}') for i in range(4)]
+            for post in self.posts
+        }
+
+    def test_feed_embeds_latest_comments_per_post(self):
+        response = self.client.get(reverse('user-posts', args=[self.author.pk]))
+
+        for post in response.data['results']:
+            expected = [comment.id for comment in self.comments[post['id']][-2:]]
+            self.assertEqual([comment['id'] for comment in post['latest_comments']], expected)
+            self.assertEqual(post['comments_count'], 4)
+
+    def test_post_detail_embeds_latest_comments_only(self):
+        post = self.posts[0]
+        response = self.client.get(reverse('post-detail', args=[post.pk]))
+
+        self.assertEqual(len(response.data['comments']), 2)
+        self.assertEqual(response.data['comments_count'], 4)
+
+    def test_comments_endpoint_is_paginated_newest_first(self):
+        post = self.posts[0]
+        url = reverse('post-comments', args=[post.pk])
+        seen = []
+        while url:
+            response = self.client.get(url)
+            seen.extend(comment['id'] for comment in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(seen, [comment.id for comment in reversed(self.comments[post.id])])
+
+
+@override_settings(FEED_CACHE_TIMEOUT=0, STORAGES=TEST_STORAGES)
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = make_user('author')
+        self.post = make_post(self.author)
+        Comment.objects.create(post=self.post, author=self.author, content='hi')
+        self.client.force_authenticate(self.author)
+        self.url = reverse('user-posts', args=[self.author.pk])
+
+    def test_fields_limits_representation_and_queries(self):
+        with CaptureQueriesContext(connection) as full:
+            self.client.get(self.url)
+        with CaptureQueriesContext(connection) as sparse:
+            response = self.client.get(self.url, {'fields': 'id,caption'})
+
+        self.assertEqual(set(response.data['results'][0]), {'id', 'caption'})
+        sql = ' '.join(query['sql'] for query in sparse.captured_queries)
+        self.assertNotIn('posts_like', sql)
+        self.assertNotIn('posts_comment', sql)
+        self.assertLess(len(sparse), len(full))
+
+    def test_omit_drops_fields(self):
+        response = self.client.get(reverse('post-detail', args=[self.post.pk]), {'omit': 'comments,is_liked'})
+
+        self.assertNotIn('comments', response.data)
+        self.assertNotIn('is_liked', response.data)
+        self.assertEqual(response.data['comments_count'], 1)
+
+
+@override_settings(FEED_CACHE_TIMEOUT=0, STORAGES=TEST_STORAGES)
+class NormalizedFeedTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = make_user('author')
+        self.viewer = make_user('viewer')
+        self.viewer.profile.follows.add(self.author.profile)
+        for _ in range(3):
+            make_post(self.author)
+        make_post(self.viewer)
+        self.client.force_authenticate(self.viewer)
+
+    def test_authors_are_sideloaded_once(self):
+        response = self.client.get(reverse('posts-feed'), {'normalized': 'true'})
+
+        posts = response.data['results']
+        self.assertEqual(len(posts), 4)
+        for post in posts:
+            self.assertNotIn('author_username', post)
+            self.assertNotIn('group_name', post)
+        users = response.data['included']['users']
+        self.assertEqual(set(users), {str(self.author.pk), str(self.viewer.pk)})
+        self.assertEqual(users[str(self.author.pk)]['username'], 'author')
+        self.assertEqual(response.data['included']['groups'], {})
+
+    def test_default_shape_is_unchanged(self):
+        response = self.client.get(reverse('posts-feed'))
+
+        self.assertNotIn('included', response.data)
+        self.assertEqual(response.data['results'][0]['author_username'], 'viewer')
+
+
+def store_image(name, size=(800, 600)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 120, 40)).save(buffer, format='JPEG')
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+@override_settings(
+    FEED_CACHE_TIMEOUT=0,
+    STORAGES=TEST_STORAGES,
+    IMAGE_RENDITION_FORMATS=['webp'],
+    IMAGE_RENDITION_WIDTHS={'post': [320, 640, 1080], 'avatar': [64], 'group': [128]},
+    VERIFICATION_LABELER='aws_rekognition.labelers.FakeLabeler',
+)
+class ImageRenditionTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = make_user('author')
+        self.client.force_authenticate(self.author)
+
+    def test_backfill_generates_renditions_and_serializer_returns_srcset(self):
+        post = make_post(self.author)
+        post.image = store_image('posts/photo.jpg')
+        post.save()
+
+        call_command('generate_renditions', '--kind', 'post', '--workers', '1', stdout=StringIO())
+
+        post.refresh_from_db()
+        stored = post.image_renditions['files']
+        # 1080 would upscale the 800px original
+        self.assertEqual(set(stored['jpeg']), {'320', '640'})
+        for key in list(stored['jpeg'].values()) + list(stored['webp'].values()):
+            self.assertTrue(default_storage.exists(key))
+
+        data = self.client.get(reverse('post-detail', args=[post.pk])).data['image_renditions']
+        self.assertEqual(set(data['webp']), {'320w', '640w'})
+        self.assertEqual(len(data['blurhash']), 28)
+        self.assertEqual((data['width'], data['height']), (800, 600))
+
+    def run_worker(self):
+        call_command('process_verification_jobs', '--once', '--workers', '1', stdout=StringIO())
+
+    def test_replaced_group_picture_gets_new_renditions(self):
+        group = Group.objects.create(name='dogs')
+        group.group_picture = store_image('group_pictures/old.jpg')
+        group.save()
+        self.run_worker()
+        group.group_picture = store_image('group_pictures/new.jpg')
+        group.save()
+        self.run_worker()
+
+        group.refresh_from_db()
+        self.assertEqual(group.group_picture_renditions['source'], group.group_picture.name)
+        self.assertEqual(list(group.group_picture_renditions['files']['jpeg']), ['128'])
+
+    def test_avatar_is_processed_once_and_outside_the_save(self):
+        profile = UserProfile.objects.get(user=self.author)
+        profile.avatar = 'avatars/missing.jpg'
+        # Renditions of a missing file fail in the worker, not in the save
+        profile.save()
+        profile.bio = 'Good dog'
+        profile.save()
+        UserProfile.objects.get(pk=profile.pk).save()
+
+        job = ImageJob.objects.get()
+        self.assertEqual((job.kind, job.image_key), (ImageJob.Kind.AVATAR, 'avatars/missing.jpg'))
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImageJob.Status.QUEUED)
+        self.assertIn('missing.jpg', job.last_error)
+        self.assertIsNone(UserProfile.objects.get(pk=profile.pk).avatar_renditions)
+
+
+@override_settings(MEDIA_URL_MODE='signed', MEDIA_SIGNED_URL_EXPIRES=600, AWS_S3_BUCKET_NAME='bucket', STORAGES=TEST_STORAGES)
+class MediaURLTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        media._signed_urls.clear()
+        self.signed = 0
+        self.expires_at = {}
+        patcher = patch.object(media, 'get_s3_client')
+        self.client_factory = patcher.start()
+        self.client_factory.return_value.generate_presigned_url.side_effect = self.sign
+        self.addCleanup(patcher.stop)
+
+    def sign(self, ClientMethod, Params, ExpiresIn):
+        self.signed += 1
+        self.expires_at[self.signed] = media.time.monotonic() + ExpiresIn
+        return f"https://bucket.s3.amazonaws.com/{Params['Key']}?signature={self.signed}"
+
+    def at(self, seconds):
+        # The LRU reads the monotonic clock, the cache backend the wall clock
+        monotonic = patch.object(media.time, 'monotonic', return_value=1000 + seconds)
+        wall = patch.object(media.time, 'time', return_value=1_700_000_000 + seconds)
+        monotonic.start()
+        wall.start()
+        self.addCleanup(monotonic.stop)
+        self.addCleanup(wall.stop)
+
+    def test_signs_each_object_once_per_quarter_validity(self):
+        with patch.object(media.time, 'monotonic', return_value=1000):
+            first = media.media_url('posts/a.jpg')
+            self.assertEqual(media.media_url('posts/a.jpg'), first)
+            media.media_url('posts/b.jpg')
+        self.assertEqual(self.signed, 2)
+
+        with patch.object(media.time, 'monotonic', return_value=1000 + 150):
+            self.assertNotEqual(media.media_url('posts/a.jpg'), first)
+        self.assertEqual(self.signed, 3)
+
+    def test_empty_files_and_full_urls(self):
+        self.assertIsNone(media.media_url(''))
+        self.assertIsNone(media.media_url(None))
+        self.assertEqual(media.media_url('https://example.com/a.jpg'), 'https://example.com/a.jpg')
+        self.assertEqual(self.signed, 0)
+
+    @override_settings(MEDIA_URL_MODE='public', MEDIA_CDN_DOMAIN='cdn.example.com')
+    def test_public_urls_use_cdn_domain(self):
+        self.assertEqual(media.media_url('posts/a.jpg'), 'https://cdn.example.com/posts/a.jpg')
+        self.assertIsNone(media.max_cache_seconds())
+        self.assertEqual(media.cache_timeout(3600), 3600)
+
+    def test_cached_responses_expire_before_their_urls(self):
+        self.assertEqual(media.cache_timeout(3600), 150)
+        self.assertEqual(media.cache_timeout(60), 60)
+
+    @override_settings(FEED_CACHE_TIMEOUT=3600, POST_FRAGMENT_CACHE_TIMEOUT=3600)
+    def test_url_stays_valid_through_every_cache_layer(self):
+        author = make_user('author')
+        viewer = make_user('viewer')
+        viewer.profile.follows.add(author.profile)
+        make_post(author)
+        self.client.force_authenticate(viewer)
+
+        def served_signature(seconds, page_cache=True):
+            self.at(seconds)
+            with self.settings(FEED_CACHE_TIMEOUT=3600 if page_cache else 0):
+                url = self.client.get(reverse('posts-feed')).data['results'][0]['image']
+            signature = int(url.rsplit('=', 1)[1])
+            # A client always gets at least a quarter of the validity to load the image
+            self.assertGreaterEqual(self.expires_at[signature] - (1000 + seconds), 150)
+            return signature
+
+        # Signed into the LRU, then each layer is filled just before the one below expires
+        self.at(0)
+        media.media_url('posts/author.jpg')
+        self.assertEqual(served_signature(149, page_cache=False), 1)  # LRU -> fragment
+        self.assertEqual(served_signature(298), 1)  # fragment -> page
+        self.assertEqual(served_signature(447), 1)  # page
+        # Every layer has expired: signed again
+        self.assertEqual(served_signature(448), 2)
+
+    def test_serializers_sign_each_object_once(self):
+        author = make_user('author')
+        profile = UserProfile.objects.get(user=author)
+        profile.avatar = 'avatars/a.jpg'
+        profile.save()
+        make_post(author)
+        make_post(author)
+        self.client.force_authenticate(make_user('viewer'))
+
+        posts = self.client.get(reverse('user-posts', args=[author.pk])).data['results']
+        profile_data = self.client.get(reverse('profile-detail', args=[author.pk])).data
+
+        self.assertEqual(posts[0]['author_avatar'], 'https://bucket.s3.amazonaws.com/avatars/a.jpg?signature=1')
+        self.assertEqual(posts[1]['author_avatar'], posts[0]['author_avatar'])
+        self.assertEqual(profile_data['avatar'], posts[0]['author_avatar'])
+        # Both posts share one image: the avatar and the image are signed once each
+        self.assertEqual(posts[1]['image'], posts[0]['image'])
+        self.assertEqual(self.signed, 2)
@@ -0,0 +1,194 @@
+import heapq
+from django.conf import settings
+from django.db.models import Q
+from profiles.models import UserProfile
+from .models import Post, TimelineEntry
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _insert_entries(entries):
+    # ignore_conflicts keeps every write idempotent (unique owner/post pair)
+    for batch in _chunked(entries, settings.FEED_FANOUT_BATCH_SIZE):
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def follower_user_ids(author_id):
+    """
+    User ids of everyone following the given author.
+    """
+    return (
+        UserProfile.objects
+        .filter(follows__user_id=author_id)
+        .values_list('user_id', flat=True)
+    )
+
+
+def is_pull_author(author_id):
+    """
+    In hybrid mode, authors with many followers are read at request time instead of
+    being pushed into every follower's timeline.
+    Posts made while an author is pulled are never pushed: should the author drop
+    below the threshold again, they are missing from the followers' timelines
+    until `manage.py backfill_timelines --followers-of <author id>` runs.
+    """
+    if settings.FEED_MODE != 'hybrid':
+        return False
+    return UserProfile.objects.filter(
+        user_id=author_id, followers_count__gte=settings.FEED_PULL_FOLLOWER_THRESHOLD
+    ).exists()
+
+
+def push_author_ids(author_ids):
+    """
+    The given authors minus the pulled ones, with one query.
+    """
+    author_ids = list(author_ids)
+    if settings.FEED_MODE != 'hybrid' or not author_ids:
+        return author_ids
+    pulled = set(
+        UserProfile.objects
+        .filter(user_id__in=author_ids, followers_count__gte=settings.FEED_PULL_FOLLOWER_THRESHOLD)
+        .values_list('user_id', flat=True)
+    )
+    return [author_id for author_id in author_ids if author_id not in pulled]
+
+
+def pull_author_ids(user):
+    """
+    User ids of the high-follower authors this user follows (hybrid mode only).
+    """
+    if settings.FEED_MODE != 'hybrid':
+        return []
+    return list(
+        user.profile.follows
+        .filter(followers_count__gte=settings.FEED_PULL_FOLLOWER_THRESHOLD)
+        .values_list('user_id', flat=True)
+    )
+
+
+def fan_out_post(post):
+    """
+    Push an approved post into the author's own timeline and every follower's timeline.
+    """
+    owner_ids = [post.author_id]
+    if not is_pull_author(post.author_id):
+        owner_ids.extend(follower_user_ids(post.author_id).iterator(chunk_size=settings.FEED_FANOUT_BATCH_SIZE))
+
+    _insert_entries(
+        TimelineEntry(
+            owner_id=owner_id,
+            post_id=post.id,
+            author_id=post.author_id,
+            created_at=post.created_at,
+        )
+        for owner_id in owner_ids
+    )
+
+
+def retract_post(post):
+    """
+    Remove a post from every timeline (e.g. it is no longer approved).
+    """
+    TimelineEntry.objects.filter(post_id=post.id).delete()
+
+
+def add_authors_to_timeline(owner_id, author_ids, limit=None):
+    """
+    Copy the most recent approved posts of the given authors into one timeline.
+    Used when a follow is added and by the backfill command.
+    """
+    if limit is None:
+        limit = settings.FEED_FOLLOW_BACKFILL_LIMIT
+
+    posts = (
+        Post.objects
+        .filter(author_id__in=author_ids, verification_status=Post.VerificationStatus.APPROVED)
+        .order_by('-created_at')
+        .values_list('id', 'author_id', 'created_at')[:limit]
+    )
+
+    _insert_entries(
+        TimelineEntry(
+            owner_id=owner_id,
+            post_id=post_id,
+            author_id=author_id,
+            created_at=created_at,
+        )
+        for post_id, author_id, created_at in posts
+    )
+
+
+def remove_authors_from_timeline(owner_id, author_ids):
+    """
+    Drop every post of the given authors from one timeline (unfollow).
+    """
+    TimelineEntry.objects.filter(owner_id=owner_id, author_id__in=author_ids).delete()
+
+
+def rebuild_timeline(user, limit=None):
+    """
+    Fill a user's timeline from scratch: own posts plus posts of everyone they follow.
+    """
+    author_ids = push_author_ids(user.profile.follows.values_list('user_id', flat=True))
+    author_ids.append(user.id)
+    add_authors_to_timeline(user.id, author_ids, limit=limit)
+
+
+def _older_than(position, created_field, id_field):
+    # Keyset condition for (created_at, id) < position, newest first
+    created_at, pk = position
+    return Q(**{f'{created_field}__lt': created_at}) | Q(**{created_field: created_at, f'{id_field}__lt': pk})
+
+
+def merge_streams(*streams, limit):
+    """
+    k-way merge of (created_at, post_id) streams that are each sorted newest first.
+    Duplicates (a post both pushed and pulled) are emitted once.
+    """
+    merged = []
+    seen = set()
+    for key in heapq.merge(*streams, reverse=True):
+        if key[1] in seen:
+            continue
+        seen.add(key[1])
+        merged.append(key)
+        if len(merged) >= limit:
+            break
+    return merged
+
+
+def hybrid_feed_keys(user, position=None, limit=10):
+    """
+    Up to `limit` (created_at, post_id) keys of the user's hybrid feed, older than `position`.
+    Pushed entries come from the timeline, pulled authors are read from the Post table.
+    """
+    pushed = TimelineEntry.objects.filter(owner=user)
+    if position:
+        pushed = pushed.filter(_older_than(position, 'created_at', 'post_id'))
+    streams = [
+        pushed.order_by('-created_at', '-post_id').values_list('created_at', 'post_id')[:limit]
+    ]
+
+    pulled_ids = pull_author_ids(user)
+    if pulled_ids:
+        pulled = Post.objects.filter(
+            author_id__in=pulled_ids,
+            verification_status=Post.VerificationStatus.APPROVED
+        )
+        if position:
+            pulled = pulled.filter(_older_than(position, 'created_at', 'id'))
+        streams.append(
+            pulled.order_by('-created_at', '-id').values_list('created_at', 'id')[:limit]
+        )
+
+    return merge_streams(*(list(stream) for stream in streams), limit=limit)
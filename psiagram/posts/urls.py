@@ -7,6 +7,7 @@ from .views import (
     UserPostsView, 
     LikePostView, 
     CommentCreateView,
+    CommentListView,
     PostLikesListView
 )
 
@@ -18,5 +19,6 @@ urlpatterns = [
     path("user/<int:pk>/", UserPostsView.as_view(), name="user-posts"),
     path("<int:pk>/like/", LikePostView.as_view(), name="post-like"),
     path("<int:pk>/comment/", CommentCreateView.as_view(), name="post-comment"),
+    path("<int:pk>/comments/", CommentListView.as_view(), name="post-comments"),
     path("group/<int:pk>/", GroupPostsView.as_view(), name="group-posts"),
 ]
\ No newline at end of file
@@ -1,23 +1,90 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from django.shortcuts import render, get_object_or_404
-from django.db.models import Q 
+from django.db.models import F, Q
 from groups.models import Group
-from profiles.models import UserProfile
-from profiles.serializers import ProfileListSerializer
+from profiles.views import RelatedProfilesListView
 from rest_framework.exceptions import PermissionDenied
 from rest_framework import generics, permissions, status, exceptions
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.pagination import CursorPagination
-from .models import Post, Like
-from .serializers import PostFeedSerializer, PostSerializer, CommentSerializer
+from rest_framework.pagination import Cursor
+from psiagram import media
+from psiagram.pagination import KeysetCursorPagination
+from .models import Post, Comment, Like, TimelineEntry
+from .serializers import PostFeedSerializer, PostSerializer, CommentSerializer, is_normalized, build_included
+from .timeline import hybrid_feed_keys
+from . import feed_cache
+from aws_rekognition.jobs import enqueue_verification
 
-class FeedPagination(CursorPagination):
+class FeedPagination(KeysetCursorPagination):
     page_size = 5
-    ordering = '-created_at'
+    # id breaks ties between posts created in the same instant
+    ordering = ('-created_at', '-id')
     cursor_query_param = 'cursor'
 
 
-class FeedView(generics.ListAPIView):
+class CommentPagination(KeysetCursorPagination):
+    page_size = 20
+    ordering = ('-created_at', '-id')
+    cursor_query_param = 'cursor'
+
+
+class TimelinePagination(FeedPagination):
+    ordering = ('-created_at', '-post_id')
+
+
+class HybridFeedPagination(FeedPagination):
+    """
+    Forward-only keyset pagination for the hybrid feed, which is merged in Python.
+    The cursor position is the (created_at, id) of the last post on the page.
+    """
+
+    def paginate_keys(self, fetch_keys, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.model = Post
+
+        cursor = self.decode_cursor(request)
+        position = None
+        if cursor is not None and cursor.position is not None:
+            position = tuple(self.decode_position(cursor.position))
+
+        # Fetch one extra key to know whether there is a next page
+        keys = fetch_keys(position, self.page_size + 1)
+        self.has_next = len(keys) > self.page_size
+        keys = keys[:self.page_size]
+        self.next_position = keys[-1] if self.has_next else None
+        return keys
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.encode_values(self.next_position)))
+
+    def get_previous_link(self):
+        return None
+
+
+class NormalizedPostsMixin:
+    """
+    Post listings that can answer in the normalized shape (?normalized=true),
+    with the page's authors and groups sideloaded once in `included`.
+    """
+
+    def paginated_response(self, paginator, data):
+        response = paginator.get_paginated_response(data)
+        if is_normalized(self.request):
+            response.data['included'] = build_included(data)
+        return response
+
+    def get_paginated_response(self, data):
+        return self.paginated_response(self.paginator, data)
+
+
+class FeedView(NormalizedPostsMixin, generics.ListAPIView):
     serializer_class = PostFeedSerializer
     permission_classes = [permissions.IsAuthenticated] 
     pagination_class = FeedPagination 
@@ -25,12 +92,20 @@ class FeedView(generics.ListAPIView):
     def get_queryset(self):
         # the "Feed Logic" - who do we want to see?
         user = self.request.user
+
+        if settings.FEED_MODE in ('timeline', 'hybrid'):
+            # Pre-computed timeline: one range scan over (owner, created_at)
+            entries = TimelineEntry.objects.filter(owner=user).select_related("post")
+            return (
+                PostFeedSerializer.optimize_queryset(entries, self.request, prefix="post__")
+                .order_by("-created_at", "-post_id")
+            )
         
         # Get the profiles the current user follows
         # (We use the 'follows' ManyToMany field from your UserProfile model)
         following_profiles = user.profile.follows.all()
 
-        return (
+        queryset = (
             Post.objects
             # Filter A: Only Approved posts
             .filter(verification_status=Post.VerificationStatus.APPROVED)
@@ -39,26 +114,68 @@ class FeedView(generics.ListAPIView):
                 Q(author__profile__in=following_profiles) | 
                 Q(author=user)
             )
-            # Optimization: Load author and related data in one go
-            .select_related("author")
-            .prefetch_related("likes", "comments")
             # Order matches our pagination ordering
-            .order_by("-created_at")
+            .order_by("-created_at", "-id")
+        )
+        # Optimization: only join the author/group when those fields are requested
+        # (counts are columns on Post)
+        return PostFeedSerializer.optimize_queryset(queryset, self.request)
+
+    def list(self, request, *args, **kwargs):
+        # Serialized pages are cached under the user's feed version (see posts.feed_cache)
+        cache_key = feed_cache.page_key(request)
+        if cache_key is not None:
+            data = cache.get(cache_key)
+            if data is not None:
+                return Response(data)
+
+        response = self.build_page(request, *args, **kwargs)
+
+        if cache_key is not None and response.status_code == status.HTTP_200_OK:
+            cache.set(cache_key, response.data, media.cache_timeout(settings.FEED_CACHE_TIMEOUT))
+        return response
+
+    def build_page(self, request, *args, **kwargs):
+        if settings.FEED_MODE == 'hybrid':
+            return self.hybrid_list(request)
+        if settings.FEED_MODE != 'timeline':
+            return super().list(request, *args, **kwargs)
+
+        # Paginate the timeline entries, then serialize the posts they point to
+        paginator = TimelinePagination()
+        page = paginator.paginate_queryset(self.get_queryset(), request, view=self)
+        posts = [entry.post for entry in page]
+        serializer = self.get_serializer(posts, many=True)
+        return self.paginated_response(paginator, serializer.data)
+
+    def hybrid_list(self, request):
+        # Pushed timeline entries merged with posts pulled from high-follower authors
+        paginator = HybridFeedPagination()
+        keys = paginator.paginate_keys(
+            lambda position, limit: hybrid_feed_keys(request.user, position, limit),
+            request
         )
 
+        posts = PostFeedSerializer.optimize_queryset(Post.objects.all(), request)
+        posts_by_id = posts.in_bulk([pk for _, pk in keys])
+        posts = [posts_by_id[pk] for _, pk in keys if pk in posts_by_id]
+        serializer = self.get_serializer(posts, many=True)
+        return self.paginated_response(paginator, serializer.data)
 
-class UserPostsView(generics.ListAPIView):
+
+class UserPostsView(NormalizedPostsMixin, generics.ListAPIView):
     serializer_class = PostFeedSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = FeedPagination
 
     def get_queryset(self):
         user_id = self.kwargs['pk']
-        return Post.objects.filter(
+        queryset = Post.objects.filter(
             author__id=user_id,
             group__isnull=True,
             verification_status=Post.VerificationStatus.APPROVED
-        ).select_related("author").prefetch_related("likes", "comments").order_by('-created_at')
+        ).order_by('-created_at', '-id')
+        return PostFeedSerializer.optimize_queryset(queryset, self.request)
 
 
 class CreatePostView(generics.CreateAPIView):
@@ -70,11 +187,14 @@ class CreatePostView(generics.CreateAPIView):
         if group_input:
             if not group_input.members.filter(id=self.request.user.id).exists():
                  raise exceptions.PermissionDenied("You must be a member of this group to post.")
-        
-        serializer.save(author=self.request.user)
+
+        # The post stays hidden until a verification worker approves its image
+        with transaction.atomic():
+            post = serializer.save(author=self.request.user, verification_status=Post.VerificationStatus.PENDING)
+            enqueue_verification(post)
 
 
-class GroupPostsView(generics.ListAPIView):
+class GroupPostsView(NormalizedPostsMixin, generics.ListAPIView):
     """
     List posts belonging to a specific group.
     """
@@ -90,20 +210,23 @@ class GroupPostsView(generics.ListAPIView):
         if not group.members.filter(id=self.request.user.id).exists():
              raise exceptions.PermissionDenied("You must be a member to view these posts.")
 
-        return Post.objects.filter(
+        queryset = Post.objects.filter(
             group=group,
             verification_status=Post.VerificationStatus.APPROVED
-        ).select_related("author").prefetch_related("likes", "comments").order_by('-created_at')
+        ).order_by('-created_at', '-id')
+        return PostFeedSerializer.optimize_queryset(queryset, self.request)
 
 
 class PostDetailView(generics.RetrieveDestroyAPIView): # Changed from RetrieveAPIView
     """
     View to retrieve a single post by its ID or delete it.
     """
-    queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_queryset(self):
+        return PostSerializer.optimize_queryset(Post.objects.all(), self.request)
+
     def perform_destroy(self, instance):
         if instance.author != self.request.user:
             raise PermissionDenied("You do not have permission to delete this post.")
@@ -115,15 +238,23 @@ class LikePostView(APIView):
 
     def post(self, request, pk):
         post = get_object_or_404(Post, pk=pk)
-        like, created = Like.objects.get_or_create(user=request.user, post=post)
-        
+
+        # The like row and the like_count update commit together
+        with transaction.atomic():
+            like, created = Like.objects.get_or_create(user=request.user, post=post)
+            if not created:
+                # User already liked this post, so we remove the like (Like has
+                # no delete receivers, see posts.signals)
+                like.delete()
+                Post.objects.filter(pk=post.pk, like_count__gt=0).update(like_count=F('like_count') - 1)
+                feed_cache.bump_user_versions([request.user.id])
+        post.refresh_from_db(fields=['like_count'])
+
         if not created:
-            # User already liked this post, so we remove the like
-            like.delete()
-            return Response({'status': 'unliked', 'likes_count': post.likes.count()}, status=status.HTTP_200_OK)
+            return Response({'status': 'unliked', 'likes_count': post.like_count}, status=status.HTTP_200_OK)
         
         # User hasn't liked it yet, created new like
-        return Response({'status': 'liked', 'likes_count': post.likes.count()}, status=status.HTTP_201_CREATED)
+        return Response({'status': 'liked', 'likes_count': post.like_count}, status=status.HTTP_201_CREATED)
 
 
 class CommentCreateView(generics.CreateAPIView):
@@ -133,13 +264,30 @@ class CommentCreateView(generics.CreateAPIView):
     def perform_create(self, serializer):
         post_id = self.kwargs['pk']
         post = get_object_or_404(Post, pk=post_id)
-        serializer.save(author=self.request.user, post=post)
+        # The comment row and the comment_count update commit together
+        with transaction.atomic():
+            serializer.save(author=self.request.user, post=post)
 
 
-class PostLikesListView(generics.ListAPIView):
-    serializer_class = ProfileListSerializer
+class CommentListView(generics.ListAPIView):
+    """
+    All comments of a post, newest first, cursor-paginated.
+    """
+    serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CommentPagination
+
+    def get_queryset(self):
+        post = get_object_or_404(Post, pk=self.kwargs['pk'])
+        return Comment.objects.filter(post=post).select_related("author").order_by('-created_at', '-id')
+
+
+class PostLikesListView(RelatedProfilesListView):
+    """
+    Profiles of the users who liked a post, most recent like first.
+    """
+    profile_path = 'user.profile'
 
     def get_queryset(self):
         post_id = self.kwargs['pk']
-        return UserProfile.objects.filter(user__likes__post_id=post_id)
\ No newline at end of file
+        return Like.objects.filter(post_id=post_id).select_related('user__profile')
\ No newline at end of file
@@ -1,17 +1,23 @@
 from django.contrib import admin
-from .models import UserProfile
+from .models import Follow, UserProfile
+
+
+class FollowInline(admin.TabularInline):
+    # Read-only: follows are changed through profile.follows so the counters stay in sync
+    model = Follow
+    fk_name = 'from_userprofile'
+    fields = ('to_userprofile', 'created_at')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'bio', 'followers_count', 'following_count')
     search_fields = ('user__username', 'user__email', 'bio')
-    # Use filter_horizontal for easier management of the ManyToMany 'follows' field
-    filter_horizontal = ('follows',)
-
-    def followers_count(self, obj):
-        return obj.followed_by.count()
-    followers_count.short_description = 'Followers'
-
-    def following_count(self, obj):
-        return obj.follows.count()
-    following_count.short_description = 'Following'
\ No newline at end of file
+    readonly_fields = ('followers_count', 'following_count')
+    inlines = [FollowInline]
@@ -0,0 +1,118 @@
+import random
+import statistics
+import time
+from functools import reduce
+from operator import and_
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from profiles import search
+from profiles.models import UserProfile
+
+User = get_user_model()
+
+FIRST_NAMES = [
+    'james', 'mary', 'robert', 'patricia', 'john', 'jennifer', 'michael', 'linda', 'david', 'elizabeth',
+    'william', 'barbara', 'richard', 'susan', 'joseph', 'jessica', 'thomas', 'sarah', 'charles', 'karen',
+    'christopher', 'lisa', 'daniel', 'nancy', 'matthew', 'betty', 'anthony', 'sandra', 'mark', 'margaret',
+]
+LAST_NAMES = [
+    'smith', 'johnson', 'williams', 'brown', 'jones', 'garcia', 'miller', 'davis', 'rodriguez', 'martinez',
+    'hernandez', 'lopez', 'gonzalez', 'wilson', 'anderson', 'thomas', 'taylor', 'moore', 'jackson', 'martin',
+    'lee', 'perez', 'thompson', 'white', 'harris', 'sanchez', 'clark', 'ramirez', 'lewis', 'robinson',
+]
+
+
+def search_filter(query):
+    """
+    What DRF's SearchFilter did: every term ILIKE '%term%' on one of the fields.
+    """
+    fields = ['user__username', 'user__first_name', 'user__last_name']
+    return UserProfile.objects.filter(reduce(and_, (
+        reduce(lambda a, b: a | b, (Q(**{f'{field}__icontains': term}) for field in fields))
+        for term in query.split()
+    )))
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the profile search backend (pg_trgm / FTS5) with the old SearchFilter "
+        "ILIKE scan over generated users. Nothing is kept: the users are created in a "
+        "transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000, help="Number of generated users.")
+        parser.add_argument('--queries', type=int, default=50, help="Queries per kind (exact, with a typo).")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows per bulk insert.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['queries'] < 1:
+            raise CommandError("--users and --queries must be at least 1.")
+        rng = random.Random(options['seed'])
+
+        with transaction.atomic():
+            started = time.perf_counter()
+            targets = self.populate(options, rng)
+            self.stdout.write(f"Generated {options['users']} users in {time.perf_counter() - started:.1f}s ({connection.vendor})\n")
+
+            exact = [username for username in rng.sample(targets, min(options['queries'], len(targets)))]
+            typos = [(self.typo(username, rng), username) for username in exact]
+            for title, run in [
+                ("SearchFilter (ILIKE)", lambda query: list(search_filter(query).select_related('user')[:200])),
+                ("Search backend", lambda query: list(search.search_profiles(UserProfile.objects.select_related('user'), query))),
+            ]:
+                self.stdout.write(self.style.MIGRATE_HEADING(title))
+                for kind, cases in [("exact", [(username, username) for username in exact]), ("typo", typos)]:
+                    self.report(kind, run, cases)
+            transaction.set_rollback(True)
+
+    def populate(self, options, rng):
+        """
+        Bulk-create the users and their profiles; returns a sample of usernames to search for.
+        """
+        targets = []
+        batch_size = options['batch_size']
+        for start in range(0, options['users'], batch_size):
+            users = []
+            for i in range(start, min(start + batch_size, options['users'])):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                username = f'{first}{last}{i}'
+                users.append(User(
+                    username=username, email=f'{username}@benchmark.invalid', password='!',
+                    first_name=first.title(), last_name=last.title(),
+                ))
+            # Bulk inserts skip the signals: profiles and their index rows are added here
+            users = User.objects.bulk_create(users)
+            profiles = UserProfile.objects.bulk_create(
+                UserProfile(user=user, search_text=search.search_document(user)) for user in users
+            )
+            search.index_profiles((profile.pk, profile.search_text) for profile in profiles)
+            targets.extend(user.username for user in rng.sample(users, min(len(users), 10)))
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE profiles_userprofile')
+                cursor.execute('ANALYZE users_user')
+        return targets
+
+    def typo(self, text, rng):
+        # Swap two neighbouring letters of the name part
+        i = rng.randrange(1, max(2, len(text.rstrip('0123456789')) - 1))
+        return text[:i - 1] + text[i] + text[i - 1] + text[i + 1:]
+
+    def report(self, kind, run, cases):
+        timings, found = [], 0
+        for query, expected in cases:
+            start = time.perf_counter()
+            profiles = run(query)
+            timings.append((time.perf_counter() - start) * 1000)
+            found += any(profile.user.username == expected for profile in profiles)
+        ordered = sorted(timings)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        self.stdout.write(
+            f"{kind}: median {statistics.median(timings):.2f} ms, p95 {p95:.2f} ms, "
+            f"found the user for {found}/{len(cases)} queries"
+        )
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from profiles.models import Follow, UserProfile
+
+
+def actual_count(column):
+    """
+    Correlated COUNT of `follows` rows whose `column` is the outer UserProfile.
+    """
+    rows = (
+        Follow.objects
+        .filter(**{column: OuterRef('pk')})
+        .order_by()
+        .values(column)
+        .annotate(n=Count('*'))
+        .values('n')
+    )
+    return Coalesce(Subquery(rows), 0)
+
+
+class Command(BaseCommand):
+    help = "Repair drift in UserProfile.followers_count / UserProfile.following_count, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Profiles checked per batch.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report drifted profiles.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_pk = 0
+        checked = 0
+        repaired = 0
+
+        while True:
+            batch = list(
+                UserProfile.objects
+                .filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+
+            drifted = list(
+                UserProfile.objects
+                .filter(pk__in=batch)
+                .annotate(
+                    actual_followers=actual_count('to_userprofile'),
+                    actual_following=actual_count('from_userprofile'),
+                )
+                .filter(~Q(followers_count=F('actual_followers')) | ~Q(following_count=F('actual_following')))
+                .values_list('pk', flat=True)
+            )
+
+            if drifted and not options['dry_run']:
+                # Recount inside the UPDATE itself so concurrent follows are not lost
+                UserProfile.objects.filter(pk__in=drifted).update(
+                    followers_count=actual_count('to_userprofile'),
+                    following_count=actual_count('from_userprofile'),
+                )
+
+            for pk in drifted:
+                self.stdout.write(f"Profile {pk}: counters drifted")
+
+            last_pk = batch[-1]
+            checked += len(batch)
+            repaired += len(drifted)
+
+        verb = "Found" if options['dry_run'] else "Repaired"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} profiles. {verb} {repaired} drifted."))
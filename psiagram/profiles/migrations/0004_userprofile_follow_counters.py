@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    UserProfile = apps.get_model('profiles', 'UserProfile')
+    Follow = UserProfile.follows.through
+
+    def count_of(column):
+        rows = Follow.objects.filter(**{column: OuterRef('pk')}).order_by().values(column).annotate(n=Count('*')).values('n')
+        return Coalesce(Subquery(rows), 0)
+
+    UserProfile.objects.update(
+        followers_count=count_of('to_userprofile'),
+        following_count=count_of('from_userprofile'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0003_userprofile_avatar_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Followers Count'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Following Count'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0004_userprofile_follow_counters'),
+    ]
+
+    operations = [
+        # The implicit through table becomes the Follow model as it is
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='Follow',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('from_userprofile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='profiles.userprofile', verbose_name='Follower')),
+                        ('to_userprofile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='profiles.userprofile', verbose_name='Followed')),
+                    ],
+                    options={
+                        'verbose_name': 'Follow',
+                        'verbose_name_plural': 'Follows',
+                        'db_table': 'profiles_userprofile_follows',
+                        'unique_together': {('from_userprofile', 'to_userprofile')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='userprofile',
+                    name='follows',
+                    field=models.ManyToManyField(blank=True, related_name='followed_by', through='profiles.Follow', to='profiles.userprofile', verbose_name='Follows'),
+                ),
+            ],
+        ),
+        # Existing follows get the migration time
+        migrations.AddField(
+            model_name='follow',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Created At'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:10
+
+from django.db import migrations, models
+
+
+def populate_search_text(apps, schema_editor):
+    UserProfile = apps.get_model('profiles', 'UserProfile')
+    batch = []
+    profiles = UserProfile.objects.select_related('user').order_by('pk')
+    for profile in profiles.iterator(chunk_size=1000):
+        user = profile.user
+        # Same as profiles.search.search_document
+        profile.search_text = ' '.join(' '.join([user.username, user.first_name, user.last_name]).lower().split())
+        batch.append(profile)
+        if len(batch) >= 1000:
+            UserProfile.objects.bulk_update(batch, ['search_text'])
+            batch = []
+    if batch:
+        UserProfile.objects.bulk_update(batch, ['search_text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0005_follow'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Search Text'),
+        ),
+        migrations.RunPython(populate_search_text, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:12
+
+from django.db import migrations
+
+# Neither index is part of the model state: a GIN trigram index does not exist
+# on SQLite and an FTS5 table does not exist on PostgreSQL (see profiles.search).
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        # CONCURRENTLY keeps profiles writable while it builds
+        schema_editor.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS profile_search_trgm_idx '
+            'ON profiles_userprofile USING gin (search_text gin_trgm_ops)'
+        )
+    elif schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS profiles_userprofile_search "
+            "USING fts5(search_text, tokenize='trigram')"
+        )
+        schema_editor.execute(
+            'INSERT INTO profiles_userprofile_search (rowid, search_text) '
+            'SELECT id, search_text FROM profiles_userprofile'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX CONCURRENTLY IF EXISTS profile_search_trgm_idx')
+    elif schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS profiles_userprofile_search')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('profiles', '0006_userprofile_search_text'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:20
+
+from django.db import migrations, models
+from psiagram.db import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('profiles', '0007_profile_search_index'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='follow',
+            index=models.Index(fields=['to_userprofile', '-created_at', '-id'], name='follow_to_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='follow',
+            index=models.Index(fields=['from_userprofile', '-created_at', '-id'], name='follow_from_created_idx'),
+        ),
+    ]
@@ -1,9 +1,13 @@
 from django.db import models
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_save, m2m_changed
 from django.dispatch import receiver
+from psiagram.db import CounterFieldsMixin, LoadedFieldsMixin
+from . import search
 
-class UserProfile(models.Model):
+class UserProfile(CounterFieldsMixin, LoadedFieldsMixin, models.Model):
     """
     Model representing a user profile in the application."""
     user = models.OneToOneField(
@@ -18,15 +22,28 @@ class UserProfile(models.Model):
         blank=True, 
         verbose_name="Profile Picture"
     )
+    # Resized copies and blurhash of `avatar` (see psiagram.renditions)
+    avatar_renditions = models.JSONField(blank=True, null=True, verbose_name="Profile Picture Renditions")
     # Relation ManyToMany to self for followers/following 
     # asymmetrical relationship (A follows B does not imply B follows A)
     follows = models.ManyToManyField(
         'self',
+        through='Follow',
         related_name='followed_by',
         symmetrical=False,
         blank=True,
         verbose_name="Follows"
     )
+    # Denormalized `follows` counters, only ever changed with F() updates (see profiles.signals)
+    followers_count = models.PositiveIntegerField(default=0, verbose_name="Followers Count")
+    following_count = models.PositiveIntegerField(default=0, verbose_name="Following Count")
+
+    # Lowercased "username first_name last_name", matched by ProfileSearchView (see profiles.search)
+    search_text = models.TextField(blank=True, default='', editable=False, verbose_name="Search Text")
+
+    counter_fields = ('followers_count', 'following_count')
+    # Caches and the search index are only updated when these change
+    tracked_fields = ('avatar', 'search_text')
 
     class Meta:
         verbose_name = "User Profile"
@@ -35,6 +52,11 @@ class UserProfile(models.Model):
 
     def __str__(self):
         return self.user.username
+
+    def save(self, *args, **kwargs):
+        # Users are saved together with their profile (see save_user_profile below)
+        self.search_text = search.search_document(self.user)
+        super().save(*args, **kwargs)
     
     # Signals
     # Functions to create or update user profile when User instance is created/updated
@@ -50,3 +72,84 @@ class UserProfile(models.Model):
             instance.profile.save()
         except UserProfile.DoesNotExist:
             UserProfile.objects.create(user=instance)
+
+
+
+class Follow(models.Model):
+    """
+    A row of UserProfile.follows: `from_userprofile` follows `to_userprofile`.
+    Explicit so follows carry their creation time, which the follower/following
+    lists are keyset-paginated on. Keeps the table and columns Django created
+    for the implicit through model; rows are still written with
+    profile.follows.add()/remove() so the m2m_changed receivers run.
+    """
+    from_userprofile = models.ForeignKey(
+        UserProfile,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Follower"
+    )
+    to_userprofile = models.ForeignKey(
+        UserProfile,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Followed"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+
+    class Meta:
+        db_table = 'profiles_userprofile_follows'
+        verbose_name = "Follow"
+        verbose_name_plural = "Follows"
+        unique_together = [('from_userprofile', 'to_userprofile')]
+        indexes = [
+            # FollowersListView and FollowingListView, newest first
+            models.Index(fields=['to_userprofile', '-created_at', '-id'], name='follow_to_created_idx'),
+            models.Index(fields=['from_userprofile', '-created_at', '-id'], name='follow_from_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.from_userprofile} follows {self.to_userprofile}"
+
+# Follow counters
+# Adjusted with F() expressions inside the caller's transaction, like the post
+# counters. add() only reports the rows it actually inserted, while remove()
+# and clear() report what was asked for, so the rows they are about to delete
+# are looked up in pre_remove/pre_clear first.
+# Connected here rather than in signals.py so the counts are updated before
+# the timeline receivers of posts (see posts.timeline.is_pull_author) run.
+
+
+def _adjust_follow_counters(instance, reverse, other_pks, delta):
+    # reverse=False: instance follows/unfollows other_pks
+    # reverse=True: other_pks follow/unfollow instance (e.g. profile.followed_by.add())
+    if not other_pks:
+        return
+    own_field, other_field = ('followers_count', 'following_count') if reverse else ('following_count', 'followers_count')
+    if delta > 0:
+        UserProfile.objects.filter(pk=instance.pk).update(**{own_field: F(own_field) + len(other_pks)})
+        UserProfile.objects.filter(pk__in=other_pks).update(**{other_field: F(other_field) + 1})
+    else:
+        UserProfile.objects.filter(pk=instance.pk).update(**{own_field: Greatest(F(own_field) - len(other_pks), 0)})
+        UserProfile.objects.filter(pk__in=other_pks, **{f'{other_field}__gt': 0}).update(
+            **{other_field: F(other_field) - 1}
+        )
+
+
+@receiver(m2m_changed, sender=Follow)
+def update_follow_counters(sender, instance, action, reverse, pk_set, **kwargs):
+    own_column, other_column = ('to_userprofile', 'from_userprofile') if reverse else ('from_userprofile', 'to_userprofile')
+    if action == 'pre_remove':
+        instance._removed_follow_pks = list(
+            Follow.objects.filter(**{own_column: instance.pk, f'{other_column}__in': pk_set})
+            .values_list(f'{other_column}_id', flat=True)
+        )
+    elif action == 'pre_clear':
+        instance._removed_follow_pks = list(
+            Follow.objects.filter(**{own_column: instance.pk}).values_list(f'{other_column}_id', flat=True)
+        )
+    elif action == 'post_add':
+        _adjust_follow_counters(instance, reverse, pk_set, 1)
+    elif action in ('post_remove', 'post_clear'):
+        _adjust_follow_counters(instance, reverse, getattr(instance, '_removed_follow_pks', None), -1)
+        instance._removed_follow_pks = None
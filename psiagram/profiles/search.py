@@ -0,0 +1,131 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, IntegerField, When
+
+# Ranked, typo-tolerant profile search over UserProfile.search_text, the
+# lowercased "username first_name last_name" kept up to date on save:
+# - PostgreSQL: pg_trgm word similarity (the %> operator), served by the GIN
+#   gin_trgm_ops index profile_search_trgm_idx.
+# - SQLite, for local runs: an FTS5 table with the trigram tokenizer, kept in
+#   sync from UserProfile saves (see profiles.signals). The trigrams of the
+#   query's words are OR'ed, so a typo only loses the few trigrams it touches;
+#   candidates are then filtered and ranked like pg_trgm does, by the share of
+#   the query's (space-padded) word trigrams they contain.
+# Queries without a word of three letters fall back to a substring match.
+
+FTS_TABLE = 'profiles_userprofile_search'
+TRIGRAM_INDEX = 'profile_search_trgm_idx'
+# FTS candidates fetched per result, before the similarity filter
+CANDIDATES_PER_RESULT = 4
+
+
+def normalize(text):
+    return ' '.join((text or '').lower().split())
+
+
+def search_document(user):
+    """
+    The search_text of `user`'s profile.
+    """
+    return normalize(' '.join([user.username, user.first_name, user.last_name]))
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def word_trigrams(text):
+    """
+    Trigrams of each word padded like pg_trgm does, so word starts and ends count too.
+    """
+    return set().union(*(trigrams(f'  {word} ') for word in text.split()))
+
+
+def similarity(query_trigrams, document):
+    return len(query_trigrams & word_trigrams(document)) / len(query_trigrams)
+
+
+def uses_fts():
+    return connection.vendor == 'sqlite'
+
+
+def index_profile(pk, search_text):
+    if not uses_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+        cursor.execute(f'INSERT INTO {FTS_TABLE} (rowid, search_text) VALUES (%s, %s)', [pk, search_text])
+
+
+def index_profiles(rows):
+    """
+    Add [(pk, search_text)] of new profiles in one go (bulk-created profiles skip the signals).
+    """
+    if not uses_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'INSERT INTO {FTS_TABLE} (rowid, search_text) VALUES (%s, %s)', list(rows))
+
+
+def unindex_profile(pk):
+    if not uses_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+
+def in_order(queryset, pks):
+    """
+    The rows of `pks`, in that order.
+    """
+    if not pks:
+        return queryset.none()
+    order = Case(*[When(pk=pk, then=position) for position, pk in enumerate(pks)], output_field=IntegerField())
+    return queryset.filter(pk__in=pks).order_by(order)
+
+
+def search_profiles(queryset, query, limit=None):
+    """
+    The best matches of `query` in `queryset`, best first, at most `limit`.
+    """
+    limit = limit or settings.PROFILE_SEARCH_MAX_RESULTS
+    query = normalize(query)
+    if not query:
+        return queryset[:limit]
+    # What the FTS5 trigram tokenizer indexed: no padding, every word of the text
+    match_trigrams = set().union(*(trigrams(word) for word in query.split()))
+    if not match_trigrams:
+        return queryset.filter(search_text__contains=query).order_by('search_text', 'pk')[:limit]
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        # The threshold of the indexed %> operator, set for this transaction only
+        # so it never leaks into other requests on a pooled connection
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+                [str(settings.PROFILE_SEARCH_SIMILARITY)]
+            )
+            pks = list(
+                queryset
+                .filter(search_text__trigram_word_similar=query)
+                .annotate(similarity=TrigramWordSimilarity(query, 'search_text'))
+                .order_by('-similarity', 'pk')
+                .values_list('pk', flat=True)[:limit]
+            )
+        return in_order(queryset, pks)
+
+    match = ' OR '.join('"{}"'.format(trigram.replace('"', '""')) for trigram in sorted(match_trigrams))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid, search_text FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rank LIMIT %s',
+            [match, limit * CANDIDATES_PER_RESULT]
+        )
+        candidates = cursor.fetchall()
+
+    query_trigrams = word_trigrams(query)
+    scored = [(similarity(query_trigrams, text), position, pk) for position, (pk, text) in enumerate(candidates)]
+    scored = [row for row in scored if row[0] >= settings.PROFILE_SEARCH_SIMILARITY]
+    scored.sort(key=lambda row: (-row[0], row[1]))
+    return in_order(queryset, [pk for _, _, pk in scored[:limit]])
@@ -1,43 +1,95 @@
-from django.conf import settings
+from django.db import models
 from rest_framework import serializers
-import boto3
-from .models import UserProfile
+from .models import Follow, UserProfile
 from users.serializers import UserSerializer
 from django.contrib.auth import get_user_model
+from psiagram import renditions
+from psiagram.media import media_url
+from psiagram.serializers import SparseFieldsetMixin
+from aws_rekognition import uploads
+from aws_rekognition.models import StagedUpload
 
 User = get_user_model()
 
-class UserProfileSerializer(serializers.ModelSerializer):
+
+def followed_user_ids(user, user_ids):
+    """
+    Ids (among user_ids) of the users the given user follows, resolved in one query.
+    """
+    return set(
+        Follow.objects
+        .filter(from_userprofile__user=user, to_userprofile__user_id__in=user_ids)
+        .values_list('to_userprofile__user_id', flat=True)
+    )
+
+
+def load_follow_state(context, user_ids):
+    """
+    Resolve whether the viewer follows each of user_ids, in one query for the
+    ids not resolved yet. The {user id: bool} map lives in the serializer
+    context, so every serializer of a response shares it.
+    """
+    request = context.get('request')
+    if not request or not request.user.is_authenticated:
+        return {}
+    state = context.setdefault('follow_state', {})
+    missing = [user_id for user_id in user_ids if user_id not in state]
+    if missing:
+        followed = followed_user_ids(request.user, missing)
+        state.update((user_id, user_id in followed) for user_id in missing)
+    return state
+
+
+def resolve_is_following(serializer, user_id):
+    return load_follow_state(serializer.context, [user_id]).get(user_id, False)
+
+
+class FollowStateListSerializer(serializers.ListSerializer):
+    """
+    List serializer that resolves is_following for every user on the page with
+    one query. The child names the attribute holding the user id in
+    `follow_user_id_attr`.
+    """
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        if 'is_following' in self.child.fields:
+            attr = self.child.follow_user_id_attr
+            load_follow_state(self.context, [getattr(item, attr) for item in items])
+        return super().to_representation(items)
+
+
+class UserProfileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
-    followers_count = serializers.SerializerMethodField(read_only=True)
-    following_count = serializers.SerializerMethodField(read_only=True)
+    followers_count = serializers.IntegerField(read_only=True)
+    following_count = serializers.IntegerField(read_only=True)
     s3_key = serializers.CharField(write_only=True, required=False)
     is_following = serializers.SerializerMethodField()
     username = serializers.CharField(write_only=True, required=True)
+    avatar_renditions = serializers.SerializerMethodField(read_only=True)
+
+    select_related_fields = {'user': 'user'}
+    follow_user_id_attr = 'user_id'
 
     class Meta:
         model = UserProfile
-        fields = ['id', 'user', 'bio', 'avatar', 'followers_count', 'following_count', 's3_key', 'is_following', 'username']
+        fields = ['id', 'user', 'bio', 'avatar', 'avatar_renditions', 'followers_count', 'following_count', 's3_key', 'is_following', 'username']
         extra_kwargs = {
             'follows': {'read_only': True},
             'avatar': {'read_only': True}
         }
-    def get_is_following(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.followed_by.filter(id=request.user.profile.id).exists()
-        return False
+        list_serializer_class = FollowStateListSerializer
 
-    def get_followers_count(self, obj):
-        return obj.followed_by.count()
+    def get_is_following(self, obj):
+        return resolve_is_following(self, obj.user_id)
 
-    def get_following_count(self, obj):
-        return obj.follows.count()
+    def get_avatar_renditions(self, obj):
+        return renditions.srcset(obj.avatar_renditions, obj.avatar.name, media_url)
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        if instance.avatar:
-            representation['avatar'] = f"https://{settings.AWS_S3_BUCKET_NAME}.s3.{settings.AWS_REGION_NAME}.amazonaws.com/{instance.avatar}"
+        if 'avatar' in representation and instance.avatar:
+            representation['avatar'] = media_url(instance.avatar)
         return representation
 
     def update(self, instance, validated_data):
@@ -52,34 +104,14 @@ class UserProfileSerializer(serializers.ModelSerializer):
             instance.user.save()
 
         if s3_key:
-            # Logic to move the file from 'uploads/' to 'avatars/' on S3
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_REGION_NAME,
-            )
-            bucket_name = settings.AWS_S3_BUCKET_NAME
-
-            # 1. Define new path
-            filename = s3_key.split('/')[-1]
-            new_key = f"avatars/{filename}"
-
+            # Uploaded straight to its avatars/ key, claiming it is a database update;
+            # the job workers check it (see aws_rekognition.jobs.process_image_job)
             try:
-                # 2. Copy object
-                s3_client.copy_object(
-                    Bucket=bucket_name,
-                    CopySource={'Bucket': bucket_name, 'Key': s3_key},
-                    Key=new_key
+                instance.avatar = uploads.promote(
+                    s3_key, instance.user, StagedUpload.Purpose.AVATAR
                 )
-                # 3. Delete original from 'uploads/'
-                s3_client.delete_object(Bucket=bucket_name, Key=s3_key)
-
-                # 4. Set the avatar field to the new path
-                instance.avatar = new_key
-                
-            except Exception as e:
-                raise serializers.ValidationError(f"Failed to process S3 file: {str(e)}")
+            except uploads.UploadError as e:
+                raise serializers.ValidationError({'s3_key': str(e)})
 
         return super().update(instance, validated_data)
 
@@ -92,25 +124,20 @@ class ProfileListSerializer(serializers.ModelSerializer):
     user_id = serializers.IntegerField(source='user.id')
     is_following = serializers.SerializerMethodField()
 
+    follow_user_id_attr = 'user_id'
+
     class Meta:
         model = UserProfile
         fields = ['id', 'user_id', 'username', 'avatar', 'is_following']
         read_only_fields = fields
+        list_serializer_class = FollowStateListSerializer
 
     def get_is_following(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            # Check if the requesting user follows the user in the list
-            # 'obj' is the profile of the person in the list.
-            # We check if request.user.profile.follows contains 'obj'
-            try:
-                return request.user.profile.follows.filter(id=obj.id).exists()
-            except UserProfile.DoesNotExist:
-                return False
-        return False
+        # Whether the requesting user follows the user in the list
+        return resolve_is_following(self, obj.user_id)
     
     def to_representation(self, instance):
         representation = super().to_representation(instance)
         if instance.avatar:
-            representation['avatar'] = f"https://{settings.AWS_S3_BUCKET_NAME}.s3.{settings.AWS_REGION_NAME}.amazonaws.com/{instance.avatar}"
+            representation['avatar'] = media_url(instance.avatar)
         return representation
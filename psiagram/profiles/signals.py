@@ -0,0 +1,28 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from aws_rekognition import jobs
+from aws_rekognition.models import ImageJob
+from .models import UserProfile
+from . import search
+
+
+@receiver(post_save, sender=UserProfile)
+def queue_avatar_processing(sender, instance, raw=False, **kwargs):
+    # Only for a new avatar; renditions are made by the job workers, never in the save
+    if raw or not instance.avatar:
+        return
+    if getattr(instance, '_loaded_avatar', None) != instance.avatar.name:
+        jobs.enqueue_image(ImageJob.Kind.AVATAR, instance.pk, instance.avatar.name)
+
+
+@receiver(post_save, sender=UserProfile)
+def sync_search_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'search_text' not in update_fields:
+        return
+    if getattr(instance, '_loaded_search_text', None) != instance.search_text:
+        search.index_profile(instance.pk, instance.search_text)
+
+
+@receiver(post_delete, sender=UserProfile)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.unindex_profile(instance.pk)
@@ -1,3 +1,209 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from posts.models import Like, Post
+from psiagram.testing import make_user
+from .models import Follow, UserProfile
+from .views import RelationPagination
 
-# Create your tests here.
+
+def make_profile(username, **fields):
+    return make_user(username, **fields).profile
+
+
+class FollowCounterTests(TestCase):
+    def setUp(self):
+        self.alice, self.bob, self.carol = (make_profile(name) for name in ('alice', 'bob', 'carol'))
+
+    def counts(self, profile):
+        profile.refresh_from_db()
+        return profile.followers_count, profile.following_count
+
+    def test_add_and_remove_in_bulk(self):
+        self.alice.follows.add(self.bob, self.carol)
+        # Already followed: not counted twice
+        self.alice.follows.add(self.bob)
+        self.assertEqual(self.counts(self.alice), (0, 2))
+        self.assertEqual(self.counts(self.bob), (1, 0))
+
+        # carol was never followed by bob, nothing to remove
+        self.alice.follows.remove(self.bob)
+        self.bob.follows.remove(self.carol)
+        self.assertEqual(self.counts(self.alice), (0, 1))
+        self.assertEqual(self.counts(self.bob), (0, 0))
+        self.assertEqual(self.counts(self.carol), (1, 0))
+
+    def test_reverse_side_and_clear(self):
+        self.carol.followed_by.add(self.alice, self.bob)
+        self.alice.follows.add(self.bob)
+        self.assertEqual(self.counts(self.carol), (2, 0))
+        self.assertEqual(self.counts(self.bob), (1, 1))
+
+        self.carol.followed_by.clear()
+        self.assertEqual(self.counts(self.carol), (0, 0))
+        self.assertEqual(self.counts(self.alice), (0, 1))
+
+        self.alice.follows.clear()
+        self.assertEqual(self.counts(self.alice), (0, 0))
+        self.assertEqual(self.counts(self.bob), (0, 0))
+
+    def test_profile_save_keeps_counters(self):
+        profile = UserProfile.objects.get(pk=self.bob.pk)
+        self.alice.follows.add(self.bob)
+        profile.bio = 'stale instance'
+        profile.save()
+        self.assertEqual(self.counts(self.bob), (1, 0))
+
+    def test_reconcile_repairs_drift(self):
+        self.alice.follows.add(self.bob, self.carol)
+        UserProfile.objects.filter(pk=self.alice.pk).update(following_count=7)
+        UserProfile.objects.filter(pk=self.carol.pk).update(followers_count=0)
+
+        out = StringIO()
+        call_command('reconcile_follow_counters', '--batch-size', '2', stdout=out)
+
+        self.assertIn("Repaired 2 drifted", out.getvalue())
+        self.assertEqual(self.counts(self.alice), (0, 2))
+        self.assertEqual(self.counts(self.carol), (1, 0))
+
+
+class ProfileCountsViewTests(APITestCase):
+    def test_counts_come_from_the_columns(self):
+        alice, bob = make_profile('alice'), make_profile('bob')
+        alice.follows.add(bob)
+        self.client.force_authenticate(alice.user)
+
+        with self.assertNumQueries(2):
+            data = self.client.get(reverse('profile-detail', args=[bob.user_id])).data
+
+        self.assertEqual((data['followers_count'], data['following_count']), (1, 0))
+
+
+class FollowStateTests(APITestCase):
+    def setUp(self):
+        self.viewer = make_profile('viewer')
+        self.star = make_profile('star')
+        self.client.force_authenticate(self.viewer.user)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_followers_list_resolves_is_following_in_one_query(self):
+        url = reverse('profile-followers', args=[self.star.user_id])
+        fan = make_profile('fan0')
+        fan.follows.add(self.star)
+        self.viewer.follows.add(fan)
+        _, baseline = self.get(url)
+
+        for i in range(1, 5):
+            make_profile(f'fan{i}').follows.add(self.star)
+        page, queries = self.get(url)
+
+        self.assertEqual(queries, baseline)
+        self.assertEqual({row['username']: row['is_following'] for row in page['results']}, {
+            'fan0': True, 'fan1': False, 'fan2': False, 'fan3': False, 'fan4': False,
+        })
+
+    def test_search_results_share_the_follow_state(self):
+        self.viewer.follows.add(self.star)
+        make_profile('starlet')
+
+        results, _ = self.get(reverse('profile-search') + '?search=star')
+
+        self.assertEqual({row['user']['username']: row['is_following'] for row in results}, {
+            'star': True, 'starlet': False,
+        })
+
+
+@patch.object(RelationPagination, 'page_size', 2)
+class RelationListPaginationTests(APITestCase):
+    def setUp(self):
+        self.star = make_profile('star')
+        self.fans = [make_profile(f'fan{i}') for i in range(5)]
+        for fan in self.fans:
+            fan.follows.add(self.star)
+            self.star.follows.add(fan)
+        # Follows made in the same instant are ordered by id
+        Follow.objects.filter(to_userprofile=self.star, from_userprofile=self.fans[1]).update(
+            created_at=timezone.now() + timedelta(minutes=1)
+        )
+        self.client.force_authenticate(self.star.user)
+
+    def walk(self, url):
+        usernames, query_counts = [], []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            usernames.extend(row['username'] for row in response.data['results'])
+            query_counts.append(len(queries))
+            url = response.data['next']
+        return usernames, query_counts
+
+    def test_followers_newest_first_across_pages(self):
+        usernames, query_counts = self.walk(reverse('profile-followers', args=[self.star.user_id]))
+
+        self.assertEqual(usernames, ['fan1', 'fan4', 'fan3', 'fan2', 'fan0'])
+        # The last page costs what the first does
+        self.assertEqual(len(query_counts), 3)
+        self.assertEqual(query_counts[0], query_counts[-1])
+
+    def test_following_and_likers(self):
+        usernames, _ = self.walk(reverse('profile-following', args=[self.star.user_id]))
+        self.assertEqual(usernames, ['fan4', 'fan3', 'fan2', 'fan1', 'fan0'])
+
+        post = Post.objects.create(author=self.star.user, image='posts/star.jpg')
+        for fan in self.fans[:3]:
+            Like.objects.create(post=post, user=fan.user)
+        usernames, _ = self.walk(reverse('post-likes-list', args=[post.pk]))
+        self.assertEqual(usernames, ['fan2', 'fan1', 'fan0'])
+
+
+class ProfileSearchTests(APITestCase):
+    def setUp(self):
+        self.viewer = make_profile('viewer')
+        self.client.force_authenticate(self.viewer.user)
+
+    def search(self, query):
+        response = self.client.get(reverse('profile-search'), {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [row['user']['username'] for row in response.data]
+
+    def make_named(self, username, first_name, last_name):
+        return make_profile(username, first_name=first_name, last_name=last_name)
+
+    def test_ranked_and_typo_tolerant(self):
+        self.make_named('jonathan', 'Jonathan', 'Miller')
+        self.make_named('jmiller', 'Jon', 'Miller')
+        self.make_named('sarah', 'Sarah', 'Connor')
+
+        self.assertEqual(self.search('Jonathan Miller'), ['jonathan', 'jmiller'])
+        # Transposed letters still find the profile
+        self.assertEqual(self.search('jonahtan'), ['jonathan'])
+        self.assertEqual(self.search('conor'), ['sarah'])
+        self.assertEqual(self.search('zzz'), [])
+
+    def test_index_follows_user_and_profile_changes(self):
+        profile = self.make_named('sarah', 'Sarah', 'Connor')
+        user = profile.user
+        user.username = 'terminator'
+        user.save()
+        self.assertEqual(self.search('terminator'), ['terminator'])
+        self.assertEqual(self.search('sarah connor'), ['terminator'])
+
+        user.delete()
+        self.assertEqual(self.search('connor'), [])
+
+    def test_short_queries_match_substrings(self):
+        self.make_named('al', 'Al', 'Bundy')
+        self.assertEqual(self.search('bu'), ['al'])
@@ -1,12 +1,41 @@
+from operator import attrgetter
 from rest_framework import generics, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework import filters
 from django.shortcuts import get_object_or_404
-from .models import UserProfile
+from psiagram.pagination import KeysetCursorPagination
+from .models import Follow, UserProfile
+from . import search
 from .serializers import ProfileListSerializer, UserProfileSerializer
 
+
+class RelationPagination(KeysetCursorPagination):
+    page_size = 20
+    # id breaks ties between relations created in the same instant
+    ordering = ('-created_at', '-id')
+    cursor_query_param = 'cursor'
+
+
+class RelatedProfilesListView(generics.ListAPIView):
+    """
+    Profiles at the other end of relation rows (follows, likes), newest first.
+    The rows themselves are paginated, so each page is one range scan over
+    their (owner, created_at, id) index; `profile_path` leads from a row to the
+    profile it lists.
+    """
+    serializer_class = ProfileListSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = RelationPagination
+    profile_path = None
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        profiles = [attrgetter(self.profile_path)(row) for row in page]
+        serializer = self.get_serializer(profiles, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
 class ProfileDetailView(generics.RetrieveUpdateAPIView):
     """
     Retrieve or Update a user profile by the User ID (pk).
@@ -16,7 +45,8 @@ class ProfileDetailView(generics.RetrieveUpdateAPIView):
 
     def get_object(self):
         user_id = self.kwargs['pk']
-        return get_object_or_404(UserProfile, user__id=user_id)
+        queryset = UserProfileSerializer.optimize_queryset(UserProfile.objects.all(), self.request)
+        return get_object_or_404(queryset, user__id=user_id)
 
 
 class FollowToggleView(APIView):
@@ -38,28 +68,30 @@ class FollowToggleView(APIView):
 
 
 class ProfileSearchView(generics.ListAPIView):
-    queryset = UserProfile.objects.all()
+    """
+    Profiles whose username or name match ?search=, best match first, typos tolerated.
+    """
     serializer_class = UserProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['user__username', 'user__first_name', 'user__last_name']
 
+    def get_queryset(self):
+        queryset = UserProfileSerializer.optimize_queryset(UserProfile.objects.all(), self.request)
+        return search.search_profiles(queryset, self.request.query_params.get('search', ''))
 
-class FollowersListView(generics.ListAPIView):
-    serializer_class = ProfileListSerializer
-    permission_classes = [permissions.IsAuthenticated]
+
+class FollowersListView(RelatedProfilesListView):
+    profile_path = 'from_userprofile'
 
     def get_queryset(self):
         user_id = self.kwargs['pk']
         profile = get_object_or_404(UserProfile, user__id=user_id)
-        return profile.followed_by.all()
+        return Follow.objects.filter(to_userprofile=profile).select_related('from_userprofile__user')
 
 
-class FollowingListView(generics.ListAPIView):
-    serializer_class = ProfileListSerializer
-    permission_classes = [permissions.IsAuthenticated]
+class FollowingListView(RelatedProfilesListView):
+    profile_path = 'to_userprofile'
 
     def get_queryset(self):
         user_id = self.kwargs['pk']
         profile = get_object_or_404(UserProfile, user__id=user_id)
-        return profile.follows.all()
\ No newline at end of file
+        return Follow.objects.filter(from_userprofile=profile).select_related('to_userprofile__user')
\ No newline at end of file
@@ -0,0 +1,79 @@
+from django.db import migrations
+from django.db.models.fields.files import FieldFile
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """
+    AddIndex that builds the index with CREATE INDEX CONCURRENTLY on PostgreSQL,
+    so large tables stay writable while it builds. Other backends (SQLite for
+    local runs) get a regular CREATE INDEX.
+
+    Migrations using it must set `atomic = False`.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.add_index(model, self.index, concurrently=True)
+        else:
+            schema_editor.add_index(model, self.index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.remove_index(model, self.index, concurrently=True)
+        else:
+            schema_editor.remove_index(model, self.index)
+
+    def describe(self):
+        return f"Concurrently create index {self.index.name} on {self.model_name}"
+
+
+class CounterFieldsMixin:
+    """
+    Model mixin for denormalized counters (`counter_fields`), only ever changed
+    with F() updates: saving an existing row writes every other field but never
+    the counters, whose loaded values may be stale by then.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class LoadedFieldsMixin:
+    """
+    Model mixin remembering the stored value of each field in `tracked_fields`
+    as `_loaded_<name>` (file fields by name), when the row is loaded and after
+    each save that writes the field, so post_save receivers can compare with
+    the value stored before the save and react to actual changes only.
+    """
+    tracked_fields = ()
+
+    def remember_loaded(self, field_names):
+        for name in self.tracked_fields:
+            if name in field_names:
+                value = getattr(self, name)
+                setattr(self, f'_loaded_{name}', value.name if isinstance(value, FieldFile) else value)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            update_fields = set(self.tracked_fields) - self.get_deferred_fields()
+        self.remember_loaded(update_fields)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_loaded(field_names)
+        return instance
@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.files.storage import default_storage
+from aws_rekognition.clients import get_s3_client
+
+# URLs of stored media (post images, avatars, group pictures, renditions), for
+# every serializer. MEDIA_URL_MODE picks the kind:
+#   'public'  - plain URL on MEDIA_CDN_DOMAIN, or on the bucket itself
+#   'signed'  - presigned GET URL, for a private bucket
+#   'storage' - whatever the default storage returns (e.g. local files)
+# Signing costs far more than formatting a string, so signed URLs are kept in
+# an in-process LRU. A URL can then pass through up to three caches before a
+# client sees it, and each gets a quarter of its validity E
+# (MEDIA_SIGNED_URL_EXPIRES):
+#   in-process LRU - handed out again for E/4 after signing
+#   post fragments - cached for at most E/4 (cache_timeout)
+#   feed pages     - cached for at most E/4 (cache_timeout)
+# so every URL served is still valid for at least E/4, and an object is signed
+# at most about four times per E.
+CACHE_LAYERS = 3
+
+
+class ExpiringLRU:
+    """
+    Thread-safe LRU of values that go stale at a given time, holding at most
+    MEDIA_URL_CACHE_SIZE of them.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, now):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, stale_at = entry
+            if now >= stale_at:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, stale_at):
+        with self.lock:
+            self.entries[key] = (value, stale_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.MEDIA_URL_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_signed_urls = ExpiringLRU()
+
+
+def public_url(key):
+    if settings.MEDIA_CDN_DOMAIN:
+        return f"https://{settings.MEDIA_CDN_DOMAIN}/{key}"
+    return f"https://{settings.AWS_S3_BUCKET_NAME}.s3.{settings.AWS_REGION_NAME}.amazonaws.com/{key}"
+
+
+def signed_url(key):
+    expires = settings.MEDIA_SIGNED_URL_EXPIRES
+    cache_key = (settings.AWS_S3_BUCKET_NAME, expires, key)
+    now = time.monotonic()
+    url = _signed_urls.get(cache_key, now)
+    if url is None:
+        url = get_s3_client().generate_presigned_url(
+            ClientMethod='get_object',
+            Params={'Bucket': settings.AWS_S3_BUCKET_NAME, 'Key': key},
+            ExpiresIn=expires,
+        )
+        _signed_urls.set(cache_key, url, now + expires / (CACHE_LAYERS + 1))
+    return url
+
+
+def media_url(file):
+    """
+    URL of a stored file: a FieldFile or a storage key. None for an empty one;
+    values that are already URLs are returned as they are.
+    """
+    key = str(getattr(file, 'name', file) or '')
+    if not key:
+        return None
+    if key.startswith('http'):
+        return key
+    if settings.MEDIA_URL_MODE == 'signed':
+        return signed_url(key)
+    if settings.MEDIA_URL_MODE == 'storage':
+        return default_storage.url(key)
+    return public_url(key)
+
+
+def max_cache_seconds():
+    """
+    How long one cache layer may keep a serialized representation holding
+    media URLs; None if the URLs do not expire.
+    """
+    if settings.MEDIA_URL_MODE == 'signed':
+        return settings.MEDIA_SIGNED_URL_EXPIRES // (CACHE_LAYERS + 1)
+    return None
+
+
+def cache_timeout(timeout):
+    """
+    `timeout` shortened to one layer's share of the signed URL validity, so
+    cached responses never outlive their URLs.
+    """
+    limit = max_cache_seconds()
+    return timeout if limit is None else min(timeout, limit)
@@ -0,0 +1,24 @@
+from django.core.cache import cache
+
+# Process-independent counters kept in the shared cache (Redis in production).
+# They are best-effort operational numbers: an evicted key restarts from zero.
+KEY_PREFIX = 'metrics:'
+
+
+def increment(name, amount=1):
+    key = KEY_PREFIX + name
+    if cache.add(key, amount, timeout=None):
+        return
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.add(key, amount, timeout=None)
+
+
+def snapshot(names):
+    """
+    Current value of each counter in `names` (0 if never incremented).
+    """
+    values = cache.get_many([KEY_PREFIX + name for name in names])
+    return {name: values.get(KEY_PREFIX + name, 0) for name in names}
@@ -0,0 +1,104 @@
+import json
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+def _field_name(order):
+    return order.lstrip('-')
+
+
+def keyset_filter(ordering, position):
+    """
+    Rows strictly after `position` in `ordering`, e.g. for ('-created_at', '-id'):
+    created_at < c OR (created_at = c AND id < i)
+    """
+    condition = Q()
+    for i, order in enumerate(ordering):
+        lookup = 'lt' if order.startswith('-') else 'gt'
+        step = Q(**{f'{_field_name(order)}__{lookup}': position[i]})
+        for j in range(i):
+            step &= Q(**{_field_name(ordering[j]): position[j]})
+        condition |= step
+    return condition
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination over a composite key such as ('-created_at', '-id').
+
+    DRF's CursorPagination keys on the first ordering field only and breaks
+    ties with an offset, so rows sharing a timestamp can be skipped or repeated.
+    Here the cursor position holds every ordering field, and each page is a
+    single range scan over an index shaped like the ordering.
+    """
+    ordering = ('-created_at', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.model = queryset.model
+
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor.reverse)
+        position = None
+        if self.cursor is not None and self.cursor.position is not None:
+            position = self.decode_position(self.cursor.position)
+
+        # Going backwards means walking the opposite ordering, then flipping the page
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(_field_name(o) if o.startswith('-') else f'-{o}' for o in ordering)
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(keyset_filter(ordering, position))
+
+        # Fetch one extra row to know whether there is another page
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        return self.page
+
+    def decode_position(self, position):
+        try:
+            values = json.loads(position)
+            fields = [self.model._meta.get_field(_field_name(o)) for o in self.ordering]
+            if len(values) != len(fields):
+                raise ValueError
+            return [field.to_python(value) for field, value in zip(fields, values)]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_values(self, values):
+        values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]
+        return json.dumps(values, separators=(',', ':'))
+
+    def encode_position(self, instance):
+        return self.encode_values(getattr(instance, _field_name(order)) for order in self.ordering)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        cursor = Cursor(offset=0, reverse=False, position=self.encode_position(self.page[-1]))
+        return self.encode_cursor(cursor)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        cursor = Cursor(offset=0, reverse=True, position=self.encode_position(self.page[0]))
+        return self.encode_cursor(cursor)
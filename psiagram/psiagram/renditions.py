@@ -0,0 +1,213 @@
+import io
+import math
+import os
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+# Downscaled copies of uploaded images (post images, avatars, group pictures),
+# generated once after an upload is accepted. An image field `x` gets a JSON
+# field `x_renditions` recording where they were stored:
+#   {"source": <original key>, "width": .., "height": .., "blurhash": "...",
+#    "files": {"jpeg": {"320": <key>, ...}, "webp": {...}}}
+# `source` ties the renditions to the image they were made from, so a replaced
+# image never serves the previous one's renditions.
+
+EXTENSIONS = {'jpeg': 'jpg', 'webp': 'webp', 'avif': 'avif'}
+PIL_FORMATS = {'jpeg': 'JPEG', 'webp': 'WEBP', 'avif': 'AVIF'}
+
+BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+
+
+def _base83(value, length):
+    return ''.join(BASE83[(value // 83 ** (length - i - 1)) % 83] for i in range(length))
+
+
+def _srgb_to_linear(value):
+    value = value / 255
+    return value / 12.92 if value <= 0.04045 else ((value + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value):
+    value = max(0.0, min(1.0, value))
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def blurhash(image, x_components=4, y_components=3):
+    """
+    BlurHash (https://blurha.sh) of a PIL image: a ~30 character placeholder
+    clients decode into a blurred preview while the real image loads.
+    """
+    image = image.convert('RGB')
+    image.thumbnail((32, 32))
+    width, height = image.size
+    pixels = [tuple(_srgb_to_linear(c) for c in pixel) for pixel in image.getdata()]
+    cos_x = [[math.cos(math.pi * i * x / width) for x in range(width)] for i in range(x_components)]
+    cos_y = [[math.cos(math.pi * j * y / height) for y in range(height)] for j in range(y_components)]
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            normalisation = 1 if i == 0 and j == 0 else 2
+            r = g = b = 0.0
+            for y in range(height):
+                for x in range(width):
+                    basis = cos_x[i][x] * cos_y[j][y]
+                    pr, pg, pb = pixels[y * width + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = normalisation / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _base83((x_components - 1) + (y_components - 1) * 9, 1)
+    if ac:
+        quantised_max = max(0, min(82, int(max(abs(v) for f in ac for v in f) * 166 - 0.5)))
+        max_value = (quantised_max + 1) / 166
+        result += _base83(quantised_max, 1)
+    else:
+        max_value = 1
+        result += _base83(0, 1)
+
+    result += _base83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+    for factor in ac:
+        q = [
+            max(0, min(18, int(math.floor(math.copysign(abs(v / max_value) ** 0.5, v) * 9 + 9.5))))
+            for v in factor
+        ]
+        result += _base83(q[0] * 19 * 19 + q[1] * 19 + q[2], 2)
+    return result
+
+
+def enabled_formats():
+    # JPEG always, plus the configured modern formats this Pillow build can write
+    extra = [fmt for fmt in settings.IMAGE_RENDITION_FORMATS if fmt in PIL_FORMATS and fmt != 'jpeg']
+    return ['jpeg'] + [fmt for fmt in extra if features.check(fmt)]
+
+
+def target_widths(kind, original_width):
+    """
+    Configured widths below the original's; never upscales, but always yields one.
+    """
+    widths = [width for width in settings.IMAGE_RENDITION_WIDTHS[kind] if width < original_width]
+    return widths or [original_width]
+
+
+def encode(image, fmt):
+    buffer = io.BytesIO()
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.save(buffer, format=PIL_FORMATS[fmt], quality=settings.IMAGE_RENDITION_QUALITY)
+    return buffer.getvalue()
+
+
+def directory(name):
+    return f'renditions/{os.path.splitext(name)[0]}'
+
+
+def generate(name, kind, storage=default_storage):
+    """
+    Create the renditions of the stored image `name` for `kind` ('post',
+    'avatar', 'group'), save them next to each other under renditions/, and
+    return the JSON to store on the model.
+    """
+    with storage.open(name, 'rb') as source:
+        image = Image.open(io.BytesIO(source.read()))
+        image.load()
+    # Phones store rotation in EXIF, renditions bake it in
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    files = {fmt: {} for fmt in enabled_formats()}
+    for width in target_widths(kind, image.width):
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.Resampling.LANCZOS)
+        for fmt in files:
+            key = f'{directory(name)}/{width}w.{EXTENSIONS[fmt]}'
+            if storage.exists(key):
+                storage.delete(key)
+            files[fmt][str(width)] = storage.save(key, ContentFile(encode(resized, fmt)))
+
+    return {
+        'source': name,
+        'width': image.width,
+        'height': image.height,
+        'blurhash': blurhash(image),
+        'files': files,
+    }
+
+
+def delete(name, storage=default_storage):
+    """
+    Delete every rendition generated from the stored image `name`, including
+    those of earlier generations no row points at any more.
+    """
+    try:
+        _, filenames = storage.listdir(directory(name))
+    except FileNotFoundError:
+        return
+    for filename in filenames:
+        storage.delete(f'{directory(name)}/{filename}')
+
+
+def is_current(renditions, name):
+    return bool(renditions) and bool(name) and renditions.get('source') == name
+
+
+def srcset(renditions, name, url_for):
+    """
+    Client representation: {'blurhash', 'width', 'height', 'jpeg': {'320w': url, ...}, 'webp': ...},
+    or None when the image has no (current) renditions yet.
+    """
+    if not is_current(renditions, name):
+        return None
+    representation = {
+        'blurhash': renditions.get('blurhash'),
+        'width': renditions.get('width'),
+        'height': renditions.get('height'),
+    }
+    for fmt, keys in renditions.get('files', {}).items():
+        representation[fmt] = {f'{width}w': url_for(key) for width, key in keys.items()}
+    return representation
+
+
+def build(model, field_name, name, kind, reuse=True):
+    """
+    Renditions of `name` for `model.field_name`, reusing those of another row
+    showing the same stored image (deduplicated uploads) before generating.
+    """
+    if not reuse:
+        return generate(name, kind)
+    renditions_field = f'{field_name}_renditions'
+    existing = (
+        model.objects
+        .filter(**{field_name: name, f'{renditions_field}__source': name})
+        .values_list(renditions_field, flat=True)
+        .first()
+    )
+    return existing or generate(name, kind)
+
+
+def refresh(model, pk, field_name, kind, force=False, **extra_updates):
+    """
+    Make sure the row's current image has renditions (new ones with `force`);
+    stored with a queryset update, so no save signals fire again.
+    Returns True if anything was written.
+    """
+    renditions_field = f'{field_name}_renditions'
+    row = model.objects.filter(pk=pk).values(field_name, renditions_field).first()
+    if row is None or not row[field_name]:
+        return False
+    if not force and is_current(row[renditions_field], row[field_name]):
+        return False
+
+    name = row[field_name]
+    data = build(model, field_name, name, kind, reuse=not force)
+    # Only if the image was not replaced meanwhile
+    updated = model.objects.filter(pk=pk, **{field_name: name}).update(**{renditions_field: data}, **extra_updates)
+    return bool(updated)
@@ -0,0 +1,73 @@
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _parse_field_list(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+def selected_fields(request, available):
+    """
+    The subset of `available` field names picked by ?fields=a,b and/or ?omit=c,d,
+    or None when the request does not ask for a sparse fieldset.
+    Only applies to reads, writes always see every field.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+
+    fields = request.query_params.get('fields')
+    omit = request.query_params.get('omit')
+    if not fields and not omit:
+        return None
+
+    selected = _parse_field_list(fields) & set(available) if fields else set(available)
+    return selected - _parse_field_list(omit)
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin for ?fields= / ?omit= sparse fieldsets.
+
+    Fields that were not requested are removed from the serializer itself, so
+    their SerializerMethodFields never run. `select_related_fields` and
+    `prefetch_related_fields` map a field to the lookups it needs, so views can
+    skip the joins and prefetches of fields nobody asked for.
+    """
+    select_related_fields = {}
+    prefetch_related_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.selected_fields = self.get_selected_fields(self.context.get('request'))
+        if self.selected_fields is not None:
+            for name in list(self.fields):
+                if name not in self.selected_fields:
+                    self.fields.pop(name)
+
+    @classmethod
+    def get_selected_fields(cls, request):
+        return selected_fields(request, cls.Meta.fields)
+
+    @classmethod
+    def _lookups(cls, mapping, request, prefix):
+        selected = cls.get_selected_fields(request)
+        lookups = []
+        for name, lookup in mapping.items():
+            if selected is None or name in selected:
+                if f'{prefix}{lookup}' not in lookups:
+                    lookups.append(f'{prefix}{lookup}')
+        return lookups
+
+    @classmethod
+    def optimize_queryset(cls, queryset, request, prefix=''):
+        """
+        Apply only the select_related/prefetch_related lookups the requested fields need.
+        `prefix` points at the serialized model, e.g. 'post__' for timeline entries.
+        """
+        select = cls._lookups(cls.select_related_fields, request, prefix)
+        prefetch = cls._lookups(cls.prefetch_related_fields, request, prefix)
+        # select_related() without arguments would follow every foreign key
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
@@ -28,6 +28,8 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    # Trigram lookups of the profile search (only used on PostgreSQL)
+    'django.contrib.postgres',
     'notifications.apps.NotificationsConfig',
     
     # Architecture Apps
@@ -168,6 +170,147 @@ AWS_S3_BUCKET_NAME = os.environ.get("AWS_S3_BUCKET_NAME")
 AWS_ACCESS_KEY_ID = os.environ.get("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.environ.get("AWS_SECRET_ACCESS_KEY")
 AWS_REGION_NAME = os.environ.get("AWS_REGION_NAME", "eu-central-1")
+# Optional S3-compatible endpoint (e.g. a local MinIO), also used by django-storages
+AWS_S3_ENDPOINT_URL = os.environ.get("AWS_S3_ENDPOINT_URL")
+
+# --- AWS CLIENT CONFIGURATION ---
+# Shared boto3 clients (aws_rekognition.clients), one per service and worker process
+AWS_CLIENT_MAX_POOL_CONNECTIONS = int(os.environ.get("AWS_CLIENT_MAX_POOL_CONNECTIONS", "50"))
+AWS_CLIENT_CONNECT_TIMEOUT = float(os.environ.get("AWS_CLIENT_CONNECT_TIMEOUT", "5"))
+AWS_CLIENT_READ_TIMEOUT = float(os.environ.get("AWS_CLIENT_READ_TIMEOUT", "30"))
+# 'legacy', 'standard' or 'adaptive' (botocore retry modes)
+AWS_CLIENT_RETRY_MODE = os.environ.get("AWS_CLIENT_RETRY_MODE", "standard")
+AWS_CLIENT_MAX_ATTEMPTS = int(os.environ.get("AWS_CLIENT_MAX_ATTEMPTS", "3"))
+
+# --- OBJECT STORE CONFIGURATION ---
+# Backend of the direct uploads (aws_rekognition.objectstores). With
+# 'aws_rekognition.objectstores.FilesystemObjectStore' objects are files under
+# OBJECT_STORE_ROOT, served as the default storage too, so the upload pipeline
+# runs without AWS (see `manage.py benchmark_upload_pipeline`).
+OBJECT_STORE_BACKEND = os.environ.get('OBJECT_STORE_BACKEND', 'aws_rekognition.objectstores.S3ObjectStore')
+OBJECT_STORE_ROOT = os.environ.get('OBJECT_STORE_ROOT', str(BASE_DIR / 'object_store'))
+
+# --- MEDIA URL CONFIGURATION ---
+# How serializers link stored images (psiagram.media): 'public' (plain URLs on
+# MEDIA_CDN_DOMAIN, or on the bucket), 'signed' (presigned GET URLs, the bucket
+# can stay private) or 'storage' (the default storage's own URLs)
+MEDIA_URL_MODE = os.environ.get(
+    'MEDIA_URL_MODE',
+    'storage' if OBJECT_STORE_BACKEND == 'aws_rekognition.objectstores.FilesystemObjectStore' else 'public'
+)
+MEDIA_CDN_DOMAIN = os.environ.get('MEDIA_CDN_DOMAIN')
+# Seconds presigned GET URLs stay valid, split between the caches (see psiagram.media)
+MEDIA_SIGNED_URL_EXPIRES = int(os.environ.get('MEDIA_SIGNED_URL_EXPIRES', '3600'))
+# Signed URLs kept per process
+MEDIA_URL_CACHE_SIZE = int(os.environ.get('MEDIA_URL_CACHE_SIZE', '10000'))
+
+# --- UPLOAD CONFIGURATION ---
+# Seconds presigned upload URLs stay valid
+UPLOAD_URL_EXPIRES = int(os.environ.get('UPLOAD_URL_EXPIRES', '3600'))
+UPLOAD_BATCH_MAX_FILES = int(os.environ.get('UPLOAD_BATCH_MAX_FILES', '10'))
+# Files above this size (bytes) are uploaded as S3 multipart uploads
+UPLOAD_MULTIPART_THRESHOLD = int(os.environ.get('UPLOAD_MULTIPART_THRESHOLD', str(16 * 1024 * 1024)))
+UPLOAD_MULTIPART_PART_SIZE = int(os.environ.get('UPLOAD_MULTIPART_PART_SIZE', str(8 * 1024 * 1024)))
+# Parts per multipart upload at most (parts grow to stay under it)
+UPLOAD_MULTIPART_MAX_PARTS = int(os.environ.get('UPLOAD_MULTIPART_MAX_PARTS', '100'))
+# Pre-validation (aws_rekognition.prevalidation) before any Rekognition call
+UPLOAD_PREVALIDATION_BYTES = int(os.environ.get('UPLOAD_PREVALIDATION_BYTES', str(64 * 1024)))
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', str(25 * 1024 * 1024)))
+UPLOAD_MAX_PIXELS = int(os.environ.get('UPLOAD_MAX_PIXELS', str(50_000_000)))
+UPLOAD_MAX_ASPECT_RATIO = float(os.environ.get('UPLOAD_MAX_ASPECT_RATIO', '8'))
+UPLOAD_ALLOWED_FORMATS = ['JPEG', 'PNG', 'WEBP']
+
+# --- VERIFICATION CONFIGURATION ---
+# New posts stay PENDING until `manage.py process_verification_jobs` labels them.
+# 'aws_rekognition.labelers.FakeLabeler' approves everything without calling AWS.
+VERIFICATION_LABELER = os.environ.get('VERIFICATION_LABELER', 'aws_rekognition.labelers.RekognitionLabeler')
+VERIFICATION_WORKERS = int(os.environ.get('VERIFICATION_WORKERS', '4'))
+VERIFICATION_MAX_ATTEMPTS = int(os.environ.get('VERIFICATION_MAX_ATTEMPTS', '5'))
+# Seconds a claimed job stays hidden from other workers before it is retried
+VERIFICATION_VISIBILITY_TIMEOUT = int(os.environ.get('VERIFICATION_VISIBILITY_TIMEOUT', '120'))
+# Base of the exponential retry backoff, in seconds
+VERIFICATION_RETRY_BACKOFF = int(os.environ.get('VERIFICATION_RETRY_BACKOFF', '10'))
+# Load shedding around labeling calls (aws_rekognition.resilience): a breaker
+# shared through the cache opens when LABELER_BREAKER_FAILURE_RATE of the calls
+# in a window fail or take longer than LABELER_SLOW_CALL_SECONDS
+LABELER_CIRCUIT_BREAKER = os.environ.get('LABELER_CIRCUIT_BREAKER', 'True') == 'True'
+LABELER_SLOW_CALL_SECONDS = float(os.environ.get('LABELER_SLOW_CALL_SECONDS', '5'))
+LABELER_BREAKER_WINDOW = int(os.environ.get('LABELER_BREAKER_WINDOW', '30'))
+LABELER_BREAKER_MIN_CALLS = int(os.environ.get('LABELER_BREAKER_MIN_CALLS', '10'))
+LABELER_BREAKER_FAILURE_RATE = float(os.environ.get('LABELER_BREAKER_FAILURE_RATE', '0.5'))
+LABELER_BREAKER_OPEN_SECONDS = int(os.environ.get('LABELER_BREAKER_OPEN_SECONDS', '30'))
+# Upper bound of concurrent labeling calls per process (adapted down under stress)
+LABELER_MAX_CONCURRENCY = int(os.environ.get('LABELER_MAX_CONCURRENCY', '8'))
+# Retries allowed as a share of the window's calls (GuardedLabeler retries a failed call once)
+LABELER_RETRY_BUDGET = float(os.environ.get('LABELER_RETRY_BUDGET', '0.1'))
+# Read timeout of the Rekognition client, which makes a single attempt per call
+LABELER_READ_TIMEOUT = float(os.environ.get('LABELER_READ_TIMEOUT', '10'))
+# Simulated Rekognition of the FakeLabeler: seconds per call, share of failing calls
+FAKE_LABELER_LATENCY = float(os.environ.get('FAKE_LABELER_LATENCY', '0'))
+FAKE_LABELER_ERROR_RATE = float(os.environ.get('FAKE_LABELER_ERROR_RATE', '0'))
+FAKE_LABELER_SEED = int(os.environ.get('FAKE_LABELER_SEED', '0'))
+# Also record the perceptual hash of uploads (a moderation aid, labels are only
+# ever reused for identical bytes)
+UPLOAD_PERCEPTUAL_HASH = os.environ.get('UPLOAD_PERCEPTUAL_HASH', 'False') == 'True'
+
+# --- IMAGE RENDITION CONFIGURATION ---
+# Widths generated per image kind (psiagram.renditions), never above the original
+IMAGE_RENDITION_WIDTHS = {
+    'post': [320, 640, 1080],
+    'avatar': [64, 128, 256],
+    'group': [128, 320, 640],
+}
+# Formats besides JPEG, e.g. 'webp,avif' (AVIF encodes much slower)
+IMAGE_RENDITION_FORMATS = [fmt for fmt in os.environ.get('IMAGE_RENDITION_FORMATS', 'webp').split(',') if fmt]
+IMAGE_RENDITION_QUALITY = int(os.environ.get('IMAGE_RENDITION_QUALITY', '80'))
+
+# --- FEED CONFIGURATION ---
+# 'timeline' reads FeedView pages from the materialized TimelineEntry store,
+# 'hybrid' does the same but pulls posts of high-follower authors at read time,
+# 'query' falls back to the join over the whole Post table.
+# Run `manage.py backfill_timelines` once before the first switch to 'timeline'/'hybrid'
+# (and again when leaving 'hybrid', since pulled authors are not pushed).
+FEED_MODE = os.environ.get('FEED_MODE', 'query')
+# In 'hybrid' mode, authors with at least this many followers are pulled instead of pushed
+# (posts made while pulled are not pushed later, see posts.timeline.is_pull_author)
+FEED_PULL_FOLLOWER_THRESHOLD = int(os.environ.get('FEED_PULL_FOLLOWER_THRESHOLD', '10000'))
+FEED_FANOUT_BATCH_SIZE = int(os.environ.get('FEED_FANOUT_BATCH_SIZE', '1000'))
+# How many of an author's latest posts are copied into a timeline on follow
+FEED_FOLLOW_BACKFILL_LIMIT = int(os.environ.get('FEED_FOLLOW_BACKFILL_LIMIT', '200'))
+
+# Seconds a serialized FeedView page stays cached (0 disables the cache).
+# Pages are invalidated by version bumps; the timeout only bounds how stale
+# like/comment counters of other users can get.
+FEED_CACHE_TIMEOUT = int(os.environ.get('FEED_CACHE_TIMEOUT', '60'))
+
+# Seconds a post's viewer-independent serialized fragment stays cached (0 disables)
+POST_FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('POST_FRAGMENT_CACHE_TIMEOUT', '3600'))
+
+# Latest comments embedded per post in feeds and post details
+POST_COMMENT_PREVIEW_SIZE = int(os.environ.get('POST_COMMENT_PREVIEW_SIZE', '3'))
+
+# --- PROFILE SEARCH CONFIGURATION ---
+# ProfileSearchView (profiles.search): pg_trgm on PostgreSQL, FTS5 on SQLite
+PROFILE_SEARCH_MAX_RESULTS = int(os.environ.get('PROFILE_SEARCH_MAX_RESULTS', '50'))
+# Share of the query's trigrams a profile must contain (pg_trgm word similarity)
+PROFILE_SEARCH_SIMILARITY = float(os.environ.get('PROFILE_SEARCH_SIMILARITY', '0.4'))
+
+# --- CACHE CONFIGURATION ---
+# Shared Redis cache in production (REDIS_URL), per-process memory cache locally
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'psiagram',
+        }
+    }
 
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -187,6 +330,11 @@ STORAGES = {
         "BACKEND": "storages.backends.s3boto3.S3StaticStorage",
     },
 }
+if OBJECT_STORE_BACKEND == 'aws_rekognition.objectstores.FilesystemObjectStore':
+    STORAGES["default"] = {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": OBJECT_STORE_ROOT},
+    }
 
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -0,0 +1,18 @@
+from django.contrib.auth import get_user_model
+
+# Helpers shared by the apps' tests.py
+
+# Keep serializers and renditions away from S3 while storing or rendering files
+TEST_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+    'staticfiles': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+}
+
+
+def make_user(username, **fields):
+    """
+    A user (and, through the post_save receiver, their profile).
+    """
+    fields.setdefault('email', f'{username}@example.com')
+    fields.setdefault('password', 'Password123!')
+    return get_user_model().objects.create_user(username=username, **fields)